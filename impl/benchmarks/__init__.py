@@ -0,0 +1,7 @@
+"""
+Benchmarks for the nora_lib client library.
+
+Run from the `impl` directory, e.g.
+
+    PYTHONPATH=src python -m benchmarks.connection_pool
+"""
@@ -0,0 +1,336 @@
+"""
+Load test the client library with simulated agent turns against the in-memory
+Interaction Store, and report latency percentiles, throughput and allocations
+per scenario as JSON.
+
+Each turn mimics what an agent does to answer one message:
+    save_message   save the user's message to its thread
+    context_fetch  fetch the thread's messages and events for the agent context
+    task_state     read/modify/write task state through RemoteStateManager
+    step_progress  create, start and finish --steps steps through StepProgressReporter
+    report_cost    report the cost of the turn
+
+    PYTHONPATH=src python -m benchmarks.agent_turn --turns 400 --concurrency 8 --output bench.json
+
+By default the store is served over local HTTP so the full client stack is
+exercised; --transport memory calls it in-process to isolate client overhead.
+Pubsub notifications go to the same local server, which answers them with 404.
+"""
+
+import argparse
+import json
+import math
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional
+from uuid import uuid4
+
+from pydantic import BaseModel
+
+from nora_lib.impl.interactions.in_memory import (
+    InMemoryInteractionStore,
+    InMemoryInteractionsService,
+    serve,
+)
+from nora_lib.impl.interactions.interactions_service import (
+    InteractionsService,
+    PoolConfig,
+)
+from nora_lib.impl.interactions.models import (
+    Channel,
+    Message,
+    ServiceCost,
+    StepCost,
+    Surface,
+)
+from nora_lib.impl.interactions.step_progress import StepProgressReporter
+from nora_lib.impl.pubsub import PubsubService
+from nora_lib.impl.tasks.state import RemoteStateManager
+from nora_lib.progress.models import StepProgress
+from nora_lib.tasks.models import AsyncTaskState, TaskStatus
+
+SCENARIOS = [
+    "save_message",
+    "context_fetch",
+    "task_state",
+    "step_progress",
+    "report_cost",
+]
+
+AGENT = "benchmark_agent"
+
+
+class _TaskResult(BaseModel):
+    answer: str
+
+
+class _Agent:
+    """One simulated agent, answering messages in its own thread"""
+
+    def __init__(
+        self,
+        iservice: InteractionsService,
+        pubsub: PubsubService,
+        channel_id: str,
+        steps: int,
+    ):
+        self.iservice = iservice
+        self.pubsub = pubsub
+        self.channel_id = channel_id
+        self.thread_id = str(uuid4())
+        self.actor_id = uuid4()
+        self.steps = steps
+
+    def scenarios(self) -> Dict[str, Callable[[], None]]:
+        """The steps of one turn, in order"""
+        message_id = str(uuid4())
+        task_id = str(uuid4())
+        return {
+            "save_message": lambda: self.save_message(message_id),
+            "context_fetch": lambda: self.context_fetch(message_id),
+            "task_state": lambda: self.task_state(message_id, task_id),
+            "step_progress": lambda: self.step_progress(message_id, task_id),
+            "report_cost": lambda: self.report_cost(message_id),
+        }
+
+    def turn(self, timings: Dict[str, List[float]]) -> None:
+        for name, scenario in self.scenarios().items():
+            start = time.perf_counter()
+            scenario()
+            timings[name].append(time.perf_counter() - start)
+
+    def save_message(self, message_id: str) -> None:
+        self.iservice.save_message(
+            Message(
+                message_id=message_id,
+                actor_id=self.actor_id,
+                text="Find papers about hedged requests " * 4,
+                thread_id=self.thread_id,
+                channel_id=self.channel_id,
+                surface=Surface.WEB,
+                ts=datetime.now(timezone.utc),
+            )
+        )
+
+    def context_fetch(self, message_id: str) -> None:
+        self.iservice.fetch_thread_messages_and_events_for_message(
+            message_id, event_types=["step_progress", "step_cost"], most_recent=20
+        )
+
+    def task_state(self, message_id: str, task_id: str) -> None:
+        state_manager: RemoteStateManager[_TaskResult] = RemoteStateManager(
+            AGENT, self.actor_id, self.iservice, self.pubsub, message_id
+        )
+        state_manager.write_state(
+            AsyncTaskState[_TaskResult](
+                task_id=task_id,
+                estimated_time="1m",
+                task_status=TaskStatus.STARTED,
+                task_result=None,
+                extra_state={"query": "hedged requests"},
+            )
+        )
+        state_manager.update_status(task_id, "Searching")
+        state_manager.save_result(task_id, _TaskResult(answer="42"))
+
+    def step_progress(self, message_id: str, task_id: str) -> None:
+        reporter = StepProgressReporter(
+            actor_id=self.actor_id,
+            message_id=message_id,
+            thread_id=self.thread_id,
+            step_progress=StepProgress(short_desc="Answer", task_id=task_id),
+            interactions_service=self.iservice,
+            pubsub_service=self.pubsub,
+        )
+        reporter.create()
+        reporter.start()
+        for i in range(self.steps):
+            child = reporter.create_child_step(short_desc=f"Step {i}")
+            child.create()
+            child.start()
+            child.finish(is_success=True)
+        reporter.finish(is_success=True)
+
+    def report_cost(self, message_id: str) -> None:
+        self.iservice.report_cost(
+            StepCost(
+                actor_id=self.actor_id,
+                message_id=message_id,
+                service_cost=ServiceCost(dollar_cost=0.01, description="LLM call"),
+            )
+        )
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile"""
+    rank = math.ceil(q / 100 * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+def _summary(latencies: List[float], concurrency: int) -> Dict[str, float]:
+    """
+    Latency percentiles, and throughput over the time spent in the scenario: the
+    operations completed per second by `concurrency` agents doing only this
+    """
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "ops_per_second": round(concurrency * len(values) / sum(values), 2),
+        "mean_ms": round(1000 * sum(values) / len(values), 3),
+        "p50_ms": round(1000 * _percentile(values, 50), 3),
+        "p95_ms": round(1000 * _percentile(values, 95), 3),
+        "p99_ms": round(1000 * _percentile(values, 99), 3),
+        "max_ms": round(1000 * values[-1], 3),
+    }
+
+
+def _allocations(agent: _Agent, turns: int) -> Dict[str, Dict[str, float]]:
+    """
+    Mean peak and retained traced memory per scenario, from single-threaded turns.
+    Peak is the most memory the scenario held above what was live when it started.
+    With the http transport this includes the local server's allocations.
+    """
+    peaks: Dict[str, List[int]] = defaultdict(list)
+    retained: Dict[str, List[int]] = defaultdict(list)
+    tracemalloc.start()
+    try:
+        for _ in range(turns):
+            for name, scenario in agent.scenarios().items():
+                tracemalloc.reset_peak()
+                before, _ = tracemalloc.get_traced_memory()
+                scenario()
+                after, peak = tracemalloc.get_traced_memory()
+                peaks[name].append(peak - before)
+                retained[name].append(after - before)
+    finally:
+        tracemalloc.stop()
+    return {
+        name: {
+            "peak_kib": round(sum(peaks[name]) / turns / 1024, 1),
+            "retained_kib": round(sum(retained[name]) / turns / 1024, 1),
+        }
+        for name in SCENARIOS
+    }
+
+
+@contextmanager
+def _services(
+    transport: str, store: InMemoryInteractionStore, pool_size: int
+) -> Iterator[InteractionsService]:
+    with ExitStack() as stack:
+        if transport == "http":
+            base_url = stack.enter_context(serve(store))
+            iservice = InteractionsService(
+                base_url,
+                pool_config=PoolConfig(pool_maxsize=pool_size),
+            )
+        else:
+            iservice = InMemoryInteractionsService(store)
+        stack.enter_context(iservice)
+        yield iservice
+
+
+def run(
+    turns: int,
+    concurrency: int,
+    steps: int,
+    transport: str,
+    alloc_turns: int,
+) -> dict:
+    store = InMemoryInteractionStore()
+    with ExitStack() as stack:
+        pubsub_url = stack.enter_context(serve(store))
+        iservice = stack.enter_context(_services(transport, store, concurrency))
+        pubsub = PubsubService(pubsub_url, namespace="benchmark")
+        channel_id = str(uuid4())
+        iservice.save_channel(
+            Channel(channel_id=channel_id, surface=Surface.WEB, owning_actor_id="bench")
+        )
+        agents = [
+            _Agent(iservice, pubsub, channel_id, steps) for _ in range(concurrency)
+        ]
+
+        timings: Dict[str, List[float]] = defaultdict(list)
+        lock = threading.Lock()
+
+        def run_agent(agent_index: int) -> None:
+            local: Dict[str, List[float]] = defaultdict(list)
+            agent = agents[agent_index]
+            for _ in range(turns // concurrency):
+                agent.turn(local)
+            with lock:
+                for name, values in local.items():
+                    timings[name].extend(values)
+
+        # Warm up connections and lazily built validators
+        agents[0].turn(defaultdict(list))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(run_agent, range(concurrency)))
+        wall_seconds = time.perf_counter() - start
+
+        completed_turns = len(timings["save_message"])
+        scenarios = {name: _summary(timings[name], concurrency) for name in SCENARIOS}
+        if alloc_turns:
+            for name, allocations in _allocations(agents[0], alloc_turns).items():
+                scenarios[name].update(allocations)
+
+    return {
+        "benchmark": "agent_turn",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "turns": completed_turns,
+            "concurrency": concurrency,
+            "steps": steps,
+            "transport": transport,
+            "alloc_turns": alloc_turns,
+        },
+        "wall_seconds": round(wall_seconds, 3),
+        "turns_per_second": round(completed_turns / wall_seconds, 2),
+        "scenarios": scenarios,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--steps", type=int, default=5, help="Child steps reported per turn"
+    )
+    parser.add_argument("--transport", choices=["http", "memory"], default="http")
+    parser.add_argument(
+        "--alloc-turns",
+        type=int,
+        default=20,
+        help="Single-threaded turns run under tracemalloc to measure allocations",
+    )
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args(argv)
+
+    results = run(
+        turns=args.turns,
+        concurrency=args.concurrency,
+        steps=args.steps,
+        transport=args.transport,
+        alloc_turns=args.alloc_turns,
+    )
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
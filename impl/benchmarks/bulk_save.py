@@ -0,0 +1,90 @@
+"""
+Compare events saved per second against a local stub store when saving one
+event per request, with save_events batches, and with the save_events fallback
+of parallel single requests.
+
+    PYTHONPATH=src python -m benchmarks.bulk_save --events 2000
+"""
+
+import argparse
+import time
+from datetime import datetime, timezone
+from typing import Callable, List
+from uuid import uuid4
+
+from benchmarks.stub_server import run_stub_server
+from nora_lib.impl.interactions.interactions_service import InteractionsService
+from nora_lib.impl.interactions.models import Event
+
+
+def _events(count: int) -> List[Event]:
+    actor_id = uuid4()
+    return [
+        Event(
+            type="step_progress",
+            actor_id=actor_id,
+            timestamp=datetime.now(timezone.utc),
+            message_id="m-1",
+            data={"i": i},
+        )
+        for i in range(count)
+    ]
+
+
+def _events_per_second(save: Callable[[List[Event]], None], count: int) -> float:
+    events = _events(count)
+    start = time.perf_counter()
+    save(events)
+    return count / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument(
+        "--latency-ms",
+        type=float,
+        default=1.0,
+        help="Simulated store latency per request",
+    )
+    args = parser.parse_args()
+
+    def save_events(service: InteractionsService) -> Callable[[List[Event]], None]:
+        def save(events: List[Event]) -> None:
+            results = service.save_events(events, max_workers=args.workers)
+            assert all(result.ok for result in results)
+
+        return save
+
+    latency = args.latency_ms / 1000
+    with run_stub_server(batch_writes=True, latency=latency) as base_url:
+        with InteractionsService(base_url, max_batch_size=args.batch_size) as service:
+
+            def one_by_one(events: List[Event]) -> None:
+                for event in events:
+                    service.save_event(event)
+
+            single_eps = _events_per_second(one_by_one, args.events)
+            batch_eps = _events_per_second(save_events(service), args.events)
+
+    with run_stub_server(batch_writes=False, latency=latency) as base_url:
+        with InteractionsService(base_url) as service:
+            parallel_eps = _events_per_second(save_events(service), args.events)
+
+    print(
+        f"events={args.events} batch_size={args.batch_size} workers={args.workers}"
+        f" latency_ms={args.latency_ms}"
+    )
+    print(f"save_event loop:        {single_eps:9.1f} events/s")
+    print(
+        f"save_events (batch):    {batch_eps:9.1f} events/s ({batch_eps / single_eps:.2f}x)"
+    )
+    print(
+        f"save_events (parallel): {parallel_eps:9.1f} events/s ({parallel_eps / single_eps:.2f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
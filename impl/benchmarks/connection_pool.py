@@ -0,0 +1,66 @@
+"""
+Compare calls per second against a local stub store with and without
+connection reuse.
+
+The "unpooled" client issues every call through the module-level
+`requests.request`, opening a new connection each time. The "pooled" client
+is an InteractionsService sharing one keep-alive pool across threads.
+
+    PYTHONPATH=src python -m benchmarks.connection_pool --threads 8 --calls 2000
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import requests
+
+from benchmarks.stub_server import run_stub_server
+from nora_lib.impl.interactions.interactions_service import (
+    InteractionsService,
+    PoolConfig,
+)
+
+
+def _calls_per_second(call: Callable[[int], None], calls: int, threads: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(call, range(calls)))
+    return calls / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    with run_stub_server() as base_url:
+        event_url = f"{base_url}/interaction/v1/search/event"
+
+        def unpooled(i: int) -> None:
+            requests.request("post", event_url, json={"id": str(i)}, timeout=30)
+
+        service = InteractionsService(
+            base_url, pool_config=PoolConfig(pool_maxsize=args.threads)
+        )
+
+        def pooled(i: int) -> None:
+            service.get_event(str(i))
+
+        # Warm up both paths before measuring
+        _calls_per_second(unpooled, args.threads, args.threads)
+        _calls_per_second(pooled, args.threads, args.threads)
+
+        unpooled_cps = _calls_per_second(unpooled, args.calls, args.threads)
+        pooled_cps = _calls_per_second(pooled, args.calls, args.threads)
+        service.close()
+
+    print(f"threads={args.threads} calls={args.calls}")
+    print(f"unpooled: {unpooled_cps:8.1f} calls/s")
+    print(f"pooled:   {pooled_cps:8.1f} calls/s ({pooled_cps / unpooled_cps:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
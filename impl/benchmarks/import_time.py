@@ -0,0 +1,109 @@
+"""
+Measure how long nora_lib modules take to import with `python -X importtime`, and
+fail if any takes longer than its budget or imports a module it shouldn't.
+
+Each module is imported in a fresh interpreter --runs times and the median of its
+cumulative import time is compared with benchmarks/import_time_budget.json. Budgets
+are in milliseconds, set for the CI image with headroom for noise.
+
+    PYTHONPATH=src python -m benchmarks.import_time
+    PYTHONPATH=src python -m benchmarks.import_time --write-budget
+
+--write-budget records the current medians, times --headroom, as the new budgets.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BUDGET_FILE = os.path.join(os.path.dirname(__file__), "import_time_budget.json")
+
+# Heavy dependencies that are only imported when they are used
+LAZY_MODULES = ["boto3", "botocore", "httpx"]
+
+
+def import_time(module: str) -> Tuple[float, List[str]]:
+    """Cumulative import time of a module in ms, and every module it imported"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative_us = None
+    imported = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            # Header
+            continue
+        imported.append(name.strip())
+        if name.strip() == module:
+            cumulative_us = int(cumulative)
+    if cumulative_us is None:
+        raise RuntimeError(f"{module} was not imported")
+    return cumulative_us / 1000, imported
+
+
+def measure(modules: List[str], runs: int) -> Dict[str, dict]:
+    results = {}
+    for module in modules:
+        times = []
+        imported: List[str] = []
+        for _ in range(runs):
+            ms, imported = import_time(module)
+            times.append(ms)
+        results[module] = {
+            "median_ms": round(statistics.median(times), 1),
+            "min_ms": round(min(times), 1),
+            "lazy_modules_imported": sorted(
+                name for name in imported if name.split(".")[0] in LAZY_MODULES
+            ),
+        }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--budget", default=BUDGET_FILE)
+    parser.add_argument("--write-budget", action="store_true")
+    parser.add_argument("--headroom", type=float, default=1.5)
+    args = parser.parse_args()
+
+    with open(args.budget) as f:
+        budget: Dict[str, float] = json.load(f)
+    results = measure(list(budget), args.runs)
+
+    if args.write_budget:
+        budget = {
+            module: round(result["median_ms"] * args.headroom)
+            for module, result in results.items()
+        }
+        with open(args.budget, "w") as f:
+            f.write(json.dumps(budget, indent=2) + "\n")
+
+    failures = []
+    for module, result in results.items():
+        print(
+            f"{module:<50} {result['median_ms']:>7.1f} ms"
+            f"  (budget {budget[module]} ms)"
+        )
+        if result["median_ms"] > budget[module]:
+            failures.append(f"{module} took {result['median_ms']} ms")
+        if result["lazy_modules_imported"]:
+            failures.append(
+                f"{module} imported {', '.join(result['lazy_modules_imported'])}"
+            )
+    if failures:
+        sys.exit("Import time regressions:\n" + "\n".join(failures))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Minimal local stand-in for the Interaction Store, used by the benchmarks.
+
+It speaks HTTP/1.1 so that clients can keep connections alive, and answers
+the endpoints used by InteractionsService with small canned payloads.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+from uuid import uuid4
+
+_ACTOR_ID = str(uuid4())
+
+
+def _event(event_id: str) -> dict:
+    return {
+        "event_id": event_id,
+        "type": "step_progress",
+        "actor_id": _ACTOR_ID,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "data": {},
+    }
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Whether to serve the batch write endpoints
+    batch_writes = True
+    # Seconds to wait before every response, to stand in for network and store time
+    latency = 0.0
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    server: _StubServer
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, Nagle's
+    # algorithm stalls every keep-alive response on a delayed ACK.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def _reply(self, status: int, body: dict) -> None:
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        body = self._read_body()
+        if self.path == "/interaction/v1/event":
+            self._reply(200, {"event_id": str(uuid4())})
+        elif self.path.endswith("/batch") and not self.server.batch_writes:
+            self._reply(404, {})
+        elif self.path == "/interaction/v1/event/batch":
+            self._reply(200, {"event_ids": [str(uuid4()) for _ in body["events"]]})
+        elif self.path == "/interaction/v1/search/event":
+            self._reply(200, {"events": [_event(body.get("id", str(uuid4())))]})
+        elif self.path.startswith("/interaction/v1/"):
+            self._reply(200, {})
+        else:
+            self._reply(404, {})
+
+    def do_PATCH(self):
+        self._read_body()
+        self._reply(200, {})
+
+    def do_GET(self):
+        self._reply(200, {})
+
+
+@contextmanager
+def run_stub_server(batch_writes: bool = True, latency: float = 0.0) -> Iterator[str]:
+    """
+    Serve the stub on a free local port, yielding its base URL
+    :param batch_writes: Whether to serve the batch write endpoints
+    :param latency: Seconds to wait before every response
+    """
+    server = _StubServer(("127.0.0.1", 0), _StubHandler)
+    server.batch_writes = batch_writes
+    server.latency = latency
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        port = server.server_address[1]
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.shutdown()
+        server.server_close()
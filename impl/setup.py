@@ -4,7 +4,10 @@ import setuptools
 runtime_requirements = ["pydantic>=2,<3", "requests", "boto3", "aws_requests_auth", "retry"]
 
 # For running tests, linting, etc
-dev_requirements = ["mypy", "pytest", "black", "types-requests"]
+dev_requirements = ["mypy", "pytest", "black", "types-requests", "httpx"]
+
+# For AsyncInteractionsService
+async_requirements = ["httpx"]
 
 version = os.environ["NORA_LIB_VERSION"]
 
@@ -21,6 +24,7 @@ setuptools.setup(
     },
     extras_require={
         "dev": dev_requirements,
+        "async": async_requirements,
     },
     python_requires=">=3.9",
 )
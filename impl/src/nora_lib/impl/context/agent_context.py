@@ -2,7 +2,7 @@ from typing import Optional
 from uuid import UUID
 
 from nora_lib.impl.interactions.models import Surface
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 from nora_lib.serializers import UuidWithSerializer
 
@@ -12,6 +12,8 @@ class MessageAgentContext(BaseModel):
     Identifiers for the triggering message
     """
 
+    model_config = ConfigDict(defer_build=True)
+
     message_id: str
     thread_id: str
     channel_id: str
@@ -27,6 +29,8 @@ class PubsubAgentContext(BaseModel):
     The pubsub namespace in which the Handler is running
     """
 
+    model_config = ConfigDict(defer_build=True)
+
     base_url: str
     namespace: str
 
@@ -36,6 +40,8 @@ class ToolConfigAgentContext(BaseModel):
     The name of the tool config being used by the handler (dev, prod, demo, etc.)
     """
 
+    model_config = ConfigDict(defer_build=True)
+
     env: str
 
 
@@ -44,6 +50,8 @@ class AgentContext(BaseModel):
     Information that needs to be passed from the Handler to tool agents
     """
 
+    model_config = ConfigDict(defer_build=True)
+
     message: MessageAgentContext
     pubsub: PubsubAgentContext
     tool_config: ToolConfigAgentContext
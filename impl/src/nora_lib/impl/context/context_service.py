@@ -30,4 +30,4 @@ class ContextService:
         if message.annotated_text:
             return message.annotated_text
         else:
-            return message.text
+            return message.text or ""
@@ -1,10 +1,12 @@
 from typing import Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class WrappedTaskObject(BaseModel):
     """Encloses request or response object with additional metadata"""
 
+    model_config = ConfigDict(defer_build=True)
+
     message_id: str = Field(
         description="id of originating message; key for istore retrieval"
     )
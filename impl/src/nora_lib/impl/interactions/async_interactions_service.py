@@ -0,0 +1,515 @@
+"""
+Asyncio client for the Interactions API.
+
+Mirrors InteractionsService method for method, using the same request bodies,
+pydantic models and RetryConfig semantics. Requires httpx, which is installed
+with the `async` extra of nora_lib-impl.
+"""
+
+import asyncio
+import logging
+import os
+import random
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+from uuid import UUID
+
+try:
+    import httpx
+except ImportError as e:
+    raise ImportError(
+        "AsyncInteractionsService requires httpx. Install nora_lib-impl[async]."
+    ) from e
+
+from nora_lib.impl.interactions.auth import (
+    DEFAULT_SECRET_ID,
+    SecretsManagerTokenProvider,
+    TokenProvider,
+)
+from nora_lib.impl.interactions.interactions_service import (
+    InteractionsService,
+    PoolConfig,
+    RetryConfig,
+    VirtualThreadTagError,
+)
+from nora_lib.impl.interactions.models import (
+    AnnotationBatch,
+    Channel,
+    Event,
+    Message,
+    ReturnedMessage,
+    StepCost,
+    Thread,
+    ThreadRelationsResponse,
+    ThreadStatus,
+)
+
+T = TypeVar("T")
+
+
+class RetryableAsyncInteractionStoreException(Exception):
+    # Async counterpart of RetryableInteractionStoreException
+    def __init__(self, message: str, response: httpx.Response):
+        super().__init__(message)
+        # Carry this along in case our last try fails.
+        self.response = response
+
+
+class TokenProviderAuth(httpx.Auth):
+    """httpx auth that sends the current token of a TokenProvider"""
+
+    def __init__(self, provider: TokenProvider):
+        self.provider = provider
+
+    def sync_auth_flow(self, request):
+        request.headers["Authorization"] = f"Bearer {self.provider.token()}"
+        yield request
+
+    async def async_auth_flow(self, request):
+        if self.provider.needs_fetch():
+            # Don't block the event loop on the fetch
+            token = await asyncio.get_running_loop().run_in_executor(
+                None, self.provider.token
+            )
+        else:
+            token = self.provider.token()
+        request.headers["Authorization"] = f"Bearer {token}"
+        yield request
+
+
+async def _retry_async(
+    func: Callable[[], Awaitable[T]], retry_config: RetryConfig
+) -> T:
+    """
+    Await func, retrying on RetryableAsyncInteractionStoreException.
+    Follows the same schedule as the `retry` decorator used by InteractionsService.
+    """
+    tries = retry_config.tries
+    delay: float = retry_config.delay
+    while tries:
+        try:
+            return await func()
+        except RetryableAsyncInteractionStoreException:
+            tries -= 1
+            if not tries:
+                raise
+            await asyncio.sleep(delay)
+            delay *= retry_config.backoff
+            if isinstance(retry_config.jitter, tuple):
+                delay += random.uniform(*retry_config.jitter)
+            else:
+                delay += retry_config.jitter
+            if retry_config.max_delay is not None:
+                delay = min(delay, retry_config.max_delay)
+    raise ValueError("RetryConfig.tries must not be 0")
+
+
+class AsyncInteractionsService:
+    """
+    Asyncio service which saves interactions to the Interactions API
+
+    All calls share one httpx.AsyncClient connection pool, so a single event loop
+    can keep many calls in flight. Create one instance per event loop and close it
+    with `aclose()` or `async with`.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: int = 30,
+        token: Optional[str] = None,
+        auth: Optional[httpx.Auth] = None,
+        token_provider: Optional[TokenProvider] = None,
+        retry_config: RetryConfig = RetryConfig(),
+        pool_config: PoolConfig = PoolConfig(),
+        max_connections: Optional[int] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        """
+        :param token_provider: Supplies the bearer token when neither `token` nor
+            `auth` is given. It is first resolved when the first request is sent.
+        :param max_connections: Upper bound on concurrent connections. Defaults to
+            pool_config.pool_maxsize if pool_config.pool_block is set, else unbounded.
+        :param transport: Optional httpx transport, e.g. for testing
+        """
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retry_config = retry_config
+        self.pool_config = pool_config
+        headers = {}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+            # As in InteractionsService, a token takes precedence over auth
+            auth = None
+        elif auth is None and token_provider is not None:
+            auth = TokenProviderAuth(token_provider)
+        if not pool_config.keep_alive:
+            headers["Connection"] = "close"
+        if max_connections is None and pool_config.pool_block:
+            max_connections = pool_config.pool_maxsize
+        self._client = httpx.AsyncClient(
+            auth=auth,
+            headers=headers,
+            # httpx reads an explicit None as no timeout, so unset ones fall back
+            # to `timeout`, as in InteractionsService
+            timeout=httpx.Timeout(
+                timeout,
+                connect=(
+                    pool_config.connect_timeout
+                    if pool_config.connect_timeout is not None
+                    else timeout
+                ),
+                read=(
+                    pool_config.read_timeout
+                    if pool_config.read_timeout is not None
+                    else timeout
+                ),
+            ),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=(
+                    pool_config.pool_maxsize if pool_config.keep_alive else 0
+                ),
+            ),
+            transport=transport,
+        )
+
+    async def __aenter__(self) -> "AsyncInteractionsService":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close all pooled connections"""
+        await self._client.aclose()
+
+    async def _call(
+        self, method: str, url: str, json: Optional[Dict[str, Any]] = None
+    ) -> httpx.Response:
+        async def call_helper() -> httpx.Response:
+            response = await self._client.request(method=method, url=url, json=json)
+            # 501 Not Implemented won't change on a retry
+            if response.status_code >= 500 and response.status_code != 501:
+                raise RetryableAsyncInteractionStoreException(
+                    f"Encountered a retryable exception, status code {response.status_code}",
+                    response,
+                )
+            else:
+                return response
+
+        try:
+            return await _retry_async(call_helper, self.retry_config)
+        except RetryableAsyncInteractionStoreException as exc:
+            # If our last try failed, return the response and let the caller decide
+            # what to do with it.
+            return exc.response
+
+    async def save_message(
+        self, message: Message, virtual_thread_id: Optional[str] = None
+    ) -> None:
+        """
+        Save a message to the Interaction Store
+        :param virtual_thread_id: Optional ID of a virtual thread to associate with the message
+        """
+        message_url = f"{self.base_url}/interaction/v1/message"
+        response = await self._call("post", message_url, message.model_dump())
+        response.raise_for_status()
+        if virtual_thread_id:
+            await self.save_event(
+                InteractionsService._message_tag(message, virtual_thread_id)
+            )
+
+    async def save_event(
+        self, event: Event, virtual_thread_id: Optional[str] = None
+    ) -> str:
+        """
+        Save an event to the Interaction Store. Returns an event id.
+        :param virtual_thread_id: Optional ID of a virtual thread to associate with the event.
+            The tag that associates it is sent once the event is saved. If only the
+            event was saved, VirtualThreadTagError is raised with its id.
+        """
+        if virtual_thread_id:
+            tag = InteractionsService._event_tag(event, virtual_thread_id)
+            # Saved in order, so a failed event never leaves a tag behind
+            event_id = await self._save_event(event)
+            try:
+                await self._save_event(tag)
+            except Exception as e:
+                raise VirtualThreadTagError(event_id, e) from e
+            return event_id
+        return await self._save_event(event)
+
+    async def _save_event(self, event: Event) -> str:
+        method, event_url = InteractionsService._event_endpoint(self.base_url, event)
+        response = await self._call(method, event_url, event.model_dump())
+        response.raise_for_status()
+        return InteractionsService._saved_event_id(event, response.json())
+
+    async def save_channel(self, channel: Channel) -> None:
+        """Save a channel to the Interactions API"""
+        channel_url = f"{self.base_url}/interaction/v1/channel"
+        response = await self._call("post", channel_url, channel.model_dump())
+        response.raise_for_status()
+
+    async def save_thread(self, thread: Thread) -> None:
+        """Save a thread to the Interactions API"""
+        thread_url = f"{self.base_url}/interaction/v1/thread"
+        response = await self._call("post", thread_url, thread.model_dump())
+        response.raise_for_status()
+
+    async def delete_thread(self, thread_id: str) -> None:
+        """
+        Delete a thread and all its associated data from the Interactions API.
+        See InteractionsService.delete_thread.
+        """
+        thread_url = f"{self.base_url}/interaction/v1/thread/{thread_id}"
+        response = await self._call("delete", thread_url)
+        response.raise_for_status()
+
+    async def save_message_reaction(
+        self, message_id: str, reaction: str, actor_id: UUID
+    ) -> str:
+        """Save reaction as an event on a message, returns event id if successful"""
+        return await self.save_event(
+            InteractionsService._reaction_event(message_id, reaction, actor_id)
+        )
+
+    async def save_message_feedback(
+        self, message_id: str, feedback: str, actor_id: UUID
+    ) -> str:
+        """Save feedback as an event on a message, returns event id if successful"""
+        return await self.save_event(
+            InteractionsService._message_feedback_event(message_id, feedback, actor_id)
+        )
+
+    async def save_thread_feedback(
+        self, thread_id: str, feedback: str, actor_id: UUID
+    ) -> str:
+        """Save feedback as an event on a thread, returns event id if successful"""
+        return await self.save_event(
+            InteractionsService._thread_feedback_event(thread_id, feedback, actor_id)
+        )
+
+    async def get_virtual_thread_content(
+        self, message_id: str, virtual_thread_id: str
+    ) -> List[ReturnedMessage]:
+        """Fetch all messages and events in a virtual thread.
+        See InteractionsService.get_virtual_thread_content. Unlike it, this doesn't
+        keep a VirtualThreadIndex: it only looks at the given message and the 100
+        messages before it, with all of their events.
+        """
+        message_search_url = f"{self.base_url}/interaction/v1/search/message"
+        response = await self._call(
+            "post",
+            message_search_url,
+            InteractionsService._virtual_thread_request(message_id),
+        )
+        response.raise_for_status()
+        return InteractionsService._virtual_thread_content(
+            response.json(), virtual_thread_id
+        )
+
+    async def save_annotation(self, annotation: AnnotationBatch) -> None:
+        """Save an annotation to the Interactions API"""
+        annotation_url = f"{self.base_url}/interaction/v1/annotation"
+        response = await self._call("post", annotation_url, annotation.model_dump())
+        response.raise_for_status()
+
+    async def get_message(self, message_id: str) -> ReturnedMessage:
+        """Fetch a message from the Interactions API"""
+        message_url = f"{self.base_url}/interaction/v1/search/message"
+        response = await self._call(
+            "post",
+            message_url,
+            InteractionsService._get_message_request(message_id),
+        )
+        response.raise_for_status()
+        return InteractionsService._returned_message(response.json()["message"])
+
+    async def get_event(self, event_id: str) -> Event:
+        """Fetch an event from the Interactions API"""
+        event_url = f"{self.base_url}/interaction/v1/search/event"
+        response = await self._call("post", event_url, {"id": event_id})
+        response.raise_for_status()
+        return InteractionsService._returned_event(response.json())
+
+    async def fetch_all_threads_by_channel(
+        self,
+        channel_id: str,
+        min_timestamp: Optional[str] = None,
+        thread_event_types: Optional[list[str]] = None,
+        most_recent: Optional[int] = None,
+    ) -> dict:
+        """Fetch threads and their messages for a channel"""
+        channel_url = f"{self.base_url}/interaction/v1/search/channel"
+        response = await self._call(
+            "post",
+            channel_url,
+            InteractionsService._channel_lookup_request(
+                channel_id=channel_id,
+                min_timestamp=min_timestamp,
+                thread_event_types=thread_event_types,
+                most_recent=most_recent,
+            ),
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def fetch_thread_messages_and_events_for_message(
+        self,
+        message_id: str,
+        event_types: List[str],
+        min_timestamp: Optional[str] = None,
+        most_recent: Optional[int] = None,
+    ) -> ThreadRelationsResponse:
+        """Fetch messages sorted by timestamp and events for agent context"""
+        message_url = f"{self.base_url}/interaction/v1/search/message"
+        response = await self._call(
+            "post",
+            message_url,
+            InteractionsService._thread_lookup_request(
+                message_id,
+                event_types=event_types,
+                min_timestamp=min_timestamp,
+                most_recent=most_recent,
+            ),
+        )
+        response.raise_for_status()
+        return InteractionsService._thread_relations(response.json())
+
+    async def fetch_messages_and_events_for_thread(
+        self,
+        thread_id: str,
+        event_type: Optional[str] = None,
+        min_timestamp: Optional[str] = None,
+    ) -> dict:
+        """Fetch messages and events for the given thread from the Interactions API"""
+        thread_search_url = f"{self.base_url}/interaction/v1/search/thread"
+        response = await self._call(
+            "post",
+            thread_search_url,
+            InteractionsService._messages_and_events_for_thread_request(
+                thread_id, event_type, min_timestamp
+            ),
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def fetch_events_for_message(
+        self,
+        message_id: str,
+        event_type: Optional[str] = None,
+    ) -> dict:
+        """Fetch events for a given message from the Interactions API"""
+        message_search_url = f"{self.base_url}/interaction/v1/search/message"
+        response = await self._call(
+            "post",
+            message_search_url,
+            InteractionsService._events_for_message_request(message_id, event_type),
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def get_channel(self, channel_id: str) -> Optional[Channel]:
+        """Fetch a channel by ID"""
+        url = f"{self.base_url}/interaction/v1/search/channel"
+        response = await self._call("post", url, {"id": channel_id})
+        response.raise_for_status()
+        return InteractionsService._returned_channel(response.json())
+
+    async def get_channel_by_context(self, context_id: str) -> Optional[Channel]:
+        """
+        Fetch a channel by a context ID. The context_id may be the ID of a
+        channel, thread, message, or event.
+        """
+        url = f"{self.base_url}/interaction/v1/channel/by-context/{context_id}"
+        response = await self._call("get", url)
+        response.raise_for_status()
+        return InteractionsService._returned_channel(response.json())
+
+    async def fetch_all_by_channel(
+        self,
+        channel_id: str,
+        min_timestamp: Optional[str] = None,
+        before_timestamp: Optional[str] = None,
+        event_types: Optional[List[str]] = None,
+        num_most_recent_threads: Optional[int] = None,
+        num_most_recent_messages_per_thread: Optional[int] = None,
+        num_oldest_messages_per_thread: Optional[int] = None,
+        thread_status: List[ThreadStatus] = [ThreadStatus.ACTIVE],
+    ) -> dict:
+        """
+        Fetch all threads, messages, and events including nested ones for a given channel
+        """
+        channel_search_url = f"{self.base_url}/interaction/v1/search/channel"
+        response = await self._call(
+            "post",
+            channel_search_url,
+            InteractionsService._fetch_all_by_channel_request(
+                channel_id,
+                min_timestamp=min_timestamp,
+                before_timestamp=before_timestamp,
+                event_types=event_types,
+                num_most_recent_threads=num_most_recent_threads,
+                num_most_recent_messages_per_thread=num_most_recent_messages_per_thread,
+                num_oldest_messages_per_thread=num_oldest_messages_per_thread,
+                thread_status=thread_status,
+            ),
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def fetch_all_by_thread(
+        self,
+        thread_id: str,
+        min_timestamp: Optional[str] = None,
+        event_types: Optional[List[str]] = None,
+        most_recent: Optional[int] = None,
+    ) -> dict:
+        """
+        Fetch all messages and events including nested ones for a given thread
+        """
+        thread_search_url = f"{self.base_url}/interaction/v1/search/thread"
+        response = await self._call(
+            "post",
+            thread_search_url,
+            InteractionsService._fetch_all_by_thread_request(
+                thread_id,
+                min_timestamp=min_timestamp,
+                event_types=event_types,
+                most_recent=most_recent,
+            ),
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def report_cost(self, step_cost: StepCost) -> Optional[str]:
+        """Save a cost report to the Interactions Store. Returning event id"""
+        try:
+            return await self.save_event(step_cost.to_event())
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                logging.warning(
+                    f"Cannot find message id {step_cost.message_id} to attach cost report to."
+                )
+                return None
+            else:
+                raise e
+
+    @staticmethod
+    def from_env() -> "AsyncInteractionsService":
+        """
+        Load the configuration based on the environment. If INTERACTION_STORE_TOKEN
+        isn't set, the token is read from Secrets Manager on the first request.
+        """
+        url = os.getenv(
+            "INTERACTION_STORE_URL",
+            "http://localhost:8090",
+        )
+        token = os.getenv("INTERACTION_STORE_TOKEN")
+        if token:
+            return AsyncInteractionsService(base_url=url, token=token)
+        return AsyncInteractionsService(
+            base_url=url,
+            token_provider=SecretsManagerTokenProvider.shared(DEFAULT_SECRET_ID),
+        )
@@ -0,0 +1,192 @@
+"""
+Bearer tokens for the Interaction Store, resolved on first use and refreshed in the
+background before they expire.
+"""
+
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Optional
+
+import requests
+
+# Reads a secret's SecretString given its ID
+SecretSource = Callable[[str], str]
+
+DEFAULT_SECRET_ID = "nora/prod/interaction-bearer-token"
+DEFAULT_REGION = "us-west-2"
+
+
+class TokenProvider(ABC):
+    """Supplies the bearer token sent with each request"""
+
+    @abstractmethod
+    def token(self) -> str:
+        """The current token, fetching it if there is none yet"""
+
+    def needs_fetch(self) -> bool:
+        """Whether token() would block on a fetch"""
+        return False
+
+
+class StaticTokenProvider(TokenProvider):
+    def __init__(self, token: str):
+        self._token = token
+
+    def token(self) -> str:
+        return self._token
+
+
+class RefreshingTokenProvider(TokenProvider):
+    """
+    Fetches a token on first use and keeps it for `ttl` seconds. Once a token is
+    within `refresh_before` seconds of expiring, the next call returns it and starts
+    a refresh on a background thread, so callers only wait on the first fetch and
+    after a token has fully expired. A failed background refresh is logged, and the
+    old token is used until it expires.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], str],
+        ttl: float = 3600,
+        refresh_before: float = 300,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.refresh_before = refresh_before
+        self.clock = clock
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refreshing = False
+        # Held while fetching, so concurrent first calls share one fetch
+        self._fetch_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    def token(self) -> str:
+        now = self.clock()
+        with self._lock:
+            token = self._token
+            expires_at = self._expires_at
+            refresh = (
+                token is not None
+                and now < expires_at
+                and now >= expires_at - self.refresh_before
+                and not self._refreshing
+            )
+            if refresh:
+                self._refreshing = True
+        if token is not None and now < expires_at:
+            if refresh:
+                threading.Thread(
+                    target=self._refresh, name="token-refresh", daemon=True
+                ).start()
+            return token
+        with self._fetch_lock:
+            with self._lock:
+                if self._token is not None and self.clock() < self._expires_at:
+                    # Fetched by another thread while this one waited
+                    return self._token
+            return self._store(self.fetch())
+
+    def needs_fetch(self) -> bool:
+        with self._lock:
+            return self._token is None or self.clock() >= self._expires_at
+
+    def invalidate(self) -> None:
+        """Drop the current token, e.g. after it has been rejected"""
+        with self._lock:
+            self._token = None
+            self._expires_at = 0.0
+
+    def _store(self, token: str) -> str:
+        with self._lock:
+            self._token = token
+            self._expires_at = self.clock() + self.ttl
+        return token
+
+    def _refresh(self) -> None:
+        try:
+            with self._fetch_lock:
+                self._store(self.fetch())
+        except Exception:
+            logging.warning("Failed to refresh bearer token", exc_info=True)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+
+def secrets_manager_source(region_name: str = DEFAULT_REGION) -> SecretSource:
+    """SecretSource backed by AWS Secrets Manager. boto3 is imported on first read."""
+    client = None
+
+    def read(secret_id: str) -> str:
+        nonlocal client
+        if client is None:
+            import boto3
+
+            client = boto3.client("secretsmanager", region_name=region_name)
+        return client.get_secret_value(SecretId=secret_id)["SecretString"]
+
+    return read
+
+
+class SecretsManagerTokenProvider(RefreshingTokenProvider):
+    """Reads the token from the `token` field of a JSON secret"""
+
+    _shared: Dict[str, "SecretsManagerTokenProvider"] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        secret_id: str = DEFAULT_SECRET_ID,
+        source: Optional[SecretSource] = None,
+        ttl: float = 3600,
+        refresh_before: float = 300,
+    ):
+        """
+        :param source: Where to read the secret from. Defaults to Secrets Manager;
+            pass a local source, e.g. a dict's __getitem__, in tests.
+        """
+        self.secret_id = secret_id
+        self.source = source if source is not None else secrets_manager_source()
+        super().__init__(self._read_token, ttl=ttl, refresh_before=refresh_before)
+
+    def _read_token(self) -> str:
+        return json.loads(self.source(self.secret_id))["token"]
+
+    @classmethod
+    def shared(
+        cls, secret_id: str = DEFAULT_SECRET_ID
+    ) -> "SecretsManagerTokenProvider":
+        """
+        Provider for a secret shared by every caller in the process, so services
+        created one after another fetch the token once
+        """
+        with cls._shared_lock:
+            provider = cls._shared.get(secret_id)
+            if provider is None:
+                provider = cls(secret_id)
+                cls._shared[secret_id] = provider
+            return provider
+
+
+class BearerAuth(requests.auth.AuthBase):
+    """Sends a token, or the current token of a TokenProvider, as a bearer token"""
+
+    def __init__(self, token):
+        if isinstance(token, TokenProvider):
+            self.provider = token
+        else:
+            self.provider = StaticTokenProvider(token)
+
+    @property
+    def token(self) -> str:
+        return self.provider.token()
+
+    def __call__(self, r):
+        r.headers["Authorization"] = f"Bearer {self.token}"
+        return r
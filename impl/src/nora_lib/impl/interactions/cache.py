@@ -0,0 +1,187 @@
+"""
+Read-through cache for entities fetched from the Interaction Store.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+from pydantic import BaseModel
+
+from nora_lib.impl.interactions.models import (
+    AnnotationBatch,
+    Channel,
+    Event,
+    Message,
+)
+
+V = TypeVar("V", bound=Optional[BaseModel])
+
+
+@dataclass
+class CachePolicy:
+    # Maximum number of entries. Least recently used entries are evicted first.
+    # A size of 0 disables caching for the entity type.
+    max_size: int = 1000
+    # Entries older than this are refetched. None means entries never expire.
+    ttl_seconds: Optional[float] = 300
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+
+class InteractionsCache:
+    """
+    LRU/TTL cache for messages, events and channels, used by InteractionsService
+
+    Each entity type has its own CachePolicy. Writes made through the service
+    evict the entries they affect, e.g. saving an event evicts the message it is
+    attached to, since get_message returns the message's events.
+    Cached models are copied on the way in and out, so callers may modify them.
+    """
+
+    MESSAGE = "message"
+    EVENT = "event"
+    CHANNEL = "channel"
+    CHANNEL_BY_CONTEXT = "channel_by_context"
+
+    def __init__(
+        self,
+        policies: Optional[Dict[str, CachePolicy]] = None,
+        default_policy: CachePolicy = CachePolicy(),
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param policies: Policies by entity type, e.g. {InteractionsCache.EVENT: CachePolicy(ttl_seconds=10)}
+        :param default_policy: Policy for entity types not in `policies`
+        :param clock: Source of time for TTLs, in seconds
+        """
+        self.policies = policies or {}
+        self.default_policy = default_policy
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: Dict[str, "OrderedDict[str, Tuple[float, BaseModel]]"] = {}
+        self._stats: Dict[str, CacheStats] = {}
+
+    def policy(self, kind: str) -> CachePolicy:
+        return self.policies.get(kind, self.default_policy)
+
+    def stats(self) -> Dict[str, CacheStats]:
+        """Counters by entity type"""
+        with self._lock:
+            return {
+                kind: CacheStats(**vars(stats)) for kind, stats in self._stats.items()
+            }
+
+    def get(self, kind: str, key: str) -> Optional[BaseModel]:
+        """Return a copy of the cached value, or None if absent or expired"""
+        with self._lock:
+            stats = self._stats.setdefault(kind, CacheStats())
+            entries = self._entries.setdefault(kind, OrderedDict())
+            entry = entries.get(key)
+            if entry is None:
+                stats.misses += 1
+                return None
+            stored_at, value = entry
+            ttl = self.policy(kind).ttl_seconds
+            if ttl is not None and self._clock() - stored_at > ttl:
+                del entries[key]
+                stats.misses += 1
+                return None
+            entries.move_to_end(key)
+            stats.hits += 1
+        return value.model_copy(deep=True)
+
+    def put(self, kind: str, key: str, value: BaseModel) -> None:
+        policy = self.policy(kind)
+        if policy.max_size <= 0:
+            return
+        value = value.model_copy(deep=True)
+        with self._lock:
+            stats = self._stats.setdefault(kind, CacheStats())
+            entries = self._entries.setdefault(kind, OrderedDict())
+            entries[key] = (self._clock(), value)
+            entries.move_to_end(key)
+            while len(entries) > policy.max_size:
+                entries.popitem(last=False)
+                stats.evictions += 1
+
+    def get_or_fetch(self, kind: str, key: str, fetch: Callable[[], V]) -> V:
+        """Return the cached value, or fetch it and cache it if it isn't None"""
+        if self.policy(kind).max_size <= 0:
+            return fetch()
+        cached = self.get(kind, key)
+        if cached is not None:
+            return cached  # type: ignore[return-value]
+        value = fetch()
+        if value is not None:
+            self.put(kind, key, value)
+        return value
+
+    def invalidate(self, kind: str, key: Optional[str] = None) -> None:
+        """Evict one entry, or every entry of a type if no key is given"""
+        with self._lock:
+            entries = self._entries.get(kind)
+            if not entries:
+                return
+            stats = self._stats.setdefault(kind, CacheStats())
+            if key is None:
+                stats.invalidations += len(entries)
+                entries.clear()
+            elif entries.pop(key, None) is not None:
+                stats.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def on_saved(self, item: BaseModel) -> None:
+        """Evict entries made stale by saving an item to the Interaction Store"""
+        if isinstance(item, Event):
+            if item.event_id:
+                self.invalidate(self.EVENT, item.event_id)
+            if item.message_id:
+                self.invalidate(self.MESSAGE, item.message_id)
+        elif isinstance(item, (Message, AnnotationBatch)):
+            self.invalidate(self.MESSAGE, item.message_id)
+        elif isinstance(item, Channel):
+            self.invalidate(self.CHANNEL, item.channel_id)
+            self._invalidate_where(
+                self.CHANNEL_BY_CONTEXT,
+                lambda channel: channel.channel_id == item.channel_id,
+            )
+
+    def on_thread_deleted(self, thread_id: str) -> None:
+        """Evict cached messages and events that belonged to a deleted thread"""
+        message_ids = set(
+            self._invalidate_where(
+                self.MESSAGE, lambda message: message.thread_id == thread_id
+            )
+        )
+        self._invalidate_where(
+            self.EVENT,
+            lambda event: event.thread_id == thread_id
+            or event.message_id in message_ids,
+        )
+        self.invalidate(self.CHANNEL_BY_CONTEXT, thread_id)
+        for message_id in message_ids:
+            self.invalidate(self.CHANNEL_BY_CONTEXT, message_id)
+
+    def _invalidate_where(self, kind: str, predicate: Callable[..., bool]) -> List[str]:
+        """Evict entries of a type whose value matches the predicate, returning their keys"""
+        with self._lock:
+            entries = self._entries.get(kind)
+            if not entries:
+                return []
+            stale = [key for key, (_, value) in entries.items() if predicate(value)]
+            for key in stale:
+                del entries[key]
+            self._stats.setdefault(kind, CacheStats()).invalidations += len(stale)
+            return stale
@@ -0,0 +1,134 @@
+"""
+Compression of Interaction Store request and response bodies.
+"""
+
+import gzip
+import threading
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from requests import Response
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is optional
+    zstandard = None  # type: ignore[assignment]
+
+GZIP = "gzip"
+ZSTD = "zstd"
+
+
+def supported_response_encodings() -> Tuple[str, ...]:
+    """Response encodings this process can decode, most compact first"""
+    # urllib3 decodes zstd responses only when the zstandard package is installed
+    from urllib3.response import HTTPResponse
+
+    decoders = set(HTTPResponse.CONTENT_DECODERS)
+    return tuple(e for e in (ZSTD, "br", GZIP, "deflate") if e in decoders)
+
+
+@dataclass
+class CompressionConfig:
+    # Response encodings to accept, in order of preference. Encodings this process
+    # can't decode are left out of the Accept-Encoding header.
+    accept_encodings: Tuple[str, ...] = (ZSTD, GZIP)
+    # Compress request bodies of at least this many bytes. None leaves request
+    # bodies uncompressed; only enable it if the store accepts Content-Encoding.
+    request_min_bytes: Optional[int] = None
+    # Encoding used for request bodies, "gzip" or "zstd"
+    request_encoding: str = GZIP
+    # 1 is fastest, higher levels trade CPU for smaller bodies
+    level: int = 3
+
+    def accept_encoding_header(self) -> str:
+        supported = supported_response_encodings()
+        accepted = [e for e in self.accept_encodings if e in supported]
+        return ", ".join(accepted) if accepted else "identity"
+
+    def compress(self, body: bytes) -> Optional[bytes]:
+        """The compressed body, or None if it is below the threshold"""
+        if self.request_min_bytes is None or len(body) < self.request_min_bytes:
+            return None
+        if self.request_encoding == GZIP:
+            return gzip.compress(body, compresslevel=self.level)
+        if self.request_encoding == ZSTD:
+            if zstandard is None:
+                raise ImportError(
+                    "zstd request compression requires the zstandard package"
+                )
+            return zstandard.ZstdCompressor(level=self.level).compress(body)
+        raise ValueError(f"Unsupported request encoding {self.request_encoding}")
+
+
+@dataclass
+class WireStats:
+    """Byte counts for calls to the Interaction Store, before and after compression"""
+
+    requests: int = 0
+    # Request bodies as serialized, and as sent
+    request_body_bytes: int = 0
+    request_wire_bytes: int = 0
+    # Response bodies as received, and once decoded
+    response_wire_bytes: int = 0
+    response_body_bytes: int = 0
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> "WireStats":
+        with self._lock:
+            return WireStats(
+                requests=self.requests,
+                request_body_bytes=self.request_body_bytes,
+                request_wire_bytes=self.request_wire_bytes,
+                response_wire_bytes=self.response_wire_bytes,
+                response_body_bytes=self.response_body_bytes,
+            )
+
+    def record(
+        self, response: Response, request_body_bytes: Optional[int]
+    ) -> Tuple[int, int]:
+        """
+        Count one request and its response. Returns the bytes sent and received.
+        :param request_body_bytes: Size of the request body before compression,
+            if known. Defaults to the size sent.
+        """
+        request_wire_bytes = _request_wire_bytes(response)
+        body = response.content or b""
+        response_wire_bytes = _response_wire_bytes(response, len(body))
+        with self._lock:
+            self.requests += 1
+            self.request_wire_bytes += request_wire_bytes
+            self.request_body_bytes += (
+                request_body_bytes
+                if request_body_bytes is not None
+                else request_wire_bytes
+            )
+            self.response_wire_bytes += response_wire_bytes
+            self.response_body_bytes += len(body)
+        return request_wire_bytes, response_wire_bytes
+
+
+def _request_wire_bytes(response: Response) -> int:
+    request = response.request
+    body = request.body if request is not None else None
+    if body is None:
+        return 0
+    return len(body.encode("utf-8") if isinstance(body, str) else body)
+
+
+def _response_wire_bytes(response: Response, decoded_bytes: int) -> int:
+    raw = response.raw
+    # urllib3 counts the bytes it read from the socket, before decoding
+    tell = getattr(raw, "tell", None)
+    if callable(tell):
+        try:
+            read = tell()
+            if isinstance(read, int) and read > 0:
+                return read
+        except (OSError, ValueError):
+            pass
+    content_length = response.headers.get("Content-Length")
+    if content_length and content_length.isdigit():
+        return int(content_length)
+    return decoded_bytes
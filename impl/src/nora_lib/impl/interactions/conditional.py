@@ -0,0 +1,128 @@
+"""
+Conditional reads, so polling an unchanged resource doesn't download it again.
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, Optional
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+
+@dataclass
+class ConditionalReadStats:
+    # Reads answered 304 Not Modified and served from the cache
+    not_modified: int = 0
+    # Reads sent with a validator that returned a new body
+    modified: int = 0
+    # Reads sent without a validator, because none was cached
+    unconditional: int = 0
+
+
+class _Entry:
+    def __init__(self, response: Response):
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+        # Decoded body, i.e. after any Content-Encoding was removed
+        self.content = response.content
+        self.headers = CaseInsensitiveDict(response.headers)
+        self.headers.pop("Content-Encoding", None)
+        self.headers.pop("Content-Length", None)
+        self.encoding = response.encoding
+
+    def request_headers(self) -> Dict[str, str]:
+        """Conditional headers to send with the read this entry answers"""
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ConditionalReadCache:
+    """
+    Validators (ETag and Last-Modified) and bodies of successful reads, by request
+
+    InteractionsService sends the validators it holds for a GET as If-None-Match
+    and If-Modified-Since. When the store answers 304 Not Modified, the caller gets
+    the cached body as a 200 response, so callers don't need to handle 304s. The
+    entry is looked up before the request is sent, so a 304 can be answered even
+    if the entry is evicted while the request is in flight.
+    Searches are POSTs, which HTTP doesn't make conditional, so they aren't
+    cached: the Interaction Store serves get_channel and thread reads as searches,
+    leaving get_channel_by_context as the only read this applies to.
+    Responses without validators aren't kept. The least recently used entries are
+    evicted once there are more than `max_entries`.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self.stats = ConditionalReadStats()
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, key: Hashable) -> Optional[_Entry]:
+        """
+        The cached response to a read, if any. Its request_headers() are sent with
+        the read, and it is passed to resolve() with the response.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def resolve(
+        self, key: Hashable, response: Response, entry: Optional[_Entry]
+    ) -> Response:
+        """
+        Remember the validators of a response, or if it is a 304, replace it with
+        the cached response
+        :param entry: What lookup() returned before the read was sent
+        """
+        with self._lock:
+            if response.status_code == 304 and entry is not None:
+                self.stats.not_modified += 1
+                entry.etag = response.headers.get("ETag", entry.etag)
+                entry.last_modified = response.headers.get(
+                    "Last-Modified", entry.last_modified
+                )
+                return _cached_response(entry, response)
+            if entry is None:
+                self.stats.unconditional += 1
+            else:
+                self.stats.modified += 1
+            if response.status_code == 200 and (
+                "ETag" in response.headers or "Last-Modified" in response.headers
+            ):
+                self._entries[key] = _Entry(response)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.pop(key, None)
+        return response
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def _cached_response(entry: _Entry, not_modified: Response) -> Response:
+    response = Response()
+    response.status_code = 200
+    response.reason = "OK"
+    response.url = not_modified.url
+    response.request = not_modified.request
+    response.elapsed = not_modified.elapsed
+    response.headers = CaseInsensitiveDict(entry.headers)
+    # Validators may be updated by a 304
+    for header in ("ETag", "Last-Modified", "Date", "Cache-Control"):
+        if header in not_modified.headers:
+            response.headers[header] = not_modified.headers[header]
+    response._content = entry.content
+    response.encoding = entry.encoding
+    return response
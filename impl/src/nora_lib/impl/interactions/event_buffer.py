@@ -0,0 +1,152 @@
+"""
+Write-behind buffering for InteractionsService.save_event.
+
+Events are queued in memory and saved by background worker threads, so the
+caller doesn't wait on a round trip to the Interaction Store.
+"""
+
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+
+from nora_lib.impl.interactions.interactions_service import InteractionsService
+from nora_lib.impl.interactions.models import Event
+
+_STOP = None
+
+_QueuedEvent = Tuple[Event, Optional[str], "Future[str]"]
+
+
+class EventWriteBuffer:
+    """
+    Saves events to the Interaction Store in the background
+
+    Events that share a message_id (or thread_id/channel_id when there is no message)
+    are always handled by the same worker, so they are saved in the order they were
+    submitted. Events for different messages are saved concurrently.
+
+    Usage:
+
+    with EventWriteBuffer(interactions_service, concurrency=4) as buffer:
+        future = buffer.save_event(event)
+        ...
+        # Only if the ID is needed
+        event_id = future.result()
+    # All buffered events have been saved once the context exits
+    """
+
+    def __init__(
+        self,
+        interactions_service: InteractionsService,
+        max_queue_size: int = 1000,
+        concurrency: int = 4,
+        put_timeout: Optional[float] = None,
+    ):
+        """
+        :param max_queue_size: Maximum number of events waiting to be saved.
+            When full, save_event blocks until there is room.
+        :param concurrency: Number of worker threads saving events
+        :param put_timeout: How long save_event waits for room in the queue before
+            raising queue.Full. Waits indefinitely if None.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.interactions_service = interactions_service
+        self.put_timeout = put_timeout
+        self._capacity = threading.BoundedSemaphore(max_queue_size)
+        self._queues: List["queue.Queue[Optional[_QueuedEvent]]"] = [
+            queue.Queue() for _ in range(concurrency)
+        ]
+        self._pending = 0
+        self._pending_cond = threading.Condition()
+        self._closed = False
+        self._workers = [
+            threading.Thread(
+                target=self._run, args=(q,), name=f"event-buffer-{i}", daemon=True
+            )
+            for i, q in enumerate(self._queues)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def __enter__(self) -> "EventWriteBuffer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def save_event(
+        self,
+        event: Event,
+        virtual_thread_id: Optional[str] = None,
+        callback: Optional[Callable[["Future[str]"], None]] = None,
+    ) -> "Future[str]":
+        """
+        Queue an event to be saved. Returns a future for the event id.
+        :param virtual_thread_id: Passed through to InteractionsService.save_event
+        :param callback: Called with the future once the event is saved or has failed
+        """
+        if self._closed:
+            raise RuntimeError("Cannot save events to a closed EventWriteBuffer")
+        if not self._capacity.acquire(timeout=self.put_timeout):
+            raise queue.Full("EventWriteBuffer is full")
+
+        future: "Future[str]" = Future()
+        if callback:
+            future.add_done_callback(callback)
+        with self._pending_cond:
+            self._pending += 1
+        self._queue_for(event).put((event, virtual_thread_id, future))
+        return future
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every event queued so far has been saved or has failed.
+        Returns False if the timeout expired first.
+        """
+        with self._pending_cond:
+            return self._pending_cond.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """
+        Stop accepting events, wait for queued events to be saved, and stop the workers.
+        Returns False if the timeout expired before everything was saved.
+        """
+        self._closed = True
+        flushed = self.flush(timeout)
+        for q in self._queues:
+            q.put(_STOP)
+        for worker in self._workers:
+            worker.join(timeout)
+        return flushed
+
+    def _queue_for(self, event: Event) -> "queue.Queue[Optional[_QueuedEvent]]":
+        key = event.message_id or event.thread_id or event.channel_id or event.event_id
+        return self._queues[hash(key) % len(self._queues)]
+
+    def _run(self, q: "queue.Queue[Optional[_QueuedEvent]]") -> None:
+        while True:
+            item = q.get()
+            if item is _STOP:
+                return
+            event, virtual_thread_id, future = item
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(
+                            self.interactions_service.save_event(
+                                event, virtual_thread_id
+                            )
+                        )
+                    except Exception as e:
+                        logging.warning(
+                            f"Failed to save buffered event of type {event.type}: {e}"
+                        )
+                        future.set_exception(e)
+            finally:
+                self._capacity.release()
+                with self._pending_cond:
+                    self._pending -= 1
+                    self._pending_cond.notify_all()
@@ -0,0 +1,162 @@
+"""
+Hedged requests for idempotent reads from the Interaction Store.
+"""
+
+import bisect
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Hashable, List, Optional
+
+from requests import Response
+
+
+@dataclass
+class HedgingPolicy:
+    # A duplicate request is sent once the first has been outstanding longer than
+    # this percentile of recent latencies to the same endpoint
+    percentile: float = 95.0
+    # Never hedge sooner than this, in seconds
+    min_delay: float = 0.02
+    # Delay used until min_samples latencies have been seen for an endpoint
+    initial_delay: float = 0.5
+    min_samples: int = 20
+    # Number of recent latencies kept per endpoint
+    window: int = 500
+    # At most this fraction of requests to an endpoint are hedged
+    max_hedge_ratio: float = 0.05
+    # Threads used to send requests and their hedges. InteractionsService sizes
+    # this to its connection pool when unset.
+    max_workers: Optional[int] = None
+
+
+@dataclass
+class HedgingStats:
+    requests: int = 0
+    hedges: int = 0
+    # Hedged requests where the duplicate answered first
+    hedge_wins: int = 0
+
+
+class _EndpointState:
+    def __init__(self, window: int):
+        self.window = window
+        # Recent latencies in the order they were seen, and sorted
+        self.latencies: Deque[float] = deque()
+        self.sorted_latencies: List[float] = []
+        self.stats = HedgingStats()
+
+    def add(self, latency: float) -> None:
+        if len(self.latencies) >= self.window:
+            oldest = self.latencies.popleft()
+            del self.sorted_latencies[bisect.bisect_left(self.sorted_latencies, oldest)]
+        self.latencies.append(latency)
+        bisect.insort(self.sorted_latencies, latency)
+
+
+class Hedger:
+    """
+    Sends a read, and if it hasn't completed within the hedge delay, sends it again
+    and returns whichever response arrives first.
+
+    The losing request can't be aborted once sent, so its response is discarded
+    and closed when it arrives. The hedge delay is timed from when the first
+    request starts, so reads waiting for a free thread aren't hedged for it.
+    """
+
+    def __init__(self, policy: HedgingPolicy):
+        self.policy = policy
+        self._lock = threading.Lock()
+        self._endpoints: Dict[Hashable, _EndpointState] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=policy.max_workers or 16, thread_name_prefix="nora-hedge"
+        )
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[Hashable, HedgingStats]:
+        with self._lock:
+            return {
+                endpoint: HedgingStats(**vars(state.stats))
+                for endpoint, state in self._endpoints.items()
+            }
+
+    def delay(self, endpoint: Hashable) -> float:
+        """How long to wait for a response before hedging"""
+        with self._lock:
+            latencies = self._state(endpoint).sorted_latencies
+            if len(latencies) < self.policy.min_samples:
+                return max(self.policy.initial_delay, self.policy.min_delay)
+            index = min(
+                len(latencies) - 1, int(len(latencies) * self.policy.percentile / 100)
+            )
+            return max(latencies[index], self.policy.min_delay)
+
+    def call(self, endpoint: Hashable, send: Callable[[], Response]) -> Response:
+        delay = self.delay(endpoint)
+        with self._lock:
+            self._state(endpoint).stats.requests += 1
+        started = threading.Event()
+        primary = self._submit(endpoint, send, started)
+        started.wait()
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._may_hedge(endpoint):
+            return primary.result()
+
+        hedge = self._submit(endpoint, send)
+        pending = {primary, hedge}
+        error: BaseException = RuntimeError("No hedged request completed")
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()  # type: ignore[assignment]
+                    continue
+                for loser in pending:
+                    loser.add_done_callback(_close_response)
+                if future is hedge:
+                    with self._lock:
+                        self._state(endpoint).stats.hedge_wins += 1
+                return future.result()
+        raise error
+
+    def _submit(
+        self,
+        endpoint: Hashable,
+        send: Callable[[], Response],
+        started: Optional[threading.Event] = None,
+    ) -> "Future[Response]":
+        def timed() -> Response:
+            if started is not None:
+                started.set()
+            start = time.perf_counter()
+            response = send()
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._state(endpoint).add(elapsed)
+            return response
+
+        return self._executor.submit(timed)
+
+    def _may_hedge(self, endpoint: Hashable) -> bool:
+        with self._lock:
+            stats = self._state(endpoint).stats
+            if stats.hedges + 1 > stats.requests * self.policy.max_hedge_ratio:
+                return False
+            stats.hedges += 1
+            return True
+
+    def _state(self, endpoint: Hashable) -> _EndpointState:
+        state = self._endpoints.get(endpoint)
+        if state is None:
+            state = _EndpointState(self.policy.window)
+            self._endpoints[endpoint] = state
+        return state
+
+
+def _close_response(future: "Future[Response]") -> None:
+    if future.exception() is None:
+        future.result().close()
@@ -0,0 +1,582 @@
+"""
+In-process stand-in for the Interaction Store, for tests and benchmarks.
+
+InMemoryInteractionStore answers the same REST endpoints as the real store,
+InMemoryInteractionsService is an InteractionsService that calls it directly
+instead of over HTTP, and serve() exposes it on a local port so that the real
+client code paths can be load tested against it.
+
+    store = InMemoryInteractionStore()
+    iservice = InMemoryInteractionsService(store)
+    iservice.save_message(message)
+
+    with serve(store) as base_url:
+        iservice = InteractionsService(base_url)
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from uuid import uuid4
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+from nora_lib.impl.interactions.interactions_service import InteractionsService
+from nora_lib.impl.interactions.models import ThreadStatus
+
+_PREFIX = "/interaction/v1/"
+
+# Fields of each entity that are returned by a search, besides its relations
+_MESSAGE_FIELDS = (
+    "message_id",
+    "actor_id",
+    "text",
+    "ts",
+    "thread_id",
+    "channel_id",
+    "surface",
+)
+_THREAD_FIELDS = ("thread_id", "channel_id", "surface", "status", "name")
+_CHANNEL_FIELDS = ("channel_id", "surface", "owning_actor_id")
+
+
+class StoreError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _parse_ts(value: Any) -> datetime:
+    """Parse an ISO timestamp, treating naive timestamps as UTC so all are comparable"""
+    ts = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    return ts if ts.tzinfo is not None else ts.replace(tzinfo=timezone.utc)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _filter_value(query: Optional[dict], key: str) -> Any:
+    filter_query = (query or {}).get("filter") or {}
+    return filter_query.get(key)
+
+
+def _limit_by_time(
+    items: List[dict],
+    query: Optional[dict],
+    ts: Callable[[dict], datetime],
+) -> List[dict]:
+    """
+    Apply min_timestamp, before_timestamp, most_recent and oldest filters to items
+    sorted oldest first
+    """
+    min_timestamp = _filter_value(query, "min_timestamp")
+    if min_timestamp:
+        lower = _parse_ts(min_timestamp)
+        items = [item for item in items if ts(item) >= lower]
+    before_timestamp = _filter_value(query, "before_timestamp")
+    if before_timestamp:
+        upper = _parse_ts(before_timestamp)
+        items = [item for item in items if ts(item) < upper]
+    most_recent = _filter_value(query, "most_recent")
+    oldest = _filter_value(query, "oldest")
+    if most_recent and oldest:
+        # The oldest and the most recent, without repeating any
+        if most_recent + oldest < len(items):
+            items = items[:oldest] + items[-most_recent:]
+    elif most_recent:
+        items = items[-most_recent:]
+    elif oldest:
+        items = items[:oldest]
+    return items
+
+
+def _project(item: dict, query: Optional[dict], relations: Tuple[str, ...]) -> dict:
+    """Keep only a query's `fields`, if it has any, and the relations rendered"""
+    fields = (query or {}).get("fields")
+    if fields is None:
+        return dict(item)
+    return {k: v for k, v in item.items() if k in fields or k in relations}
+
+
+def _type_matches(query: Optional[dict], event: dict) -> bool:
+    types = _filter_value(query, "type")
+    if types is None:
+        return True
+    if isinstance(types, str):
+        return event["type"] == types
+    return event["type"] in types
+
+
+def _modified_since(query: Optional[dict], event: dict) -> bool:
+    min_timestamp = _filter_value(query, "min_timestamp")
+    if not min_timestamp:
+        return True
+    modified = event.get("updated_at") or event["created_at"]
+    return _parse_ts(modified) >= _parse_ts(min_timestamp)
+
+
+class InMemoryInteractionStore:
+    """
+    Channels, threads, messages, events and annotations held in memory, indexed
+    the way searches read them.
+
+    Searches honor the relations and filters that InteractionsService sends:
+    event type filters, min_timestamp, before_timestamp, most_recent and oldest for
+    messages and threads, min_timestamp for events (against updated_at), thread
+    status, and the thread, channel, events, annotations, messages, threads and
+    preceding_messages relations.
+    Lists of messages are returned oldest first and threads newest first, by
+    created_at. Thread timestamp filters also apply to created_at, and threads of
+    any status but Deleted are returned if no status filter is given.
+    Annotations are stored and returned, but not applied to annotated_text.
+    Message and event searches also accept a list of `ids`, and leave out the ids
+    they don't find. Message and event queries with `fields` only return those
+    fields and the relations asked for.
+    InMemoryInteractionsService and serve() tag the responses to searches and GETs
+    with an ETag, and answer 304 Not Modified to an If-None-Match that matches it.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self.channels: Dict[str, dict] = {}
+        self.threads: Dict[str, dict] = {}
+        self.messages: Dict[str, dict] = {}
+        self.events: Dict[str, dict] = {}
+        self.annotations: Dict[str, List[dict]] = defaultdict(list)
+        # Indexes
+        self._threads_by_channel: Dict[str, List[str]] = defaultdict(list)
+        self._messages_by_thread: Dict[str, List[str]] = defaultdict(list)
+        self._events_by_message: Dict[str, List[str]] = defaultdict(list)
+        self._events_by_thread: Dict[str, List[str]] = defaultdict(list)
+        self._routes: List[Tuple[str, Tuple[str, ...], Callable[..., dict]]] = [
+            ("post", ("message",), self._save_message),
+            ("post", ("message", "batch"), self._save_message_batch),
+            ("post", ("event",), self._save_event),
+            ("post", ("event", "batch"), self._save_event_batch),
+            ("patch", ("event", "*"), self._update_event),
+            ("post", ("channel",), self._save_channel),
+            ("post", ("thread",), self._save_thread),
+            ("delete", ("thread", "*"), self._delete_thread),
+            ("post", ("annotation",), self._save_annotation),
+            ("get", ("channel", "by-context", "*"), self._channel_by_context),
+            ("post", ("search", "message"), self._search_message),
+            ("post", ("search", "event"), self._search_event),
+            ("post", ("search", "thread"), self._search_thread),
+            ("post", ("search", "channel"), self._search_channel),
+        ]
+
+    def handle(
+        self, method: str, path: str, body: Optional[dict] = None
+    ) -> Tuple[int, dict]:
+        """Answer a request to the REST API, returning a status code and JSON body"""
+        if not path.startswith(_PREFIX):
+            return 404, {"error": f"Unknown path {path}"}
+        segments = tuple(path.split("?", 1)[0][len(_PREFIX) :].split("/"))
+        for route_method, pattern, handler in self._routes:
+            if route_method != method.lower() or len(pattern) != len(segments):
+                continue
+            if all(p == "*" or p == s for p, s in zip(pattern, segments)):
+                args = [s for p, s in zip(pattern, segments) if p == "*"]
+                try:
+                    with self._lock:
+                        return 200, handler(*args, body or {})
+                except StoreError as e:
+                    return e.status, {"error": str(e)}
+                except (KeyError, TypeError, ValueError) as e:
+                    return 422, {"error": f"Invalid request: {e!r}"}
+        return 404, {"error": f"Unknown endpoint {method.upper()} {path}"}
+
+    # Writes
+
+    def _save_channel(self, body: dict) -> dict:
+        channel = {field: body[field] for field in _CHANNEL_FIELDS}
+        self.channels[channel["channel_id"]] = channel
+        return {}
+
+    def _save_thread(self, body: dict) -> dict:
+        thread_id = body["thread_id"]
+        existing = self.threads.get(thread_id)
+        thread: Dict[str, Any] = {field: body.get(field) for field in _THREAD_FIELDS}
+        thread["channel_id"] = body["channel_id"]
+        thread["status"] = thread.get("status") or ThreadStatus.ACTIVE.value
+        thread["created_at"] = existing["created_at"] if existing else _now()
+        thread["updated_at"] = _now()
+        self.threads[thread_id] = thread
+        if existing is None:
+            self._threads_by_channel[thread["channel_id"]].append(thread_id)
+        return {}
+
+    def _save_message(self, body: dict) -> dict:
+        message = {field: body[field] for field in _MESSAGE_FIELDS}
+        message_id = message["message_id"]
+        thread_id = message["thread_id"]
+        if thread_id not in self.threads:
+            # Messages implicitly create their thread
+            self._save_thread(
+                {
+                    "thread_id": thread_id,
+                    "channel_id": message["channel_id"],
+                    "surface": message["surface"],
+                }
+            )
+        is_new = message_id not in self.messages
+        self.messages[message_id] = message
+        if is_new:
+            thread_messages = self._messages_by_thread[thread_id]
+            thread_messages.append(message_id)
+            # Stable, so messages with equal timestamps stay in the order saved
+            thread_messages.sort(key=lambda m: _parse_ts(self.messages[m]["ts"]))
+        if body.get("annotations"):
+            self.annotations[message_id] = list(body["annotations"])
+        return {}
+
+    def _save_message_batch(self, body: dict) -> dict:
+        for message in body["messages"]:
+            self._save_message(message)
+        return {"message_ids": [m["message_id"] for m in body["messages"]]}
+
+    def _save_event(self, body: dict) -> dict:
+        message_id = body.get("message_id")
+        if message_id and message_id not in self.messages:
+            raise StoreError(404, f"Message {message_id} not found")
+        thread_id = body.get("thread_id")
+        if not (message_id or thread_id or body.get("channel_id")):
+            raise StoreError(
+                422, "An event needs a message_id, thread_id or channel_id"
+            )
+        event = dict(body)
+        event["event_id"] = str(uuid4())
+        event["created_at"] = event["updated_at"] = _now()
+        self.events[event["event_id"]] = event
+        if message_id:
+            self._events_by_message[message_id].append(event["event_id"])
+        elif thread_id:
+            self._events_by_thread[thread_id].append(event["event_id"])
+        return {"event_id": event["event_id"]}
+
+    def _save_event_batch(self, body: dict) -> dict:
+        # Validate the whole batch first so that it is saved all or nothing
+        for event in body["events"]:
+            message_id = event.get("message_id")
+            if message_id and message_id not in self.messages:
+                raise StoreError(404, f"Message {message_id} not found")
+        return {"event_ids": [self._save_event(e)["event_id"] for e in body["events"]]}
+
+    def _update_event(self, event_id: str, body: dict) -> dict:
+        existing = self.events.get(event_id)
+        if existing is None:
+            raise StoreError(404, f"Event {event_id} not found")
+        for field in ("type", "text", "data", "timestamp", "surface"):
+            if field in body:
+                existing[field] = body[field]
+        existing["updated_at"] = _now()
+        return {}
+
+    def _save_annotation(self, body: dict) -> dict:
+        message_id = body["message_id"]
+        if message_id not in self.messages:
+            raise StoreError(404, f"Message {message_id} not found")
+        self.annotations[message_id].extend(body["annotations"])
+        return {}
+
+    def _delete_thread(self, thread_id: str, body: dict) -> dict:
+        thread = self.threads.pop(thread_id, None)
+        if thread is None:
+            raise StoreError(404, f"Thread {thread_id} not found")
+        self._threads_by_channel[thread["channel_id"]].remove(thread_id)
+        for message_id in self._messages_by_thread.pop(thread_id, []):
+            del self.messages[message_id]
+            self.annotations.pop(message_id, None)
+            for event_id in self._events_by_message.pop(message_id, []):
+                del self.events[event_id]
+        for event_id in self._events_by_thread.pop(thread_id, []):
+            del self.events[event_id]
+        return {}
+
+    # Reads
+
+    def _channel_by_context(self, context_id: str, body: dict) -> dict:
+        channel_id: Optional[str] = None
+        if context_id in self.channels:
+            channel_id = context_id
+        elif context_id in self.threads:
+            channel_id = self.threads[context_id]["channel_id"]
+        elif context_id in self.messages:
+            channel_id = self.messages[context_id]["channel_id"]
+        elif context_id in self.events:
+            event = self.events[context_id]
+            channel_id = event.get("channel_id")
+            if event.get("message_id") in self.messages:
+                channel_id = self.messages[event["message_id"]]["channel_id"]
+            elif event.get("thread_id") in self.threads:
+                channel_id = self.threads[event["thread_id"]]["channel_id"]
+        if channel_id is None or channel_id not in self.channels:
+            return {}
+        return {"channel": dict(self.channels[channel_id])}
+
+    def _search_message(self, body: dict) -> dict:
+        if "ids" in body:
+            return {
+                "messages": [
+                    self._render_message(message_id, body)
+                    for message_id in body["ids"]
+                    if message_id in self.messages
+                ]
+            }
+        message_id = body["id"]
+        if message_id not in self.messages:
+            raise StoreError(404, f"Message {message_id} not found")
+        return {"message": self._render_message(message_id, body)}
+
+    def _search_event(self, body: dict) -> dict:
+        if "ids" in body:
+            return {
+                "events": [
+                    _project(self.events[event_id], body, ())
+                    for event_id in body["ids"]
+                    if event_id in self.events
+                ]
+            }
+        event = self.events.get(body["id"])
+        if event is None:
+            raise StoreError(404, f"Event {body['id']} not found")
+        return {"events": [_project(event, body, ())]}
+
+    def _search_thread(self, body: dict) -> dict:
+        thread_id = body["id"]
+        if thread_id not in self.threads:
+            raise StoreError(404, f"Thread {thread_id} not found")
+        return {"thread": self._render_thread(thread_id, body)}
+
+    def _search_channel(self, body: dict) -> dict:
+        channel_id = body["id"]
+        if channel_id not in self.channels:
+            return {}
+        return {"channel": self._render_channel(channel_id, body)}
+
+    def _render_channel(self, channel_id: str, query: dict) -> dict:
+        channel = dict(self.channels[channel_id])
+        relations = query.get("relations") or {}
+        if "threads" in relations:
+            threads_query = relations["threads"] or {}
+            statuses = _filter_value(threads_query, "status")
+            if statuses is None:
+                statuses = [ThreadStatus.ACTIVE.value, ThreadStatus.ARCHIVED.value]
+            threads = sorted(
+                (
+                    self.threads[t]
+                    for t in self._threads_by_channel.get(channel_id, [])
+                    if self.threads[t]["status"] in statuses
+                ),
+                key=lambda t: _parse_ts(t["created_at"]),
+            )
+            threads = _limit_by_time(
+                threads, threads_query, lambda t: _parse_ts(t["created_at"])
+            )
+            channel["threads"] = [
+                self._render_thread(thread["thread_id"], threads_query)
+                for thread in reversed(threads)
+            ]
+        return channel
+
+    def _render_thread(self, thread_id: str, query: dict) -> dict:
+        thread = dict(self.threads[thread_id])
+        relations = query.get("relations") or {}
+        if "messages" in relations:
+            messages_query = relations["messages"] or {}
+            messages = [
+                self.messages[m] for m in self._messages_by_thread.get(thread_id, [])
+            ]
+            messages = _limit_by_time(
+                messages, messages_query, lambda m: _parse_ts(m["ts"])
+            )
+            thread["messages"] = [
+                self._render_message(m["message_id"], messages_query) for m in messages
+            ]
+        if "events" in relations:
+            thread["events"] = self._render_events(
+                self._events_by_thread.get(thread_id, []), relations["events"]
+            )
+        return thread
+
+    def _render_message(self, message_id: str, query: dict) -> dict:
+        message = dict(self.messages[message_id])
+        message["annotated_text"] = None
+        relations = query.get("relations") or {}
+        if "events" in relations:
+            message["events"] = self._render_events(
+                self._events_by_message.get(message_id, []), relations["events"]
+            )
+        if "annotations" in relations:
+            message["annotations"] = list(self.annotations.get(message_id, []))
+        if "thread" in relations:
+            message["thread"] = self._render_thread(
+                message["thread_id"], relations["thread"] or {}
+            )
+        if "channel" in relations:
+            channel_id = message["channel_id"]
+            message["channel"] = (
+                self._render_channel(channel_id, relations["channel"] or {})
+                if channel_id in self.channels
+                else {"channel_id": channel_id}
+            )
+        if "preceding_messages" in relations:
+            preceding_query = relations["preceding_messages"] or {}
+            ts = _parse_ts(message["ts"])
+            preceding = [
+                self.messages[m]
+                for m in self._messages_by_thread.get(message["thread_id"], [])
+                if m != message_id and _parse_ts(self.messages[m]["ts"]) <= ts
+            ]
+            limit = preceding_query.get("max")
+            if limit:
+                preceding = preceding[-limit:]
+            message["preceding_messages"] = [
+                self._render_message(m["message_id"], preceding_query)
+                for m in preceding
+            ]
+        return _project(message, query, tuple(relations))
+
+    def _render_events(self, event_ids: List[str], query: Optional[dict]) -> List[dict]:
+        events = [self.events[e] for e in event_ids]
+        return [
+            _project(event, query, ())
+            for event in events
+            if _type_matches(query, event) and _modified_since(query, event)
+        ]
+
+
+def _conditional(
+    method: str, if_none_match: Optional[str], status: int, payload: bytes
+) -> Tuple[int, bytes, Dict[str, str]]:
+    """Tag a GET's response with an ETag, and answer 304 if the client has it"""
+    if status != 200 or method.lower() != "get":
+        return status, payload, {}
+    etag = f'"{hashlib.sha1(payload).hexdigest()}"'
+    if if_none_match == etag:
+        return 304, b"", {"ETag": etag}
+    return status, payload, {"ETag": etag}
+
+
+def _json_response(
+    url: str, status: int, payload: bytes, headers: Optional[Dict[str, str]] = None
+) -> Response:
+    response = Response()
+    response.status_code = status
+    response.reason = "OK" if status < 400 else "Error"
+    response.url = url
+    response.headers = CaseInsensitiveDict(
+        {"Content-Type": "application/json", **(headers or {})}
+    )
+    response._content = payload
+    response.encoding = "utf-8"
+    return response
+
+
+class InMemoryInteractionsService(InteractionsService):
+    """InteractionsService backed by an in-process InMemoryInteractionStore"""
+
+    def __init__(
+        self,
+        store: Optional[InMemoryInteractionStore] = None,
+        base_url: str = "http://interaction-store.invalid",
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(base_url, **kwargs)
+        self.store = store if store is not None else InMemoryInteractionStore()
+
+    def _request(
+        self,
+        method: str,
+        url: str,
+        json: Optional[Dict[str, Any]],
+        compressed: Optional[bytes],
+        headers: Dict[str, str],
+    ) -> Response:
+        path = url[len(self.base_url) :]
+        status, response_body = self.store.handle(method, path, _round_trip(json))
+        status, payload, response_headers = _conditional(
+            method,
+            headers.get("If-None-Match"),
+            status,
+            _dumps(response_body),
+        )
+        return _json_response(url, status, payload, response_headers)
+
+
+def _dumps(body: dict) -> bytes:
+    return json.dumps(body).encode("utf-8")
+
+
+def _round_trip(body: Optional[dict]) -> Optional[dict]:
+    """Copy a request body through JSON, as if it had been sent over HTTP"""
+    return None if body is None else json.loads(json.dumps(body))
+
+
+class _StoreServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], store: InMemoryInteractionStore):
+        super().__init__(address, _StoreHandler)
+        self.store = store
+
+
+class _StoreHandler(BaseHTTPRequestHandler):
+    server: _StoreServer
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, Nagle's
+    # algorithm stalls every keep-alive response on a delayed ACK.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b""
+        if self.headers.get("Content-Encoding") == "gzip":
+            raw = gzip.decompress(raw)
+        body = json.loads(raw) if raw else None
+        status, response_body = self.server.store.handle(self.command, self.path, body)
+        status, payload, headers = _conditional(
+            self.command,
+            self.headers.get("If-None-Match"),
+            status,
+            _dumps(response_body),
+        )
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PATCH = do_DELETE = _handle
+
+
+@contextmanager
+def serve(
+    store: InMemoryInteractionStore, host: str = "127.0.0.1", port: int = 0
+) -> Iterator[str]:
+    """
+    Serve a store over HTTP on a local port, yielding its base URL
+    :param port: Port to listen on. By default a free port is picked.
+    """
+    server = _StoreServer((host, port), store)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://{host}:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -1,17 +1,49 @@
 import json
 import logging
 import os
-from dataclasses import dataclass
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, replace
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple, Union
+from enum import Enum
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
 from uuid import UUID
 
-import boto3
 import requests
+from pydantic import BaseModel
 from requests import Response
+from requests.adapters import HTTPAdapter
 from requests.auth import AuthBase
 from retry import retry
 
+from nora_lib.impl.interactions.auth import (
+    DEFAULT_SECRET_ID,
+    BearerAuth,
+    SecretsManagerTokenProvider,
+    TokenProvider,
+    secrets_manager_source,
+)
+from nora_lib.impl.interactions.cache import InteractionsCache
+from nora_lib.impl.interactions.compression import CompressionConfig, WireStats
+from nora_lib.impl.interactions.conditional import ConditionalReadCache
+from nora_lib.impl.interactions.hedging import Hedger, HedgingPolicy
+from nora_lib.impl.interactions.metrics import InteractionsMetrics
 from nora_lib.impl.interactions.models import (
     AnnotationBatch,
     Channel,
@@ -19,12 +51,24 @@ from nora_lib.impl.interactions.models import (
     EventType,
     Message,
     ReturnedMessage,
+    ReturnedThread,
     StepCost,
     Thread,
     ThreadRelationsResponse,
     ThreadStatus,
     VirtualThread,
 )
+from nora_lib.impl.interactions.projection import Projection
+from nora_lib.impl.interactions.snapshots import ThreadSnapshotStore
+from nora_lib.impl.interactions.views import ThreadView
+from nora_lib.impl.interactions.virtual_threads import VirtualThreadIndex
+
+if TYPE_CHECKING:
+    from nora_lib.impl.interactions.event_buffer import EventWriteBuffer
+
+M = TypeVar("M", bound=BaseModel)
+C = TypeVar("C", bound=Optional[BaseModel])
+T = TypeVar("T")
 
 
 class RetryableInteractionStoreException(Exception):
@@ -49,9 +93,153 @@ class RetryConfig:
     jitter: Union[int, Tuple[int, int]] = (1, 2)
 
 
+@dataclass
+class PoolConfig:
+    # Connections to the Interaction Store are kept alive and reused
+    # across calls. The defaults match requests' own HTTPAdapter defaults.
+    # Number of per-host connection pools to keep
+    pool_connections: int = 10
+    # Maximum number of idle connections kept per host
+    pool_maxsize: int = 10
+    # If True, never open more than pool_maxsize connections to a host;
+    # callers wait for a free connection instead
+    pool_block: bool = False
+    # If False, send "Connection: close" so every call gets a fresh connection
+    keep_alive: bool = True
+    # Separate connect/read timeouts in seconds. When unset, the service's
+    # `timeout` is used for both.
+    connect_timeout: Optional[float] = None
+    read_timeout: Optional[float] = None
+
+
+class VirtualThreadTagError(Exception):
+    """An event was saved, but the tag associating it with a virtual thread wasn't"""
+
+    def __init__(self, event_id: str, error: Exception):
+        super().__init__(
+            f"Saved event {event_id} but not its virtual thread tag: {error}"
+        )
+        # Id of the saved event, so a retry can save only the tag
+        self.event_id = event_id
+        self.error = error
+
+
+@dataclass
+class SaveResult:
+    """Outcome of saving one item with save_events or save_messages"""
+
+    # The event id or message id, if the item was saved
+    id: Optional[str] = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class Missing(Enum):
+    """Marks the ids that get_messages and get_events found nothing for"""
+
+    MISSING = "missing"
+
+
+MISSING = Missing.MISSING
+
+
+def _request_key(method: str, url: str, body: Optional[Dict[str, Any]]) -> Hashable:
+    """Identifies a request by its method, URL and canonicalized JSON body"""
+    return method, url, json.dumps(body, sort_keys=True, separators=(",", ":"))
+
+
+# Path segments of Interaction Store URLs that aren't ids
+_PATH_WORDS = {
+    "interaction",
+    "v1",
+    "annotation",
+    "batch",
+    "by-context",
+    "channel",
+    "event",
+    "message",
+    "search",
+    "thread",
+}
+
+
+def _endpoint_template(base_url: str, url: str) -> str:
+    """The URL's path with ids replaced by a placeholder, e.g. /interaction/v1/event/{id}"""
+    path = url[len(base_url) :] if url.startswith(base_url) else url
+    path = path.split("?", 1)[0]
+    return "/".join(
+        segment if not segment or segment in _PATH_WORDS else "{id}"
+        for segment in path.split("/")
+    )
+
+
+class _SingleFlight:
+    """Lets concurrent callers with the same key share one in-flight call"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, "Future[Response]"] = {}
+
+    def do(self, key: Hashable, func: Callable[[], Response]) -> Response:
+        with self._lock:
+            future = self._calls.get(key)
+            is_leader = future is None
+            if future is None:
+                future = Future()
+                self._calls[key] = future
+        if not is_leader:
+            return future.result()
+        try:
+            response = func()
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+def _unsupported(response: Response) -> bool:
+    """
+    Whether a response rejects the endpoint itself, rather than an item the request
+    refers to. A 404 only counts when its body doesn't say what wasn't found.
+    """
+    if response.status_code in (405, 501):
+        return True
+    if response.status_code != 404:
+        return False
+    try:
+        body = response.json()
+    except ValueError:
+        return True
+    error = (
+        (body.get("detail") or body.get("error")) if isinstance(body, dict) else None
+    )
+    return (
+        not error
+        or error == "Not Found"
+        or str(error).startswith(("Unknown path", "Unknown endpoint"))
+    )
+
+
+def _log_tag_failure(future: "Future[str]") -> None:
+    error = future.exception()
+    if error is not None:
+        logging.error(f"Failed to save virtual thread tag: {error}")
+
+
 class InteractionsService:
     """
     Service which saves interactions to the Interactions API
+
+    All calls share one connection pool, so an instance should be created once
+    and reused. It is safe to use from many threads: each thread gets its own
+    requests.Session, all of them backed by the same pool.
     """
 
     def __init__(
@@ -60,18 +248,207 @@ class InteractionsService:
         timeout: int = 30,
         token: Optional[str] = None,
         auth: Optional[AuthBase] = None,
+        token_provider: Optional[TokenProvider] = None,
         retry_config: RetryConfig = RetryConfig(),
+        pool_config: PoolConfig = PoolConfig(),
+        batch_writes: Optional[bool] = None,
+        max_batch_size: int = 100,
+        batch_reads: Optional[bool] = None,
+        cache: Optional[InteractionsCache] = None,
+        coalesce_reads: bool = False,
+        compression: Optional[CompressionConfig] = None,
+        hedging: Optional[HedgingPolicy] = None,
+        metrics: Optional[InteractionsMetrics] = None,
+        tag_buffer: Optional["EventWriteBuffer"] = None,
+        max_virtual_thread_indexes: int = 128,
+        snapshots: Optional[ThreadSnapshotStore] = None,
+        conditional_reads: Optional[ConditionalReadCache] = None,
     ) -> None:
+        """
+        :param token_provider: Supplies the bearer token when neither `token` nor
+            `auth` is given. It is asked for a token on each request, so it is first
+            resolved when the first request is sent.
+        :param batch_writes: Whether save_events and save_messages send batches in a
+            single request. If None, batching is tried and turned off the first time
+            the store rejects a batch endpoint as unsupported.
+        :param max_batch_size: Maximum number of items sent in one batch request,
+            and of ids searched for in one request by get_messages and get_events
+        :param batch_reads: Whether get_messages, get_events and
+            get_virtual_thread_content search for many ids in one request. If None,
+            this is tried: it is turned on by the first search by ids that succeeds,
+            and off if the store answers one before that with 400, 404, 405, 422 or
+            501. Once on, a rejected search is raised.
+        :param cache: Optional read-through cache for get_message, get_event,
+            get_channel and get_channel_by_context. Writes made through this
+            service evict the entries they make stale.
+        :param coalesce_reads: If True, identical searches and GETs issued concurrently
+            from several threads share a single HTTP request and response. A read
+            can then join one sent before the caller's own write and miss it, so
+            only turn this on where callers don't need to read their writes.
+        :param compression: Accepted response encodings and optional compression of
+            large request bodies. Byte counts before and after compression are kept
+            in `wire_stats` when compression or metrics are configured.
+        :param hedging: If set, slow reads are sent a second time and the first
+            response back is used. Only searches and GETs are hedged. Reads are sent
+            from up to hedging.max_workers threads, by default pool_maxsize.
+        :param metrics: Receives the latency, size and status of every HTTP attempt,
+            retry counts, and time spent validating responses
+        :param tag_buffer: If set, the events that tag saved messages with a virtual
+            thread are saved through this write-behind buffer, so save_message returns
+            once the message itself is saved. It returns the tag's future; a tag
+            is durable once that future has succeeded, which the buffer's flush()
+            or close() waits for. save_event sends the tags of events through it
+            too when the store doesn't take batches; failed tags are logged.
+        :param max_virtual_thread_indexes: Number of threads whose virtual thread
+            indexes are kept for get_virtual_thread_content
+        :param snapshots: Optional on-disk store that fetch_all_by_thread reads
+            whole threads through, fetching only what changed since the snapshot.
+            Processes on a host may share one file.
+        :param conditional_reads: If set, GETs send the ETag or Last-Modified of the
+            last response to the same request, and a 304 Not Modified is answered
+            with the body cached from that response. Of the reads this service
+            makes, only get_channel_by_context is a GET. get_channel and the
+            thread reads are POST searches, which are never conditional, so they
+            are still downloaded in full.
+        """
         self.base_url = base_url
         self.timeout = timeout
         self.auth = auth
         if token:
             self.auth = BearerAuth(token)
+        elif auth is None and token_provider is not None:
+            self.auth = BearerAuth(token_provider)
         self.retry_config = retry_config
+        self.pool_config = pool_config
+        self.batch_writes = batch_writes
+        self.max_batch_size = max_batch_size
+        self.batch_reads = batch_reads
+        self.cache = cache
+        self.snapshots = snapshots
+        self.conditional_reads = conditional_reads
+        self.coalesce_reads = coalesce_reads
+        self.compression = compression
+        self.wire_stats = WireStats()
+        self.hedger: Optional[Hedger] = None
+        if hedging is not None:
+            if hedging.max_workers is None:
+                # As many reads in flight as the pool keeps connections for
+                hedging = replace(hedging, max_workers=pool_config.pool_maxsize)
+            self.hedger = Hedger(hedging)
+        self.metrics = metrics
+        self.tag_buffer = tag_buffer
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self.max_virtual_thread_indexes = max_virtual_thread_indexes
+        self._virtual_thread_indexes: "OrderedDict[str, VirtualThreadIndex]" = (
+            OrderedDict()
+        )
+        self._indexes_lock = threading.Lock()
+        self._in_flight = _SingleFlight()
+        self._adapter = HTTPAdapter(
+            pool_connections=pool_config.pool_connections,
+            pool_maxsize=pool_config.pool_maxsize,
+            pool_block=pool_config.pool_block,
+        )
+        self._local = threading.local()
+
+    def __enter__(self) -> "InteractionsService":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close all pooled connections"""
+        if self.hedger is not None:
+            self.hedger.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self._adapter.close()
+
+    def _background(self) -> ThreadPoolExecutor:
+        """Executor for requests sent alongside the caller's own"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.pool_config.pool_maxsize,
+                    thread_name_prefix="interactions",
+                )
+            return self._executor
+
+    def _session(self) -> requests.Session:
+        """Session for the calling thread, backed by the shared connection pool"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", self._adapter)
+            session.mount("https://", self._adapter)
+            if not self.pool_config.keep_alive:
+                session.headers["Connection"] = "close"
+            if self.compression is not None:
+                session.headers["Accept-Encoding"] = (
+                    self.compression.accept_encoding_header()
+                )
+            self._local.session = session
+        return session
+
+    def _request_timeout(self) -> Union[float, Tuple[float, float]]:
+        connect_timeout = self.pool_config.connect_timeout
+        read_timeout = self.pool_config.read_timeout
+        if connect_timeout is None and read_timeout is None:
+            return self.timeout
+        return (
+            connect_timeout if connect_timeout is not None else self.timeout,
+            read_timeout if read_timeout is not None else self.timeout,
+        )
+
+    @staticmethod
+    def _is_read(method: str, url: str) -> bool:
+        """Whether a call only reads from the store, so it is safe to share or repeat"""
+        return method == "get" or "/interaction/v1/search/" in url
 
     def _call(
         self, method: str, url: str, json: Optional[Dict[str, Any]] = None
     ) -> Response:
+        if not self._is_read(method, url):
+            return self._send(method, url, json)
+        key = _request_key(method, url, json)
+        # A search is a POST, which If-None-Match would make a precondition
+        conditional_reads = self.conditional_reads if method == "get" else None
+
+        def send() -> Response:
+            cached = conditional_reads.lookup(key) if conditional_reads else None
+            headers = cached.request_headers() if cached is not None else {}
+            if self.hedger is None:
+                response = self._send(method, url, json, headers)
+            else:
+                endpoint = (method, _endpoint_template(self.base_url, url))
+                response = self.hedger.call(
+                    endpoint, lambda: self._send(method, url, json, headers)
+                )
+            if conditional_reads is not None:
+                response = conditional_reads.resolve(key, response, cached)
+            return response
+
+        if self.coalesce_reads:
+            # Identical reads in flight at the same time share one request.
+            # Each caller decodes the shared response, so results aren't aliased.
+            return self._in_flight.do(key, send)
+        return send()
+
+    def _send(
+        self,
+        method: str,
+        url: str,
+        json: Optional[Dict[str, Any]] = None,
+        extra_headers: Optional[Dict[str, str]] = None,
+    ) -> Response:
+        body, compressed, headers = self._encode_body(json)
+        if extra_headers:
+            headers = {**headers, **extra_headers}
+        metrics = self.metrics
+        endpoint = _endpoint_template(self.base_url, url) if metrics else ""
+        attempts = 0
 
         @retry(
             RetryableInteractionStoreException,
@@ -82,14 +459,28 @@ class InteractionsService:
             jitter=self.retry_config.jitter,
         )
         def call_helper():
-            response = requests.request(
-                method=method,
-                url=url,
-                json=json,
-                auth=self.auth,
-                timeout=self.timeout,
-            )
-            if response.status_code >= 500:
+            nonlocal attempts
+            attempts += 1
+            start = time.perf_counter()
+            try:
+                response = self._request(method, url, json, compressed, headers)
+            except Exception:
+                if metrics is not None:
+                    elapsed = time.perf_counter() - start
+                    metrics.observe_request(method, endpoint, 0, elapsed, 0, 0)
+                raise
+            elapsed = time.perf_counter() - start
+            # Counting bytes reads the whole body, so it is skipped unless needed
+            if self.compression is not None or metrics is not None:
+                sent, received = self.wire_stats.record(
+                    response, len(body) if body is not None else None
+                )
+                if metrics is not None:
+                    metrics.observe_request(
+                        method, endpoint, response.status_code, elapsed, sent, received
+                    )
+            # 501 Not Implemented won't change on a retry
+            if response.status_code >= 500 and response.status_code != 501:
                 raise RetryableInteractionStoreException(
                     f"Encountered a retryable exception, status code {response.status_code}",
                     response,
@@ -103,13 +494,92 @@ class InteractionsService:
             # If our last try failed, return the response and let the caller decide
             # what to do with it.
             return exc.response
+        finally:
+            if metrics is not None:
+                metrics.observe_retries(method, endpoint, max(attempts - 1, 0))
+
+    def _request(
+        self,
+        method: str,
+        url: str,
+        json: Optional[Dict[str, Any]],
+        compressed: Optional[bytes],
+        headers: Dict[str, str],
+    ) -> Response:
+        """One HTTP attempt"""
+        if compressed is None:
+            # Only passed when set, e.g. to the validators of a conditional read
+            conditional: Dict[str, Any] = {"headers": headers} if headers else {}
+            return self._session().request(
+                method=method,
+                url=url,
+                json=json,
+                auth=self.auth,
+                timeout=self._request_timeout(),
+                **conditional,
+            )
+        return self._session().request(
+            method=method,
+            url=url,
+            data=compressed,
+            headers=headers,
+            auth=self.auth,
+            timeout=self._request_timeout(),
+        )
+
+    def _encode_body(
+        self, json_body: Optional[Dict[str, Any]]
+    ) -> Tuple[Optional[bytes], Optional[bytes], Dict[str, str]]:
+        """
+        Serialize and compress a request body if compression applies to it.
+        Returns the serialized body, the compressed body and the headers to send.
+        """
+        if (
+            self.compression is None
+            or self.compression.request_min_bytes is None
+            or json_body is None
+        ):
+            return None, None, {}
+        # Serialized the same way requests does for json=
+        body = json.dumps(json_body, allow_nan=False).encode("utf-8")
+        compressed = self.compression.compress(body)
+        if compressed is None:
+            return body, None, {}
+        headers = {
+            "Content-Type": "application/json",
+            "Content-Encoding": self.compression.request_encoding,
+        }
+        return body, compressed, headers
+
+    def _parse(self, model: str, parse: Callable[..., T], *args: Any) -> T:
+        """Parse a decoded response, timing it if metrics are enabled"""
+        if self.metrics is None:
+            return parse(*args)
+        start = time.perf_counter()
+        try:
+            return parse(*args)
+        finally:
+            self.metrics.observe_validation(model, time.perf_counter() - start)
+
+    def _cached(self, kind: str, key: str, fetch: Callable[[], C]) -> C:
+        if self.cache is None:
+            return fetch()
+        return self.cache.get_or_fetch(kind, key, fetch)
+
+    def _on_saved(self, item: BaseModel) -> None:
+        if self.cache is not None:
+            self.cache.on_saved(item)
+        if self.snapshots is not None:
+            self.snapshots.on_saved(item)
 
     def save_message(
         self, message: Message, virtual_thread_id: Optional[str] = None
-    ) -> None:
+    ) -> Optional["Future[str]"]:
         """
         Save a message to the Interaction Store
         :param virtual_thread_id: Optional ID of a virtual thread to associate with the message
+        :return: When the tag is saved through `tag_buffer`, a future for the tag's
+            event id, which fails if the tag couldn't be saved. Otherwise None.
         """
         message_url = f"{self.base_url}/interaction/v1/message"
         response = self._call(
@@ -118,57 +588,193 @@ class InteractionsService:
             message.model_dump(),
         )
         response.raise_for_status()
+        self._on_saved(message)
         if virtual_thread_id:
-            # Use an event to tag the message with the virtual thread ID
-            event = Event(
-                type=VirtualThread.EVENT_TYPE,
-                actor_id=message.actor_id,
-                message_id=message.message_id,
-                data={
-                    VirtualThread.ID_FIELD: virtual_thread_id,
-                    VirtualThread.EVENT_TYPE_FIELD: VirtualThread.EVENT_TYPE,
-                },
-                timestamp=message.ts,
-            )
-            self.save_event(event)
+            # The tag refers to the message, so it can only be sent once the message
+            # has been saved
+            tag = self._message_tag(message, virtual_thread_id)
+            self._index_tag(tag, thread_id=message.thread_id, message_ts=message.ts)
+            if self.tag_buffer is not None:
+                tag_saved = self.tag_buffer.save_event(tag)
+                tag_saved.add_done_callback(_log_tag_failure)
+                return tag_saved
+            self.save_event(tag)
+        return None
 
     def save_event(self, event: Event, virtual_thread_id: Optional[str] = None) -> str:
         """
         Save an event to the Interaction Store. Returns an event id.
-        :param virtual_thread_id: Optional ID of a virtual thread to associate with the event
+        :param virtual_thread_id: Optional ID of a virtual thread to associate with the event.
+            The event and the tag that associates it are sent in one batch request
+            when the store supports it, and otherwise the tag is sent once the event
+            is saved: through `tag_buffer` if there is one, or else before returning,
+            raising VirtualThreadTagError with the event's id if only the event was
+            saved.
         """
-        if event.event_id:
-            event_url = f"{self.base_url}/interaction/v1/event/{event.event_id}"
-            method = "patch"
-        else:
-            event_url = f"{self.base_url}/interaction/v1/event"
-            method = "post"
+        if virtual_thread_id:
+            tag = self._event_tag(event, virtual_thread_id)
+            event_id = self._save_tagged_event(event, tag)
+            self._index_tag(tag)
+            return event_id
+        return self._save_event(event)
+
+    def _save_tagged_event(self, event: Event, tag: Event) -> str:
+        if not event.event_id and self.batch_writes is not False:
+            event_ids = self._save_batch("event", [event, tag], self._saved_event_ids)
+            if event_ids is not None:
+                return event_ids[0]
+        # Saved in order, so a failed event never leaves a tag behind
+        event_id = self._save_event(event)
+        if self.tag_buffer is not None:
+            self.tag_buffer.save_event(tag).add_done_callback(_log_tag_failure)
+            return event_id
+        try:
+            self._save_event(tag)
+        except Exception as e:
+            raise VirtualThreadTagError(event_id, e) from e
+        return event_id
 
+    def _save_event(self, event: Event) -> str:
+        method, event_url = self._event_endpoint(self.base_url, event)
         response = self._call(
             method,
             event_url,
             event.model_dump(),
         )
         response.raise_for_status()
-        if virtual_thread_id:
-            # Use an event to tag the event with the virtual thread ID
-            # Attach it to the same message as this event, along with the event type
-            event = Event(
-                type=VirtualThread.EVENT_TYPE,
-                actor_id=event.actor_id,
-                message_id=event.message_id,
-                data={
-                    VirtualThread.ID_FIELD: virtual_thread_id,
-                    VirtualThread.EVENT_TYPE_FIELD: event.type,
-                },
-                timestamp=event.timestamp,
+        self._on_saved(event)
+        return self._saved_event_id(event, response.json())
+
+    def save_events(
+        self, events: Sequence[Event], max_workers: int = 8
+    ) -> List[SaveResult]:
+        """
+        Save many events. New events are sent in batches when the store supports it.
+        Otherwise, and for updates to existing events, each event is saved with its
+        own request, up to max_workers at a time.
+        Returns one result per event, in input order. Failures are reported in the
+        results instead of being raised.
+        """
+        return self._bulk_save(
+            "event",
+            events,
+            batchable=lambda event: not event.event_id,
+            save_one=self.save_event,
+            batch_ids=self._saved_event_ids,
+            max_workers=max_workers,
+        )
+
+    def save_messages(
+        self, messages: Sequence[Message], max_workers: int = 8
+    ) -> List[SaveResult]:
+        """
+        Save many messages, in batches when the store supports it and otherwise with
+        up to max_workers requests at a time.
+        Returns one result per message, in input order. Failures are reported in the
+        results instead of being raised.
+        """
+
+        def save_one(message: Message) -> str:
+            self.save_message(message)
+            return message.message_id
+
+        return self._bulk_save(
+            "message",
+            messages,
+            batchable=lambda message: True,
+            save_one=save_one,
+            batch_ids=lambda messages, _: [m.message_id for m in messages],
+            max_workers=max_workers,
+        )
+
+    @staticmethod
+    def _saved_event_ids(events: List[Event], response_message: dict) -> List[str]:
+        event_ids = response_message["event_ids"]
+        for event, event_id in zip(events, event_ids):
+            event.event_id = event_id
+        return event_ids
+
+    def _bulk_save(
+        self,
+        kind: str,
+        items: Sequence[M],
+        batchable: Callable[[M], bool],
+        save_one: Callable[[M], str],
+        batch_ids: Callable[[List[M], dict], List[str]],
+        max_workers: int,
+    ) -> List[SaveResult]:
+        results: List[Optional[SaveResult]] = [None] * len(items)
+        singles = list(range(len(items)))
+
+        if self.batch_writes is not False:
+            batch_indices = [i for i in singles if batchable(items[i])]
+            singles = [i for i in singles if not batchable(items[i])]
+            for start in range(0, len(batch_indices), self.max_batch_size):
+                chunk = batch_indices[start : start + self.max_batch_size]
+                if self.batch_writes is False:
+                    singles.extend(chunk)
+                    continue
+                try:
+                    ids = self._save_batch(kind, [items[i] for i in chunk], batch_ids)
+                except requests.exceptions.HTTPError as e:
+                    if e.response is not None and e.response.status_code < 500:
+                        # Save individually to find out which items were rejected
+                        singles.extend(chunk)
+                    else:
+                        for i in chunk:
+                            results[i] = SaveResult(error=e)
+                    continue
+                except Exception as e:
+                    for i in chunk:
+                        results[i] = SaveResult(error=e)
+                    continue
+                if ids is None:
+                    singles.extend(chunk)
+                else:
+                    for i, item_id in zip(chunk, ids):
+                        results[i] = SaveResult(id=item_id)
+
+        def save_single(i: int) -> SaveResult:
+            try:
+                return SaveResult(id=save_one(items[i]))
+            except Exception as e:
+                return SaveResult(error=e)
+
+        if singles:
+            with ThreadPoolExecutor(
+                max_workers=max(1, min(max_workers, len(singles)))
+            ) as executor:
+                for i, result in zip(singles, executor.map(save_single, singles)):
+                    results[i] = result
+
+        return results  # type: ignore[return-value]
+
+    def _save_batch(
+        self,
+        kind: str,
+        items: List[M],
+        batch_ids: Callable[[List[M], dict], List[str]],
+    ) -> Optional[List[str]]:
+        """
+        Save a batch of items in one request, returning their ids.
+        Returns None if the store doesn't support batch writes.
+        """
+        batch_url = f"{self.base_url}/interaction/v1/{kind}/batch"
+        response = self._call(
+            "post",
+            batch_url,
+            {f"{kind}s": [item.model_dump() for item in items]},
+        )
+        if self.batch_writes is None and _unsupported(response):
+            logging.info(
+                f"Interaction Store at {self.base_url} does not support batch writes"
             )
-            self.save_event(event)
-        response_message = response.json()
-        if not event.event_id:
-            # If this is a new event, then we should have gotten back its ID.
-            event.event_id = response_message["event_id"]
-        return event.event_id
+            self.batch_writes = False
+            return None
+        response.raise_for_status()
+        for item in items:
+            self._on_saved(item)
+        return batch_ids(items, response.json())
 
     def save_channel(self, channel: Channel) -> None:
         """Save a channel to the Interactions API"""
@@ -179,6 +785,7 @@ class InteractionsService:
             channel.model_dump(),
         )
         response.raise_for_status()
+        self._on_saved(channel)
 
     def save_thread(self, thread: Thread) -> None:
         """Save a thread to the Interactions API"""
@@ -201,57 +808,33 @@ class InteractionsService:
         thread_url = f"{self.base_url}/interaction/v1/thread/{thread_id}"
         response = self._call("delete", thread_url)
         response.raise_for_status()
+        if self.cache is not None:
+            self.cache.on_thread_deleted(thread_id)
+        if self.snapshots is not None:
+            self.snapshots.on_thread_deleted(thread_id)
 
     def save_message_reaction(
         self, message_id: str, reaction: str, actor_id: UUID
     ) -> str:
         """Save reaction as an event on a message, returns event id if successful"""
-        if reaction is None:
-            event = Event(
-                type=EventType.REACTION_REMOVED.value,
-                actor_id=actor_id,
-                timestamp=datetime.now(timezone.utc),
-                message_id=message_id,
-            )
-        else:
-            event = Event(
-                type=EventType.REACTION_ADDED.value,
-                actor_id=actor_id,
-                timestamp=datetime.now(timezone.utc),
-                text=reaction,
-                message_id=message_id,
-            )
-
-        return self.save_event(event)
+        return self.save_event(self._reaction_event(message_id, reaction, actor_id))
 
     def save_message_feedback(
         self, message_id: str, feedback: str, actor_id: UUID
     ) -> str:
         """Save feedback as an event on a message, returns event id if successful"""
-        event = Event(
-            type=EventType.USER_FEEDBACK.value,
-            actor_id=actor_id,
-            timestamp=datetime.now(timezone.utc),
-            text=feedback,
-            message_id=message_id,
+        return self.save_event(
+            self._message_feedback_event(message_id, feedback, actor_id)
         )
 
-        return self.save_event(event)
-
     def save_thread_feedback(
         self, thread_id: str, feedback: str, actor_id: UUID
     ) -> str:
         """Save feedback as an event on a thread, returns event id if successful"""
-        event = Event(
-            type=EventType.USER_FEEDBACK_THREAD.value,
-            actor_id=actor_id,
-            timestamp=datetime.now(timezone.utc),
-            text=feedback,
-            thread_id=thread_id,
+        return self.save_event(
+            self._thread_feedback_event(thread_id, feedback, actor_id)
         )
 
-        return self.save_event(event)
-
     def get_virtual_thread_content(
         self, message_id: str, virtual_thread_id: str
     ) -> List[ReturnedMessage]:
@@ -261,10 +844,147 @@ class InteractionsService:
         :param message_id: The ID of a message in the virtual thread
         :param virtual_thread_id: The ID of the virtual thread
         """
+        thread_id, until = self._message_position(message_id)
+        if not thread_id:
+            return []
+        index = self.virtual_thread_index(thread_id)
+        index.refresh()
+        until = index.message_ts(message_id) or until
+        tagged = index.messages(virtual_thread_id, until=until)
+        if not tagged:
+            return []
+        # Every tagged message is fetched with the events of any tagged type, in
+        # as few searches as possible, and its events are narrowed down below
+        event_types = set().union(*(types for _, types in tagged))
+        messages = self._get_many(
+            None,
+            [tagged_message_id for tagged_message_id, _ in tagged],
+            fetch_batch=lambda ids: self._search_ids(
+                "message",
+                self._tagged_messages_request(ids, event_types),
+                "ReturnedMessage",
+                self._returned_messages,
+            ),
+            fetch_one=lambda tagged_message_id: self._fetch_tagged_message(
+                tagged_message_id, event_types
+            ),
+        )
+
+        content = []
+        for tagged_message_id, types in tagged:
+            msg = messages[tagged_message_id]
+            if msg is MISSING:
+                continue
+            msg.thread_id = msg.thread_id or index.thread_id
+            msg.events = [
+                event
+                for event in msg.events
+                if event.type in types and event.type != VirtualThread.EVENT_TYPE
+            ]
+            if VirtualThread.EVENT_TYPE not in types:
+                # Only events on this message are in the virtual thread
+                msg.text = ""
+            content.append(msg)
+        return content
+
+    def _fetch_tagged_message(
+        self, message_id: str, event_types: Set[str]
+    ) -> ReturnedMessage:
+        message_search_url = f"{self.base_url}/interaction/v1/search/message"
+        response = self._call(
+            "post",
+            message_search_url,
+            self._tagged_message_request(message_id, event_types),
+        )
+        response.raise_for_status()
+        return self._parse(
+            "ReturnedMessage",
+            ReturnedMessage.model_validate,
+            response.json()["message"],
+        )
+
+    def virtual_thread_index(self, thread_id: str) -> VirtualThreadIndex:
+        """
+        Index of the virtual threads in a thread. Indexes of recently used threads are
+        kept and refreshed incrementally, and tags saved through this service are
+        added to them as they are saved. Tags other clients add to older messages
+        show up once the index's max_age_seconds have passed.
+        """
+        with self._indexes_lock:
+            index = self._virtual_thread_indexes.get(thread_id)
+            if index is None:
+                index = VirtualThreadIndex(self, thread_id)
+                self._virtual_thread_indexes[thread_id] = index
+                if len(self._virtual_thread_indexes) > self.max_virtual_thread_indexes:
+                    self._virtual_thread_indexes.popitem(last=False)
+            else:
+                self._virtual_thread_indexes.move_to_end(thread_id)
+            return index
+
+    def _index_tag(
+        self,
+        tag: Event,
+        thread_id: Optional[str] = None,
+        message_ts: Optional[datetime] = None,
+    ) -> None:
+        """Add a saved tag to the cached virtual thread indexes"""
+        with self._indexes_lock:
+            if thread_id is not None:
+                index = self._virtual_thread_indexes.get(thread_id)
+                indexes = [index] if index is not None else []
+            else:
+                # Only the index that has seen the tagged message will take it
+                indexes = list(self._virtual_thread_indexes.values())
+        for index in indexes:
+            index.add_tag(tag, message_ts=message_ts)
+
+    def _message_position(self, message_id: str) -> Tuple[Optional[str], datetime]:
+        """Thread ID and timestamp of a message"""
         message_search_url = f"{self.base_url}/interaction/v1/search/message"
+        response = self._call(
+            "post",
+            message_search_url,
+            {"id": message_id, "relations": {"thread": {}}},
+        )
+        response.raise_for_status()
+        msg = self._parse(
+            "ReturnedMessage", self._returned_message, response.json()["message"]
+        )
+        return msg.thread_id, msg.ts
+
+    @staticmethod
+    def _tagged_message_request(message_id: str, event_types: Set[str]) -> dict:
+        """Request for a message and only its events of the given types"""
+        return {
+            "id": message_id,
+            "relations": InteractionsService._tagged_event_relations(event_types),
+        }
+
+    @staticmethod
+    def _tagged_messages_request(message_ids: List[str], event_types: Set[str]) -> dict:
+        """Request for many messages and only their events of the given types"""
+        return {
+            "ids": message_ids,
+            "relations": InteractionsService._tagged_event_relations(event_types),
+        }
+
+    @staticmethod
+    def _tagged_event_relations(event_types: Set[str]) -> Dict[str, Any]:
+        relations: Dict[str, Any] = {}
+        event_types = event_types - {VirtualThread.EVENT_TYPE}
+        if event_types:
+            relations["events"] = {"filter": {"type": sorted(event_types)}}
+        return relations
+
+    @staticmethod
+    def _virtual_thread_request(message_id: str) -> dict:
+        """
+        Request for a message, its preceding messages, and all of their events.
+        Only used by AsyncInteractionsService; see VirtualThreadIndex.
+        """
         # Fetch all events and filter on the client side
         # Need an IStore schema change to do this server-side
-        request_body = {
+        return {
             "id": message_id,
             "relations": {
                 "preceding_messages": {
@@ -275,13 +995,12 @@ class InteractionsService:
             },
         }
 
-        response = self._call(
-            "post",
-            message_search_url,
-            request_body,
-        )
-        response.raise_for_status()
-        result = ReturnedMessage.model_validate(response.json()["message"])
+    @staticmethod
+    def _virtual_thread_content(
+        json_response: dict, virtual_thread_id: str
+    ) -> List[ReturnedMessage]:
+        """Filter a _virtual_thread_request response down to one virtual thread"""
+        result = ReturnedMessage.model_validate(json_response["message"])
         all_messages = result.preceding_messages + [result]
         virtual_thread_content = []
         for msg in all_messages:
@@ -317,21 +1036,75 @@ class InteractionsService:
             annotation.model_dump(),
         )
         response.raise_for_status()
+        self._on_saved(annotation)
 
     def get_message(self, message_id: str) -> ReturnedMessage:
         """Fetch a message from the Interactions API"""
+        return self._cached(
+            InteractionsCache.MESSAGE,
+            message_id,
+            lambda: self._fetch_message(message_id),
+        )
+
+    def _fetch_message(self, message_id: str) -> ReturnedMessage:
         message_url = f"{self.base_url}/interaction/v1/search/message"
-        request_body = {
-            "id": message_id,
-            "relations": {"thread": {}, "channel": {}, "events": {}, "annotations": {}},
-        }
         response = self._call(
             "post",
             message_url,
-            request_body,
+            self._get_message_request(message_id),
         )
         response.raise_for_status()
-        res_dict = response.json()["message"]
+        return self._parse(
+            "ReturnedMessage", self._returned_message, response.json()["message"]
+        )
+
+    @staticmethod
+    def _get_message_request(message_id: str) -> dict:
+        return {
+            "id": message_id,
+            "relations": {"thread": {}, "channel": {}, "events": {}, "annotations": {}},
+        }
+
+    def get_messages(
+        self, message_ids: Sequence[str]
+    ) -> Dict[str, Union[ReturnedMessage, Missing]]:
+        """
+        Fetch many messages, keyed by id in the order given, with MISSING for ids
+        that don't exist. Ids are searched for up to max_batch_size at a time, with
+        the searches sent in parallel.
+        """
+        return self._get_many(
+            InteractionsCache.MESSAGE,
+            message_ids,
+            fetch_batch=lambda ids: self._search_ids(
+                "message",
+                self._get_messages_request(ids),
+                "ReturnedMessage",
+                self._returned_messages,
+            ),
+            fetch_one=self._fetch_message,
+        )
+
+    @staticmethod
+    def _get_messages_request(message_ids: List[str]) -> dict:
+        return {
+            "ids": message_ids,
+            "relations": {"thread": {}, "channel": {}, "events": {}, "annotations": {}},
+        }
+
+    @staticmethod
+    def _returned_messages(json_response: dict) -> Dict[str, ReturnedMessage]:
+        messages = [
+            InteractionsService._returned_message(res_dict)
+            for res_dict in json_response.get("messages", [])
+        ]
+        return {
+            message.message_id: message for message in messages if message.message_id
+        }
+
+    @staticmethod
+    def _returned_message(res_dict: dict) -> ReturnedMessage:
+        """Parse the message in a _get_message_request response"""
         res = ReturnedMessage.model_validate(res_dict)
 
         # thread_id and channel_id are for some reason nested in the response
@@ -344,6 +1117,11 @@ class InteractionsService:
 
     def get_event(self, event_id: str) -> Event:
         """Fetch an event from the Interactions API"""
+        return self._cached(
+            InteractionsCache.EVENT, event_id, lambda: self._fetch_event(event_id)
+        )
+
+    def _fetch_event(self, event_id: str) -> Event:
         event_url = f"{self.base_url}/interaction/v1/search/event"
         request_body = {
             "id": event_id,
@@ -354,24 +1132,152 @@ class InteractionsService:
             request_body,
         )
         response.raise_for_status()
-        res_dict = response.json()["events"][0]
+        return self._parse("Event", self._returned_event, response.json())
+
+    @staticmethod
+    def _returned_event(json_response: dict) -> Event:
+        res_dict = json_response["events"][0]
         res = Event.model_validate(res_dict)
         return res
 
+    def get_events(self, event_ids: Sequence[str]) -> Dict[str, Union[Event, Missing]]:
+        """
+        Fetch many events, keyed by id in the order given, with MISSING for ids
+        that don't exist. Ids are searched for up to max_batch_size at a time, with
+        the searches sent in parallel.
+        """
+        return self._get_many(
+            InteractionsCache.EVENT,
+            event_ids,
+            fetch_batch=lambda ids: self._search_ids(
+                "event", {"ids": ids}, "Event", self._returned_events
+            ),
+            fetch_one=self._fetch_event,
+        )
+
+    @staticmethod
+    def _returned_events(json_response: dict) -> Dict[str, Event]:
+        events = [
+            Event.model_validate(res_dict)
+            for res_dict in json_response.get("events", [])
+        ]
+        return {event.event_id: event for event in events if event.event_id}
+
+    def _search_ids(
+        self,
+        kind: str,
+        request_body: dict,
+        model: str,
+        parse: Callable[[dict], Dict[str, C]],
+    ) -> Optional[Dict[str, C]]:
+        """
+        Search for many messages or events by id in one request.
+        Returns None if the store doesn't support searches by ids.
+        """
+        search_url = f"{self.base_url}/interaction/v1/search/{kind}"
+        response = self._call("post", search_url, request_body)
+        if self.batch_reads is None:
+            # Until a search by ids has worked, a store that rejects the request
+            # body most likely doesn't know the ids filter
+            if _unsupported(response) or response.status_code in (400, 422):
+                logging.info(
+                    f"Interaction Store at {self.base_url} does not support searches by ids"
+                )
+                self.batch_reads = False
+                return None
+            if response.ok:
+                self.batch_reads = True
+        response.raise_for_status()
+        return self._parse(model, parse, response.json())
+
+    def _get_many(
+        self,
+        kind: Optional[str],
+        ids: Sequence[str],
+        fetch_batch: Callable[[List[str]], Optional[Dict[str, C]]],
+        fetch_one: Callable[[str], C],
+    ) -> Dict[str, Union[C, Missing]]:
+        """
+        Look up ids in the cache, then search for the rest in batches, or one at a
+        time if the store can't search by ids
+        :param kind: Cache kind of the items, or None if they aren't cached
+        """
+        results: Dict[str, Union[C, Missing]] = {item_id: MISSING for item_id in ids}
+        found: Dict[str, C] = {}
+        remaining = list(results)
+        if (
+            kind is not None
+            and self.cache is not None
+            and self.cache.policy(kind).max_size > 0
+        ):
+            for item_id in list(remaining):
+                cached = self.cache.get(kind, item_id)
+                if cached is not None:
+                    results[item_id] = cached  # type: ignore[assignment]
+            remaining = [i for i in remaining if results[i] is MISSING]
+        if not remaining:
+            return results
+
+        singles: List[str] = []
+        if self.batch_reads is not False:
+            chunks = [
+                remaining[start : start + self.max_batch_size]
+                for start in range(0, len(remaining), self.max_batch_size)
+            ]
+            if len(chunks) == 1:
+                fetched = [fetch_batch(chunks[0])]
+            else:
+                fetched = list(self._background().map(fetch_batch, chunks))
+            for chunk, items in zip(chunks, fetched):
+                if items is None:
+                    singles.extend(chunk)
+                else:
+                    found.update(items)
+        else:
+            singles = remaining
+
+        def fetch_single(item_id: str) -> Optional[C]:
+            try:
+                return fetch_one(item_id)
+            except requests.exceptions.HTTPError as e:
+                if e.response is not None and e.response.status_code == 404:
+                    return None
+                raise
+
+        if len(singles) <= 1:
+            single_results = [fetch_single(item_id) for item_id in singles]
+        else:
+            single_results = list(self._background().map(fetch_single, singles))
+        for item_id, item in zip(singles, single_results):
+            if item is not None:
+                found[item_id] = item
+
+        for item_id, item in found.items():
+            if item_id in results:
+                results[item_id] = item
+                if kind is not None and self.cache is not None:
+                    self.cache.put(kind, item_id, item)  # type: ignore[arg-type]
+        return results
+
     def fetch_all_threads_by_channel(
         self,
         channel_id: str,
         min_timestamp: Optional[str] = None,
         thread_event_types: Optional[list[str]] = None,
         most_recent: Optional[int] = None,
+        projection: Optional[Projection] = None,
     ) -> dict:
-        """Fetch a message from the Interactions API"""
+        """
+        Fetch a message from the Interactions API
+        :param projection: Only return these message and event fields
+        """
         message_url = f"{self.base_url}/interaction/v1/search/channel"
         request_body = self._channel_lookup_request(
             channel_id=channel_id,
             min_timestamp=min_timestamp,
             thread_event_types=thread_event_types,
             most_recent=most_recent,
+            projection=projection,
         )
         response = self._call(
             "post",
@@ -387,14 +1293,20 @@ class InteractionsService:
         event_types: List[str],
         min_timestamp: Optional[str] = None,
         most_recent: Optional[int] = None,
+        projection: Optional[Projection] = None,
     ) -> ThreadRelationsResponse:
-        """Fetch messages sorted by timestamp and events for agent context"""
+        """
+        Fetch messages sorted by timestamp and events for agent context
+        :param projection: Only return these message and event fields, e.g.
+            IDS_AND_EVENT_DATA. Fields left out take their model defaults.
+        """
         message_url = f"{self.base_url}/interaction/v1/search/message"
         request_body = self._thread_lookup_request(
             message_id,
             event_types=event_types,
             min_timestamp=min_timestamp,
             most_recent=most_recent,
+            projection=projection,
         )
         response = self._call(
             "post",
@@ -402,8 +1314,41 @@ class InteractionsService:
             request_body,
         )
         response.raise_for_status()
-        json_response = response.json()
+        return self._parse(
+            "ThreadRelationsResponse", self._thread_relations, response.json()
+        )
+
+    def fetch_thread_view_for_message(
+        self,
+        message_id: str,
+        event_types: List[str],
+        min_timestamp: Optional[str] = None,
+        most_recent: Optional[int] = None,
+        projection: Optional[Projection] = None,
+    ) -> ThreadView:
+        """
+        Same as fetch_thread_messages_and_events_for_message, but returns a lazy view
+        that only validates the messages and events that are accessed
+        """
+        message_url = f"{self.base_url}/interaction/v1/search/message"
+        request_body = self._thread_lookup_request(
+            message_id,
+            event_types=event_types,
+            min_timestamp=min_timestamp,
+            most_recent=most_recent,
+            projection=projection,
+        )
+        response = self._call(
+            "post",
+            message_url,
+            request_body,
+        )
+        response.raise_for_status()
+        return ThreadView(response.json().get("message", {}).get("thread", {}))
 
+    @staticmethod
+    def _thread_relations(json_response: dict) -> ThreadRelationsResponse:
+        """Parse the thread in a _thread_lookup_request response"""
         return ThreadRelationsResponse.model_validate(
             json_response.get("message", {}).get("thread", {})
         )
@@ -413,71 +1358,112 @@ class InteractionsService:
         thread_id: str,
         event_type: Optional[str] = None,
         min_timestamp: Optional[str] = None,
+        projection: Optional[Projection] = None,
     ) -> dict:
-        """Fetch messages and events for the given thread from the Interactions API"""
+        """
+        Fetch messages and events for the given thread from the Interactions API
+        :param projection: Only return these message and event fields
+        """
         thread_search_url = f"{self.base_url}/interaction/v1/search/thread"
-        message_query = {
+        response = self._call(
+            "post",
+            thread_search_url,
+            self._messages_and_events_for_thread_request(
+                thread_id, event_type, min_timestamp, projection=projection
+            ),
+        )
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    def _messages_and_events_for_thread_request(
+        thread_id: str,
+        event_type: Optional[str] = None,
+        min_timestamp: Optional[str] = None,
+        projection: Optional[Projection] = None,
+    ) -> dict:
+        message_query: dict = {
             "filter": {"min_timestamp": min_timestamp} if min_timestamp else None,
             "apply_annotations_from_actors": ["*"],
         }
-        request_body = {
+        event_query = {"filter": {"type": event_type}} if event_type else {}
+        if projection is not None:
+            message_query = projection.message_query(message_query)
+            event_query = projection.event_query(event_query)
+        return {
             "id": thread_id,
             "relations": {
                 "messages": message_query,
-                "events": {"filter": {"type": event_type}} if event_type else {},
+                "events": event_query,
             },
         }
 
+    def fetch_events_for_message(
+        self,
+        message_id: str,
+        event_type: Optional[str] = None,
+        projection: Optional[Projection] = None,
+    ) -> dict:
+        """
+        Fetch messages and events for the thread containing a given message from the Interactions API
+        :param projection: Only return these message and event fields
+        """
+        message_search_url = f"{self.base_url}/interaction/v1/search/message"
         response = self._call(
             "post",
-            thread_search_url,
-            request_body,
+            message_search_url,
+            self._events_for_message_request(
+                message_id, event_type, projection=projection
+            ),
         )
         response.raise_for_status()
         return response.json()
 
-    def fetch_events_for_message(
-        self,
+    @staticmethod
+    def _events_for_message_request(
         message_id: str,
         event_type: Optional[str] = None,
+        projection: Optional[Projection] = None,
     ) -> dict:
-        """Fetch messages and events for the thread containing a given message from the Interactions API"""
-        message_search_url = f"{self.base_url}/interaction/v1/search/message"
-        request_body = {
+        event_query = {"filter": {"type": event_type}} if event_type else {}
+        request: dict = {
             "id": message_id,
             "relations": {
-                "events": {"filter": {"type": event_type}} if event_type else {},
+                "events": event_query,
             },
         }
-
-        response = self._call(
-            "post",
-            message_search_url,
-            request_body,
-        )
-        response.raise_for_status()
-        return response.json()
+        if projection is not None:
+            request = projection.message_query(request)
+            request["relations"]["events"] = projection.event_query(event_query)
+        return request
 
     def get_channel(self, channel_id: str) -> Optional[Channel]:
         """Fetch a channel by ID"""
-        url = f"{self.base_url}/interaction/v1/search/channel"
-        response = self._call("post", url, {"id": channel_id})
-        response.raise_for_status()
-        data = response.json()
-        if "channel" not in data:
-            return None
-        channel_data = data["channel"]
-        return Channel.model_validate(channel_data)
+
+        def fetch() -> Optional[Channel]:
+            url = f"{self.base_url}/interaction/v1/search/channel"
+            response = self._call("post", url, {"id": channel_id})
+            response.raise_for_status()
+            return self._parse("Channel", self._returned_channel, response.json())
+
+        return self._cached(InteractionsCache.CHANNEL, channel_id, fetch)
 
     def get_channel_by_context(self, context_id: str) -> Optional[Channel]:
         """
         Fetch a channel by a context ID. The context_id may be the ID of a
         channel, thread, message, or event.
         """
-        url = f"{self.base_url}/interaction/v1/channel/by-context/{context_id}"
-        response = self._call("get", url)
-        response.raise_for_status()
-        data = response.json()
+
+        def fetch() -> Optional[Channel]:
+            url = f"{self.base_url}/interaction/v1/channel/by-context/{context_id}"
+            response = self._call("get", url)
+            response.raise_for_status()
+            return self._parse("Channel", self._returned_channel, response.json())
+
+        return self._cached(InteractionsCache.CHANNEL_BY_CONTEXT, context_id, fetch)
+
+    @staticmethod
+    def _returned_channel(data: dict) -> Optional[Channel]:
         if "channel" not in data:
             return None
         channel_data = data["channel"]
@@ -493,11 +1479,116 @@ class InteractionsService:
         num_most_recent_messages_per_thread: Optional[int] = None,
         num_oldest_messages_per_thread: Optional[int] = None,
         thread_status: List[ThreadStatus] = [ThreadStatus.ACTIVE],
+        projection: Optional[Projection] = None,
     ) -> dict:
         """
         Fetch all threads, messages, and events including nested ones for a given channel
+        :param projection: Only return these message and event fields
         """
         channel_search_url = f"{self.base_url}/interaction/v1/search/channel"
+        response = self._call(
+            "post",
+            channel_search_url,
+            self._fetch_all_by_channel_request(
+                channel_id,
+                min_timestamp=min_timestamp,
+                before_timestamp=before_timestamp,
+                event_types=event_types,
+                num_most_recent_threads=num_most_recent_threads,
+                num_most_recent_messages_per_thread=num_most_recent_messages_per_thread,
+                num_oldest_messages_per_thread=num_oldest_messages_per_thread,
+                thread_status=thread_status,
+                projection=projection,
+            ),
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def iter_channel_threads(
+        self,
+        channel_id: str,
+        page_size: int = 20,
+        min_timestamp: Optional[str] = None,
+        before_timestamp: Optional[str] = None,
+        event_types: Optional[List[str]] = None,
+        num_most_recent_messages_per_thread: Optional[int] = None,
+        num_oldest_messages_per_thread: Optional[int] = None,
+        thread_status: List[ThreadStatus] = [ThreadStatus.ACTIVE],
+        projection: Optional[Projection] = None,
+    ) -> Iterator[ReturnedThread]:
+        """
+        Iterate over the threads of a channel, newest first, with their messages and events.
+        Takes the same filters as fetch_all_by_channel, but fetches page_size threads
+        per request, so only one page is held in memory at a time.
+        Each page asks for the threads before the oldest thread of the previous page.
+        """
+        channel_search_url = f"{self.base_url}/interaction/v1/search/channel"
+        cursor = before_timestamp
+        seen_thread_ids: set = set()
+        while True:
+            response = self._call(
+                "post",
+                channel_search_url,
+                self._fetch_all_by_channel_request(
+                    channel_id,
+                    min_timestamp=min_timestamp,
+                    before_timestamp=cursor,
+                    event_types=event_types,
+                    num_most_recent_threads=page_size,
+                    num_most_recent_messages_per_thread=num_most_recent_messages_per_thread,
+                    num_oldest_messages_per_thread=num_oldest_messages_per_thread,
+                    thread_status=thread_status,
+                    projection=projection,
+                ),
+            )
+            response.raise_for_status()
+            page = response.json().get("channel", {}).get("threads") or []
+            del response
+
+            page_cursor: Optional[datetime] = None
+            page_thread_ids = set()
+            # Pop threads off the page as we go so they can be freed once consumed
+            page.reverse()
+            while page:
+                thread = self._parse(
+                    "ReturnedThread", ReturnedThread.model_validate, page.pop()
+                )
+                thread_cursor = self._thread_cursor(thread)
+                if thread_cursor and (
+                    page_cursor is None or thread_cursor < page_cursor
+                ):
+                    page_cursor = thread_cursor
+                page_thread_ids.add(thread.thread_id)
+                if thread.thread_id not in seen_thread_ids:
+                    yield thread
+
+            if len(page_thread_ids) < page_size or page_cursor is None:
+                return
+            if page_thread_ids <= seen_thread_ids:
+                # No progress; the cursor can't move past this page
+                return
+            seen_thread_ids = page_thread_ids
+            cursor = page_cursor.isoformat()
+
+    @staticmethod
+    def _thread_cursor(thread: ReturnedThread) -> Optional[datetime]:
+        """Timestamp used to page past a thread: its creation time, or its first message"""
+        if thread.created_at:
+            return thread.created_at
+        return min((message.ts for message in thread.messages), default=None)
+
+    @staticmethod
+    def _fetch_all_by_channel_request(
+        channel_id: str,
+        min_timestamp: Optional[str] = None,
+        before_timestamp: Optional[str] = None,
+        event_types: Optional[List[str]] = None,
+        num_most_recent_threads: Optional[int] = None,
+        num_most_recent_messages_per_thread: Optional[int] = None,
+        num_oldest_messages_per_thread: Optional[int] = None,
+        thread_status: List[ThreadStatus] = [ThreadStatus.ACTIVE],
+        projection: Optional[Projection] = None,
+    ) -> dict:
         thread_filter_query = {
             "status": thread_status,
             "min_timestamp": min_timestamp if min_timestamp else None,
@@ -518,12 +1609,16 @@ class InteractionsService:
                 else None
             ),
         }
-        message_query = {
+        message_query: dict = {
             "relations": {"events": event_query, "annotations:": {}},
             "filter": message_filter_query,
             "apply_annotations_from_actors": ["*"],
         }
-        request_body = {
+        if projection is not None:
+            event_query = projection.event_query(event_query)
+            message_query = projection.message_query(message_query)
+            message_query["relations"]["events"] = event_query
+        return {
             "id": channel_id,
             "relations": {
                 "threads": {
@@ -535,13 +1630,6 @@ class InteractionsService:
                 },
             },
         }
-        response = self._call(
-            "post",
-            channel_search_url,
-            request_body,
-        )
-        response.raise_for_status()
-        return response.json()
 
     def fetch_all_by_thread(
         self,
@@ -549,35 +1637,88 @@ class InteractionsService:
         min_timestamp: Optional[str] = None,
         event_types: Optional[List[str]] = None,
         most_recent: Optional[int] = None,
+        oldest: Optional[int] = None,
+        projection: Optional[Projection] = None,
+        min_event_timestamp: Optional[str] = None,
     ) -> dict:
         """
         Fetch all messages and events including nested ones for a given thread
+        :param oldest: Only the given number of oldest messages (at or after
+            min_timestamp), to page forward through a thread
+        :param projection: Only return these message and event fields
+        :param min_event_timestamp: Only the thread's own events created or updated
+            at or after this time. min_timestamp only filters messages.
+
+        Reads of whole threads, without filters other than event_types, are served
+        from `snapshots` if the service has one.
         """
         thread_search_url = f"{self.base_url}/interaction/v1/search/thread"
+
+        def fetch(min_timestamp: Optional[str]) -> dict:
+            response = self._call(
+                "post",
+                thread_search_url,
+                self._fetch_all_by_thread_request(
+                    thread_id,
+                    min_timestamp=min_timestamp,
+                    event_types=event_types,
+                    most_recent=most_recent,
+                    oldest=oldest,
+                    projection=projection,
+                    min_event_timestamp=min_event_timestamp,
+                ),
+            )
+            response.raise_for_status()
+            return response.json()
+
+        if self.snapshots is not None and not (
+            min_timestamp or most_recent or oldest or projection or min_event_timestamp
+        ):
+            return self.snapshots.fetch(thread_id, fetch, event_types=event_types)
+        return fetch(min_timestamp)
+
+    @staticmethod
+    def _fetch_all_by_thread_request(
+        thread_id: str,
+        min_timestamp: Optional[str] = None,
+        event_types: Optional[List[str]] = None,
+        most_recent: Optional[int] = None,
+        oldest: Optional[int] = None,
+        projection: Optional[Projection] = None,
+        min_event_timestamp: Optional[str] = None,
+    ) -> dict:
         event_query = {"filter": None if event_types is None else {"type": event_types}}
         message_filter_query = {
             "min_timestamp": min_timestamp if min_timestamp else None,
             "most_recent": most_recent if most_recent else None,
         }
-        message_query = {
+        if oldest:
+            message_filter_query["oldest"] = oldest
+        message_query: dict = {
             "relations": {"events": event_query, "annotations:": {}},
             "filter": message_filter_query,
             "apply_annotations_from_actors": ["*"],
         }
-        request_body = {
+        if projection is not None:
+            event_query = projection.event_query(event_query)
+            message_query = projection.message_query(message_query)
+            message_query["relations"]["events"] = event_query
+        thread_event_query: dict = event_query
+        if min_event_timestamp:
+            thread_event_query = {
+                **event_query,
+                "filter": {
+                    **(event_query.get("filter") or {}),
+                    "min_timestamp": min_event_timestamp,
+                },
+            }
+        return {
             "id": thread_id,
             "relations": {
                 "messages": message_query,
-                "events": event_query,
+                "events": thread_event_query,
             },
         }
-        response = self._call(
-            "post",
-            thread_search_url,
-            request_body,
-        )
-        response.raise_for_status()
-        return response.json()
 
     def report_cost(self, step_cost: StepCost) -> Optional[str]:
         """Save a cost report to the Interactions Store. Returning event id"""
@@ -592,28 +1733,120 @@ class InteractionsService:
             else:
                 raise e
 
+    @staticmethod
+    def _event_endpoint(base_url: str, event: Event) -> Tuple[str, str]:
+        """Method and URL to save an event: new events are created, existing ones patched"""
+        if event.event_id:
+            return "patch", f"{base_url}/interaction/v1/event/{event.event_id}"
+        else:
+            return "post", f"{base_url}/interaction/v1/event"
+
+    @staticmethod
+    def _saved_event_id(event: Event, response_message: dict) -> str:
+        if not event.event_id:
+            # If this is a new event, then we should have gotten back its ID.
+            event.event_id = response_message["event_id"]
+        return event.event_id
+
+    @staticmethod
+    def _message_tag(message: Message, virtual_thread_id: str) -> Event:
+        """Event that tags a message with a virtual thread ID"""
+        return Event(
+            type=VirtualThread.EVENT_TYPE,
+            actor_id=message.actor_id,
+            message_id=message.message_id,
+            data={
+                VirtualThread.ID_FIELD: virtual_thread_id,
+                VirtualThread.EVENT_TYPE_FIELD: VirtualThread.EVENT_TYPE,
+            },
+            timestamp=message.ts,
+        )
+
+    @staticmethod
+    def _event_tag(event: Event, virtual_thread_id: str) -> Event:
+        """Event that tags an event with a virtual thread ID"""
+        # Attach it to the same message as this event, along with the event type
+        return Event(
+            type=VirtualThread.EVENT_TYPE,
+            actor_id=event.actor_id,
+            message_id=event.message_id,
+            data={
+                VirtualThread.ID_FIELD: virtual_thread_id,
+                VirtualThread.EVENT_TYPE_FIELD: event.type,
+            },
+            timestamp=event.timestamp,
+        )
+
+    @staticmethod
+    def _reaction_event(
+        message_id: str, reaction: Optional[str], actor_id: UUID
+    ) -> Event:
+        if reaction is None:
+            return Event(
+                type=EventType.REACTION_REMOVED.value,
+                actor_id=actor_id,
+                timestamp=datetime.now(timezone.utc),
+                message_id=message_id,
+            )
+        else:
+            return Event(
+                type=EventType.REACTION_ADDED.value,
+                actor_id=actor_id,
+                timestamp=datetime.now(timezone.utc),
+                text=reaction,
+                message_id=message_id,
+            )
+
+    @staticmethod
+    def _message_feedback_event(
+        message_id: str, feedback: str, actor_id: UUID
+    ) -> Event:
+        return Event(
+            type=EventType.USER_FEEDBACK.value,
+            actor_id=actor_id,
+            timestamp=datetime.now(timezone.utc),
+            text=feedback,
+            message_id=message_id,
+        )
+
+    @staticmethod
+    def _thread_feedback_event(thread_id: str, feedback: str, actor_id: UUID) -> Event:
+        return Event(
+            type=EventType.USER_FEEDBACK_THREAD.value,
+            actor_id=actor_id,
+            timestamp=datetime.now(timezone.utc),
+            text=feedback,
+            thread_id=thread_id,
+        )
+
     @staticmethod
     def _channel_lookup_request(
         channel_id: str,
         min_timestamp: Optional[str] = None,
         thread_event_types: Optional[list[str]] = None,
         most_recent: Optional[int] = None,
+        projection: Optional[Projection] = None,
     ) -> dict:
         """Interaction service API request to get threads and messages for a channel"""
         message_filter_query = {
             "min_timestamp": min_timestamp if min_timestamp else None,
             "most_recent": most_recent if most_recent else None,
         }
+        message_query: dict = {
+            "filter": message_filter_query,
+            "apply_annotations_from_actors": ["*"],
+        }
+        event_query: dict = {"filter": {"type": thread_event_types or []}}
+        if projection is not None:
+            message_query = projection.message_query(message_query)
+            event_query = projection.event_query(event_query)
         return {
             "id": channel_id,
             "relations": {
                 "threads": {
                     "relations": {
-                        "messages": {
-                            "filter": message_filter_query,
-                            "apply_annotations_from_actors": ["*"],
-                        },
-                        "events": {"filter": {"type": thread_event_types or []}},
+                        "messages": message_query,
+                        "events": event_query,
                     }
                 }
             },
@@ -625,22 +1858,28 @@ class InteractionsService:
         event_types: list[str],
         min_timestamp: Optional[str] = None,
         most_recent: Optional[int] = None,
+        projection: Optional[Projection] = None,
     ) -> dict:
         """will return all messages for the thread containing the given message and events associated with each message"""
         message_filter_query = {
             "min_timestamp": min_timestamp if min_timestamp else None,
             "most_recent": most_recent if most_recent else None,
         }
+        event_query: dict = {"filter": {"type": event_types}}
+        message_query: dict = {
+            "filter": message_filter_query,
+            "relations": {"events": event_query},
+            "apply_annotations_from_actors": ["*"],
+        }
+        if projection is not None:
+            message_query = projection.message_query(message_query)
+            message_query["relations"] = {"events": projection.event_query(event_query)}
         return {
             "id": message_id,
             "relations": {
                 "thread": {
                     "relations": {
-                        "messages": {
-                            "filter": message_filter_query,
-                            "relations": {"events": {"filter": {"type": event_types}}},
-                            "apply_annotations_from_actors": ["*"],
-                        },
+                        "messages": message_query,
                     }
                 }
             },
@@ -648,32 +1887,23 @@ class InteractionsService:
 
     @staticmethod
     def fetch_bearer_token(secret_id: str) -> str:
-        secrets_manager = boto3.client("secretsmanager", region_name="us-west-2")
-        return json.loads(
-            secrets_manager.get_secret_value(SecretId=secret_id)["SecretString"]
-        )["token"]
+        """Read a bearer token from Secrets Manager, bypassing any cached token"""
+        return json.loads(secrets_manager_source()(secret_id))["token"]
 
     @staticmethod
     def from_env() -> "InteractionsService":
-        """Load the configuration based on the environment."""
+        """
+        Load the configuration based on the environment. If INTERACTION_STORE_TOKEN
+        isn't set, the token is read from Secrets Manager on the first request.
+        """
         url = os.getenv(
             "INTERACTION_STORE_URL",
             "http://localhost:8090",
         )
-        token = os.getenv(
-            "INTERACTION_STORE_TOKEN",
-            InteractionsService.fetch_bearer_token(
-                "nora/prod/interaction-bearer-token"
-            ),
+        token = os.getenv("INTERACTION_STORE_TOKEN")
+        if token:
+            return InteractionsService(base_url=url, token=token)
+        return InteractionsService(
+            base_url=url,
+            token_provider=SecretsManagerTokenProvider.shared(DEFAULT_SECRET_ID),
         )
-
-        return InteractionsService(base_url=url, token=token)
-
-
-class BearerAuth(requests.auth.AuthBase):
-    def __init__(self, token):
-        self.token = token
-
-    def __call__(self, r):
-        r.headers["Authorization"] = f"Bearer {self.token}"
-        return r
@@ -0,0 +1,229 @@
+"""
+Client-side metrics for calls to the Interaction Store.
+"""
+
+import bisect
+import threading
+from abc import ABC
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds of latency histogram buckets, in seconds
+DEFAULT_LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class InteractionsMetrics(ABC):
+    """
+    Receives measurements from InteractionsService.
+    Endpoints are URL templates such as /interaction/v1/event/{id}.
+    Methods default to no-ops so backends only implement what they need.
+    """
+
+    def observe_request(
+        self,
+        method: str,
+        endpoint: str,
+        status: int,
+        seconds: float,
+        request_bytes: int,
+        response_bytes: int,
+    ) -> None:
+        """
+        One HTTP attempt. Retries are observed as separate attempts.
+        :param status: HTTP status code, or 0 if no response was received
+        """
+        pass
+
+    def observe_retries(self, method: str, endpoint: str, retries: int) -> None:
+        """Number of retries a call needed, after all of its attempts"""
+        pass
+
+    def observe_validation(self, model: str, seconds: float) -> None:
+        """Time spent parsing a decoded response into models"""
+        pass
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as used by Prometheus"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        # The last count is the +Inf bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self) -> List[int]:
+        total = 0
+        cumulative = []
+        for count in self.counts:
+            total += count
+            cumulative.append(total)
+        return cumulative
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th quantile, or None if empty"""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        for bound, count in zip(
+            self.buckets + (float("inf"),), self.cumulative_counts()
+        ):
+            if count >= rank:
+                return bound
+        return float("inf")
+
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class InMemoryMetrics(InteractionsMetrics):
+    """Keeps counters and histograms in memory. Export them with prometheus_text()."""
+
+    def __init__(self, latency_buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.latency_buckets = tuple(latency_buckets)
+        self._lock = threading.Lock()
+        self.request_seconds: Dict[Labels, Histogram] = {}
+        self.validation_seconds: Dict[Labels, Histogram] = {}
+        self.requests: Dict[Labels, int] = {}
+        self.request_bytes: Dict[Labels, int] = {}
+        self.response_bytes: Dict[Labels, int] = {}
+        self.retries: Dict[Labels, int] = {}
+
+    def observe_request(
+        self,
+        method: str,
+        endpoint: str,
+        status: int,
+        seconds: float,
+        request_bytes: int,
+        response_bytes: int,
+    ) -> None:
+        labels = (("method", method), ("endpoint", endpoint))
+        with self._lock:
+            self._histogram(self.request_seconds, labels).observe(seconds)
+            status_labels = labels + (("status", str(status)),)
+            self.requests[status_labels] = self.requests.get(status_labels, 0) + 1
+            self.request_bytes[labels] = (
+                self.request_bytes.get(labels, 0) + request_bytes
+            )
+            self.response_bytes[labels] = (
+                self.response_bytes.get(labels, 0) + response_bytes
+            )
+
+    def observe_retries(self, method: str, endpoint: str, retries: int) -> None:
+        labels = (("method", method), ("endpoint", endpoint))
+        with self._lock:
+            self.retries[labels] = self.retries.get(labels, 0) + retries
+
+    def observe_validation(self, model: str, seconds: float) -> None:
+        with self._lock:
+            self._histogram(self.validation_seconds, (("model", model),)).observe(
+                seconds
+            )
+
+    def _histogram(self, histograms: Dict[Labels, Histogram], labels: Labels):
+        histogram = histograms.get(labels)
+        if histogram is None:
+            histogram = Histogram(self.latency_buckets)
+            histograms[labels] = histogram
+        return histogram
+
+    def prometheus_text(self, prefix: str = "nora_interactions") -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+        with self._lock:
+            _histogram_lines(
+                lines,
+                f"{prefix}_request_seconds",
+                "Latency of HTTP attempts to the Interaction Store",
+                self.request_seconds,
+            )
+            _counter_lines(
+                lines,
+                f"{prefix}_requests_total",
+                "HTTP attempts to the Interaction Store by status code",
+                self.requests,
+            )
+            _counter_lines(
+                lines,
+                f"{prefix}_request_bytes_total",
+                "Bytes sent in request bodies",
+                self.request_bytes,
+            )
+            _counter_lines(
+                lines,
+                f"{prefix}_response_bytes_total",
+                "Bytes received in response bodies",
+                self.response_bytes,
+            )
+            _counter_lines(
+                lines,
+                f"{prefix}_retries_total",
+                "Retried attempts",
+                self.retries,
+            )
+            _histogram_lines(
+                lines,
+                f"{prefix}_validation_seconds",
+                "Time spent validating responses into models",
+                self.validation_seconds,
+            )
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _counter_lines(
+    lines: List[str], name: str, help_text: str, counters: Dict[Labels, int]
+) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for labels, value in sorted(counters.items()):
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+
+def _histogram_lines(
+    lines: List[str], name: str, help_text: str, histograms: Dict[Labels, Histogram]
+) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, histogram in sorted(histograms.items()):
+        bounds = histogram.buckets + (float("inf"),)
+        for bound, count in zip(bounds, histogram.cumulative_counts()):
+            bucket_labels = labels + (("le", _format_value(bound)),)
+            lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum!r}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
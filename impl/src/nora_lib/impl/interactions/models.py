@@ -35,7 +35,7 @@ class ThreadStatus(str, Enum):
 class Annotation(BaseModel):
     # Need this config to stringify numeric values in attributes.
     # Otherwise, we'll get 'Input should be a valid string' error.
-    model_config = ConfigDict(coerce_numbers_to_str=True)
+    model_config = ConfigDict(coerce_numbers_to_str=True, defer_build=True)
 
     tag: str
     span: Tuple[int, int]
@@ -43,6 +43,8 @@ class Annotation(BaseModel):
 
 
 class AnnotationBatch(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     actor_id: UUID
     message_id: str
     annotations: List[Annotation]
@@ -53,6 +55,8 @@ class AnnotationBatch(BaseModel):
 
 
 class Message(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     message_id: str
     actor_id: UUID
     text: str
@@ -80,6 +84,8 @@ class Message(BaseModel):
             raise ValueError("Channel ID is required")
         if message.surface is None:
             raise ValueError("Surface is required")
+        if message.text is None:
+            raise ValueError("Text is required")
         return Message(
             message_id=message.message_id,
             actor_id=message.actor_id,
@@ -98,6 +104,8 @@ class Event(BaseModel):
     this is also what is returned from the interactions service when we request an event
     """
 
+    model_config = ConfigDict(defer_build=True)
+
     event_id: Optional[str] = None
     type: str
     actor_id: UUID = Field(
@@ -231,16 +239,22 @@ class EventType(Enum):
 class ThreadForkEventData(BaseModel):
     """Event data for a thread fork event"""
 
+    model_config = ConfigDict(defer_build=True)
+
     previous_message_id: str
 
 
 class Channel(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     channel_id: str
     surface: Surface
     owning_actor_id: str
 
 
 class Thread(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     thread_id: str
     channel_id: str
     surface: Surface
@@ -256,8 +270,11 @@ class ReturnedEvent(Event):
 class ReturnedMessage(BaseModel):
     """Message format returned by interaction service"""
 
+    model_config = ConfigDict(defer_build=True)
+
     actor_id: UUID
-    text: str
+    # None when left out of a search's projection
+    text: Optional[str] = None
     ts: datetime
     message_id: Optional[str] = None
     annotated_text: Optional[str] = None
@@ -282,6 +299,8 @@ class ReturnedMessage(BaseModel):
 class AgentMessageData(BaseModel):
     """capture requests to and responses from tools within Events"""
 
+    model_config = ConfigDict(defer_build=True)
+
     message_data: dict  # dict of agent/tool request/response format
     data_sender_actor_id: Optional[str] = None  # agent sending the data
     virtual_thread_id: Optional[str] = None  # tool-provided thread
@@ -292,6 +311,8 @@ class AgentMessageData(BaseModel):
 class ReturnedAgentContextEvent(BaseModel):
     """Event format returned by interaction service for agent context events"""
 
+    model_config = ConfigDict(defer_build=True)
+
     actor_id: UUID  # agent that saved this context
     timestamp: datetime
     data: AgentMessageData
@@ -301,9 +322,12 @@ class ReturnedAgentContextEvent(BaseModel):
 class ReturnedAgentContextMessage(BaseModel):
     """Message format returned by interaction service for search by thread"""
 
+    model_config = ConfigDict(defer_build=True)
+
     message_id: str
     actor_id: UUID
-    text: str
+    # None when left out of a search's projection
+    text: Optional[str] = None
     ts: str
     annotated_text: Optional[str] = None
     events: List[ReturnedAgentContextEvent] = Field(default_factory=list)
@@ -312,6 +336,8 @@ class ReturnedAgentContextMessage(BaseModel):
 class ThreadRelationsResponse(BaseModel):
     """Thread format returned by interaction service for thread relations in a search response"""
 
+    model_config = ConfigDict(defer_build=True)
+
     thread_id: str
     events: List[Event] = Field(
         default_factory=list
@@ -321,6 +347,17 @@ class ThreadRelationsResponse(BaseModel):
     )  # includes events associated with each message
 
 
+class ReturnedThread(ThreadRelationsResponse):
+    """Thread format returned by interaction service for the threads of a channel search"""
+
+    channel_id: Optional[str] = None
+    surface: Optional[Surface] = None
+    status: Optional[ThreadStatus] = None
+    name: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
 class VirtualThread:
     """Virtuals threads are an event type used to sub-divide a thread into sb-conversations"""
 
@@ -356,7 +393,7 @@ class CostDetail(BaseModel):
 
     detail_type: str = "unknown"
 
-    model_config = ConfigDict(protected_namespaces=(), extra="allow")
+    model_config = ConfigDict(protected_namespaces=(), extra="allow", defer_build=True)
 
     def try_subclass_conversion(self):
         """For events with no detail_type, attempt to convert to an appropriate
@@ -452,6 +489,8 @@ CostDetailType = Union[
 class ServiceCost(BaseModel):
     """Cost of servicing a request by an agent"""
 
+    model_config = ConfigDict(defer_build=True)
+
     dollar_cost: float
     service_provider: Optional[str] = Field(
         default=None, description="For example, OpenAI/Anthropic/Modal/Cohere"
@@ -495,6 +534,8 @@ class ServiceCost(BaseModel):
 class StepCost(BaseModel):
     """Wrapping service cost with event metadata so that it can be converted to an Event object."""
 
+    model_config = ConfigDict(defer_build=True)
+
     actor_id: UUID
     message_id: Optional[str] = None
     thread_id: Optional[str] = None
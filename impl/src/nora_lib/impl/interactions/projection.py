@@ -0,0 +1,57 @@
+"""
+Sparse fieldsets for search requests, so the Interaction Store only returns the
+message and event fields a caller reads.
+"""
+
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+# Returned whatever the projection, since the response models need them and
+# messages and events can't be told apart without them
+REQUIRED_MESSAGE_FIELDS = ("message_id", "actor_id", "ts")
+REQUIRED_EVENT_FIELDS = ("event_id", "type", "actor_id", "timestamp", "message_id")
+
+
+@dataclass(frozen=True)
+class Projection:
+    # Message fields to return besides REQUIRED_MESSAGE_FIELDS, e.g. "text",
+    # "annotated_text" or "annotations". None returns every field.
+    message_fields: Optional[Tuple[str, ...]] = None
+    # Event fields to return besides REQUIRED_EVENT_FIELDS, e.g. "data".
+    # None returns every field.
+    event_fields: Optional[Tuple[str, ...]] = None
+
+    def message_query(self, query: dict) -> dict:
+        """
+        Restrict a message relation query to the projected fields. Annotations are
+        neither fetched nor applied unless they are projected.
+        """
+        if self.message_fields is None:
+            return query
+        query = dict(query)
+        query["fields"] = _fields(REQUIRED_MESSAGE_FIELDS, self.message_fields)
+        if "annotations" not in self.message_fields and "relations" in query:
+            query["relations"] = {
+                name: relation
+                for name, relation in query["relations"].items()
+                # Also drop the misspelled "annotations:" some requests send
+                if name.rstrip(":") != "annotations"
+            }
+        if "annotated_text" not in self.message_fields:
+            query.pop("apply_annotations_from_actors", None)
+        return query
+
+    def event_query(self, query: Optional[dict]) -> dict:
+        """Restrict an event relation query to the projected fields"""
+        query = dict(query or {})
+        if self.event_fields is not None:
+            query["fields"] = _fields(REQUIRED_EVENT_FIELDS, self.event_fields)
+        return query
+
+
+def _fields(required: Tuple[str, ...], projected: Tuple[str, ...]) -> list:
+    return list(required) + [f for f in projected if f not in required]
+
+
+# Ids, timestamps and event data, the fields agent context builders read
+IDS_AND_EVENT_DATA = Projection(message_fields=(), event_fields=("data",))
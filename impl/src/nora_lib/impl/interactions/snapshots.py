@@ -0,0 +1,388 @@
+"""
+On-disk snapshots of threads, shared by the processes on a host.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from pydantic import BaseModel, TypeAdapter
+
+from nora_lib.impl.interactions.models import AnnotationBatch, Event, Message
+
+_datetime_adapter = TypeAdapter(datetime)
+
+# Fetches a thread in the shape returned by fetch_all_by_thread, given the
+# min_timestamp to fetch from, or None for the whole thread
+ThreadFetch = Callable[[Optional[str]], dict]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    thread_id TEXT NOT NULL,
+    event_filter TEXT NOT NULL,
+    thread TEXT NOT NULL,
+    watermark TEXT,
+    version INTEGER NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, event_filter)
+);
+CREATE TABLE IF NOT EXISTS snapshot_messages (
+    thread_id TEXT NOT NULL,
+    event_filter TEXT NOT NULL,
+    message_id TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    message TEXT NOT NULL,
+    PRIMARY KEY (thread_id, event_filter, message_id)
+);
+CREATE INDEX IF NOT EXISTS snapshot_messages_by_id
+    ON snapshot_messages (message_id);
+"""
+
+
+@dataclass
+class SnapshotStats:
+    # Reads topped up with a delta from the Interaction Store
+    deltas: int = 0
+    # Reads that fetched the whole thread, because there was no snapshot or it
+    # was older than max_age_seconds
+    full_fetches: int = 0
+
+
+@dataclass
+class ThreadSnapshot:
+    # The thread in the shape returned by fetch_all_by_thread
+    response: dict
+    # Timestamp of the newest message held. Deltas are fetched from here.
+    watermark: Optional[datetime]
+    # Incremented each time the snapshot changes or its watermark is moved back
+    version: int
+    # Wall clock time of the last full fetch, in seconds since the epoch
+    synced_at: float
+
+
+class ThreadSnapshotStore:
+    """
+    Snapshots of threads' messages and events in a SQLite database, for
+    InteractionsService.fetch_all_by_thread
+
+    A read loads the snapshot and only asks the Interaction Store for messages at
+    or after its watermark (less `overlap`), then merges them in, so worker
+    processes on one host that read the same threads share what any of them has
+    fetched. The database is in WAL mode: readers don't block each other or the
+    writer, and merges are serialized by SQLite's write lock, so any number of
+    processes and threads may use the same file. Each thread and process opens its
+    own connection.
+
+    Snapshots are kept separately for each set of event types read. Writes made
+    through an InteractionsService using the store move the watermark back so the
+    next read refetches what they changed. Changes made elsewhere to messages
+    older than the overlap window, and deleted messages, are picked up by the
+    full fetch made once a snapshot is older than `max_age_seconds`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        overlap: timedelta = timedelta(seconds=5),
+        max_age_seconds: Optional[float] = 300,
+        busy_timeout_seconds: float = 30,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        :param path: SQLite database file, created if it doesn't exist
+        :param overlap: How far before the watermark each delta starts, to allow
+            for clock skew and late writes
+        :param max_age_seconds: Refetch whole threads this long after they were last
+            fetched in full. None never does.
+        :param busy_timeout_seconds: How long to wait for another process's write
+        :param clock: Wall clock, shared by every process using the file
+        """
+        self.path = path
+        self.overlap = overlap
+        self.max_age_seconds = max_age_seconds
+        self.busy_timeout_seconds = busy_timeout_seconds
+        self.clock = clock
+        self.stats = SnapshotStats()
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        # Connections aren't shared across a fork
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_seconds,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+    def close(self) -> None:
+        """Close the connections opened by this process"""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+    def get(
+        self, thread_id: str, event_types: Optional[List[str]] = None
+    ) -> Optional[ThreadSnapshot]:
+        """The snapshot of a thread as it is on disk, without fetching anything"""
+        return self._read(self._connection(), thread_id, _event_filter(event_types))
+
+    def fetch(
+        self,
+        thread_id: str,
+        fetch: ThreadFetch,
+        event_types: Optional[List[str]] = None,
+    ) -> dict:
+        """
+        The thread, in the shape returned by fetch_all_by_thread, from its snapshot
+        topped up with a delta
+        :param fetch: Fetches the thread from the Interaction Store
+        :param event_types: The event types `fetch` asks for
+        """
+        event_filter = _event_filter(event_types)
+        conn = self._connection()
+        snapshot = self._read(conn, thread_id, event_filter)
+        full = (
+            snapshot is None
+            or snapshot.watermark is None
+            or (
+                self.max_age_seconds is not None
+                and self.clock() - snapshot.synced_at > self.max_age_seconds
+            )
+        )
+        min_timestamp = None
+        if not full:
+            assert snapshot is not None and snapshot.watermark is not None
+            min_timestamp = (snapshot.watermark - self.overlap).isoformat()
+        with self._stats_lock:
+            if full:
+                self.stats.full_fetches += 1
+            else:
+                self.stats.deltas += 1
+
+        delta = fetch(min_timestamp).get("thread", {})
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._merge(
+                conn,
+                thread_id,
+                event_filter,
+                delta,
+                full,
+                read_version=snapshot.version if snapshot is not None else 0,
+            )
+            snapshot = self._read(conn, thread_id, event_filter)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        assert snapshot is not None
+        return snapshot.response
+
+    def on_saved(self, item: BaseModel) -> None:
+        """
+        Move back the watermarks of the snapshots an item saved to the Interaction
+        Store changes, so the next read fetches it
+        """
+        if isinstance(item, Message):
+            self._rewind(item.thread_id, _parse_ts(item.ts))
+        elif isinstance(item, (Event, AnnotationBatch)) and item.message_id:
+            for thread_id, ts in (
+                self._connection()
+                .execute(
+                    "SELECT DISTINCT thread_id, ts FROM snapshot_messages"
+                    " WHERE message_id = ?",
+                    (item.message_id,),
+                )
+                .fetchall()
+            ):
+                self._rewind(thread_id, _parse_ts(ts))
+
+    def on_thread_deleted(self, thread_id: str) -> None:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM snapshots WHERE thread_id = ?", (thread_id,))
+            conn.execute(
+                "DELETE FROM snapshot_messages WHERE thread_id = ?", (thread_id,)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _read(
+        self, conn: sqlite3.Connection, thread_id: str, event_filter: str
+    ) -> Optional[ThreadSnapshot]:
+        row = conn.execute(
+            "SELECT thread, watermark, version, synced_at FROM snapshots"
+            " WHERE thread_id = ? AND event_filter = ?",
+            (thread_id, event_filter),
+        ).fetchone()
+        if row is None:
+            return None
+        thread_json, watermark, version, synced_at = row
+        rows = conn.execute(
+            "SELECT message FROM snapshot_messages"
+            " WHERE thread_id = ? AND event_filter = ? ORDER BY ts, rowid",
+            (thread_id, event_filter),
+        ).fetchall()
+        thread = json.loads(thread_json)
+        thread["messages"] = [json.loads(message) for (message,) in rows]
+        return ThreadSnapshot(
+            response={"thread": thread},
+            watermark=_parse_ts(watermark) if watermark else None,
+            version=version,
+            synced_at=synced_at,
+        )
+
+    def _merge(
+        self,
+        conn: sqlite3.Connection,
+        thread_id: str,
+        event_filter: str,
+        delta: dict,
+        full: bool,
+        read_version: int,
+    ) -> None:
+        """
+        Merge a fetched thread into its snapshot, in the caller's transaction
+        :param read_version: Version of the snapshot when the delta was requested,
+            or 0 if there was none
+        """
+        row = conn.execute(
+            "SELECT thread, watermark, version, synced_at FROM snapshots"
+            " WHERE thread_id = ? AND event_filter = ?",
+            (thread_id, event_filter),
+        ).fetchone()
+        key = (thread_id, event_filter)
+        changed = row is None
+        thread = {k: v for k, v in delta.items() if k != "messages"}
+        if row is not None:
+            current = json.loads(row[0])
+            thread["events"] = _merge_events(
+                current.get("events") or [], delta.get("events") or []
+            )
+            changed = thread != current
+        watermark = _parse_ts(row[1]) if row is not None and row[1] else None
+        if full:
+            watermark = None
+            deleted = conn.execute(
+                "DELETE FROM snapshot_messages WHERE thread_id = ? AND event_filter = ?",
+                key,
+            )
+            changed = changed or deleted.rowcount > 0
+
+        for message in delta.get("messages") or []:
+            message_id = message.get("message_id")
+            if message_id is None:
+                continue
+            ts = _parse_ts(message["ts"])
+            watermark = ts if watermark is None else max(watermark, ts)
+            existing = conn.execute(
+                "SELECT message FROM snapshot_messages"
+                " WHERE thread_id = ? AND event_filter = ? AND message_id = ?",
+                (*key, message_id),
+            ).fetchone()
+            if existing is not None:
+                existing_message = json.loads(existing[0])
+                message = {
+                    **message,
+                    "events": _merge_events(
+                        existing_message.get("events") or [],
+                        message.get("events") or [],
+                    ),
+                }
+                if message == existing_message:
+                    continue
+            conn.execute(
+                "INSERT OR REPLACE INTO snapshot_messages"
+                " (thread_id, event_filter, message_id, ts, message)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (*key, message_id, _sortable_ts(ts), json.dumps(message)),
+            )
+            changed = True
+
+        if row is not None and row[1] and row[2] != read_version:
+            # The snapshot changed while the delta was being fetched, possibly by a
+            # write that moved the watermark back to before the delta. Don't move
+            # it forward past the write, or the next read wouldn't fetch it.
+            current_watermark = _parse_ts(row[1])
+            if watermark is None or current_watermark < watermark:
+                watermark = current_watermark
+        version = (row[2] if row is not None else 0) + (1 if changed else 0)
+        synced_at = self.clock() if full or row is None else row[3]
+        conn.execute(
+            "INSERT OR REPLACE INTO snapshots"
+            " (thread_id, event_filter, thread, watermark, version, synced_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                *key,
+                json.dumps(thread),
+                _sortable_ts(watermark) if watermark is not None else None,
+                version,
+                synced_at,
+            ),
+        )
+
+    def _rewind(self, thread_id: str, ts: datetime) -> None:
+        """Move the watermarks of a thread's snapshots back to at most ts"""
+        self._connection().execute(
+            "UPDATE snapshots SET watermark = ?, version = version + 1"
+            " WHERE thread_id = ? AND watermark > ?",
+            (_sortable_ts(ts), thread_id, _sortable_ts(ts)),
+        )
+
+
+def _event_filter(event_types: Optional[List[str]]) -> str:
+    return "*" if event_types is None else json.dumps(sorted(event_types))
+
+
+def _parse_ts(value: Any) -> datetime:
+    """Parse a timestamp, treating naive timestamps as UTC so all are comparable"""
+    ts = _datetime_adapter.validate_python(value)
+    return ts if ts.tzinfo is not None else ts.replace(tzinfo=timezone.utc)
+
+
+def _sortable_ts(ts: datetime) -> str:
+    """UTC timestamp with a fixed width, so timestamps sort as strings"""
+    return ts.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+
+def _merge_events(current: List[dict], incoming: List[dict]) -> List[dict]:
+    """Union of two event lists by event_id, keeping the most recently updated copy"""
+    merged: Dict[Any, dict] = {event.get("event_id"): event for event in current}
+    for event in incoming:
+        existing = merged.get(event.get("event_id"))
+        if existing is None or _is_newer(event, existing):
+            merged[event.get("event_id")] = event
+    return list(merged.values())
+
+
+def _is_newer(event: dict, existing: dict) -> bool:
+    event_modified = event.get("updated_at") or event.get("created_at")
+    existing_modified = existing.get("updated_at") or existing.get("created_at")
+    if event_modified is None or existing_modified is None:
+        # Can't tell, so trust the copy we just fetched
+        return True
+    return _parse_ts(event_modified) >= _parse_ts(existing_modified)
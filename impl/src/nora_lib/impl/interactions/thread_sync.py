@@ -0,0 +1,152 @@
+"""
+Incrementally synced local copy of a thread.
+"""
+
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from nora_lib.impl.interactions.interactions_service import InteractionsService
+from nora_lib.impl.interactions.models import (
+    Event,
+    ReturnedMessage,
+    ThreadRelationsResponse,
+)
+
+
+class ThreadSync:
+    """
+    Keeps a local copy of a thread's messages and events up to date
+
+    The first refresh() downloads the thread. Later refreshes only ask for messages
+    at or after the newest message already held (less `overlap`, to allow for clock
+    skew and late writes) and merge them in, so the cost of a refresh grows with new
+    activity rather than with the length of the thread.
+
+    Likewise, the thread's own events are only asked for if they were created or
+    updated since the newest one held, less `overlap`.
+    Events are merged by event_id, keeping whichever copy has the later
+    updated_at/created_at. New events on messages older than the overlap window are
+    not picked up by an incremental refresh; use refresh(full=True) for that.
+    If the service has a ThreadSnapshotStore, the first refresh is served from it,
+    so it only fetches what changed since another process last read the thread.
+
+    Usage:
+
+    sync = ThreadSync(interactions_service, thread_id, event_types=["step_progress"])
+    # Once per turn
+    sync.refresh()
+    for message in sync.messages:
+        ...
+    """
+
+    def __init__(
+        self,
+        interactions_service: InteractionsService,
+        thread_id: str,
+        event_types: Optional[List[str]] = None,
+        overlap: timedelta = timedelta(seconds=5),
+    ):
+        """
+        :param event_types: Only sync events of these types. Syncs all events if None.
+        :param overlap: How far before the newest known message each refresh starts
+        """
+        self.interactions_service = interactions_service
+        self.thread_id = thread_id
+        self.event_types = event_types
+        self.overlap = overlap
+        # Newest message timestamp seen so far
+        self.watermark: Optional[datetime] = None
+        # Newest updated_at/created_at of the thread's own events seen so far
+        self.event_watermark: Optional[datetime] = None
+        self._messages: Dict[str, ReturnedMessage] = {}
+        self._events: Dict[str, Event] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def messages(self) -> List[ReturnedMessage]:
+        """Messages in the thread, oldest first"""
+        with self._lock:
+            return sorted(self._messages.values(), key=lambda m: m.ts)
+
+    @property
+    def events(self) -> List[Event]:
+        """Events attached to the thread itself"""
+        with self._lock:
+            return list(self._events.values())
+
+    def as_thread(self) -> ThreadRelationsResponse:
+        return ThreadRelationsResponse(
+            thread_id=self.thread_id, messages=self.messages, events=self.events
+        )
+
+    def refresh(self, full: bool = False) -> List[ReturnedMessage]:
+        """
+        Fetch what changed since the last refresh and merge it into the local copy.
+        Returns the messages that were added or changed.
+        :param full: Refetch the whole thread instead of only the delta
+        """
+        min_timestamp = None
+        min_event_timestamp = None
+        with self._lock:
+            if self.watermark is not None and not full:
+                min_timestamp = (self.watermark - self.overlap).isoformat()
+            if self.event_watermark is not None and not full:
+                min_event_timestamp = (self.event_watermark - self.overlap).isoformat()
+        # Fetched without holding the lock, so readers of the local copy don't
+        # wait on the network
+        response = self.interactions_service.fetch_all_by_thread(
+            self.thread_id,
+            min_timestamp=min_timestamp,
+            event_types=self.event_types,
+            min_event_timestamp=min_event_timestamp,
+        )
+        delta = ThreadRelationsResponse.model_validate(
+            {"thread_id": self.thread_id, **response.get("thread", {})}
+        )
+        with self._lock:
+            return self._merge(delta)
+
+    def _merge(self, delta: ThreadRelationsResponse) -> List[ReturnedMessage]:
+        changed = []
+        for message in delta.messages:
+            if message.message_id is None:
+                continue
+            existing = self._messages.get(message.message_id)
+            if existing is not None:
+                message.events = _merge_events(existing.events, message.events)
+                if message == existing:
+                    continue
+            self._messages[message.message_id] = message
+            changed.append(message)
+            if self.watermark is None or message.ts > self.watermark:
+                self.watermark = message.ts
+
+        for event in _merge_events(list(self._events.values()), delta.events):
+            if event.event_id:
+                self._events[event.event_id] = event
+            modified = event.updated_at or event.created_at
+            if modified is not None and (
+                self.event_watermark is None or modified > self.event_watermark
+            ):
+                self.event_watermark = modified
+        return changed
+
+
+def _merge_events(current: List[Event], incoming: List[Event]) -> List[Event]:
+    """Union of two event lists by event_id, keeping the most recently updated copy"""
+    merged = {event.event_id: event for event in current}
+    for event in incoming:
+        existing = merged.get(event.event_id)
+        if existing is None or _is_newer(event, existing):
+            merged[event.event_id] = event
+    return list(merged.values())
+
+
+def _is_newer(event: Event, existing: Event) -> bool:
+    event_modified = event.updated_at or event.created_at
+    existing_modified = existing.updated_at or existing.created_at
+    if event_modified is None or existing_modified is None:
+        # Can't tell, so trust the copy we just fetched
+        return True
+    return event_modified >= existing_modified
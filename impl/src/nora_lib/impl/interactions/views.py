@@ -0,0 +1,213 @@
+"""
+Lazy, read-only views over decoded Interaction Store search responses.
+
+Validating a whole search response into pydantic models is expensive when the
+caller only reads a few fields. These views wrap the decoded JSON and build
+typed values only when an attribute is accessed, caching them afterwards.
+
+    thread = ThreadView.from_response(interactions_service.fetch_all_by_thread(thread_id))
+    for message in thread.messages:
+        # Only the events of the messages that are touched are validated
+        latest = message.events[-1] if message.events else None
+"""
+
+from datetime import datetime
+from functools import cached_property
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    TypeVar,
+    Union,
+    overload,
+)
+from uuid import UUID
+
+from pydantic import TypeAdapter
+
+from nora_lib.impl.interactions.models import (
+    Annotation,
+    Event,
+    ReturnedMessage,
+    ReturnedThread,
+    Surface,
+)
+
+T = TypeVar("T")
+
+_datetime_adapter = TypeAdapter(datetime)
+
+
+class LazySequence(Sequence[T]):
+    """A list of raw JSON items, each converted on first access and then cached"""
+
+    def __init__(self, raw: List[Any], convert: Callable[[Any], T]):
+        self._raw = raw
+        self._convert = convert
+        self._items: List[Optional[T]] = [None] * len(raw)
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    @overload
+    def __getitem__(self, index: int) -> T: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[T]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[T, List[T]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        item = self._items[index]
+        if item is None:
+            item = self._convert(self._raw[index])
+            self._items[index] = item
+        return item
+
+    def __iter__(self) -> Iterator[T]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self) -> str:
+        return f"LazySequence(len={len(self)})"
+
+
+class _View:
+    """Base class for views. Unknown attributes fall back to the raw JSON."""
+
+    def __init__(self, raw: Dict[str, Any]):
+        self.raw = raw
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes that aren't defined on the view
+        try:
+            return self.__dict__["raw"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+class MessageView(_View):
+    """Lazy view over a message in a search response"""
+
+    @staticmethod
+    def from_response(response: Dict[str, Any]) -> "MessageView":
+        """View over the message of a /search/message response"""
+        return MessageView(response.get("message", {}))
+
+    @property
+    def message_id(self) -> Optional[str]:
+        return self.raw.get("message_id")
+
+    @property
+    def text(self) -> Optional[str]:
+        # None when left out of a search's projection, as in ReturnedMessage
+        return self.raw.get("text")
+
+    @property
+    def annotated_text(self) -> Optional[str]:
+        return self.raw.get("annotated_text")
+
+    @property
+    def thread_id(self) -> Optional[str]:
+        # thread_id may be nested in the response
+        return self.raw.get("thread_id") or self.raw.get("thread", {}).get("thread_id")
+
+    @property
+    def channel_id(self) -> Optional[str]:
+        return self.raw.get("channel_id") or self.raw.get("channel", {}).get(
+            "channel_id"
+        )
+
+    @cached_property
+    def actor_id(self) -> UUID:
+        return UUID(str(self.raw["actor_id"]))
+
+    @cached_property
+    def ts(self) -> datetime:
+        return _datetime_adapter.validate_python(self.raw["ts"])
+
+    @cached_property
+    def surface(self) -> Optional[Surface]:
+        surface = self.raw.get("surface")
+        return Surface(surface) if surface is not None else None
+
+    @cached_property
+    def events(self) -> LazySequence[Event]:
+        return LazySequence(self.raw.get("events") or [], Event.model_validate)
+
+    @cached_property
+    def annotations(self) -> LazySequence[Annotation]:
+        return LazySequence(
+            self.raw.get("annotations") or [], Annotation.model_validate
+        )
+
+    @cached_property
+    def preceding_messages(self) -> LazySequence["MessageView"]:
+        return LazySequence(self.raw.get("preceding_messages") or [], MessageView)
+
+    @cached_property
+    def thread(self) -> Optional["ThreadView"]:
+        thread = self.raw.get("thread")
+        return ThreadView(thread) if thread is not None else None
+
+    def to_model(self) -> ReturnedMessage:
+        """Validate the whole message"""
+        message = ReturnedMessage.model_validate(self.raw)
+        message.thread_id = self.thread_id
+        message.channel_id = self.channel_id
+        return message
+
+
+class ThreadView(_View):
+    """Lazy view over a thread in a search response"""
+
+    @staticmethod
+    def from_response(response: Dict[str, Any]) -> "ThreadView":
+        """View over the thread of a /search/thread response"""
+        return ThreadView(response.get("thread", {}))
+
+    @property
+    def thread_id(self) -> str:
+        return self.raw["thread_id"]
+
+    @property
+    def name(self) -> Optional[str]:
+        return self.raw.get("name")
+
+    @cached_property
+    def messages(self) -> LazySequence[MessageView]:
+        return LazySequence(self.raw.get("messages") or [], MessageView)
+
+    @cached_property
+    def events(self) -> LazySequence[Event]:
+        """Events attached to the thread itself"""
+        return LazySequence(self.raw.get("events") or [], Event.model_validate)
+
+    def to_model(self) -> ReturnedThread:
+        """Validate the whole thread"""
+        return ReturnedThread.model_validate(self.raw)
+
+
+class ChannelView(_View):
+    """Lazy view over a channel in a search response"""
+
+    @staticmethod
+    def from_response(response: Dict[str, Any]) -> "ChannelView":
+        """View over the channel of a /search/channel response"""
+        return ChannelView(response.get("channel", {}))
+
+    @property
+    def channel_id(self) -> str:
+        return self.raw["channel_id"]
+
+    @cached_property
+    def threads(self) -> LazySequence[ThreadView]:
+        return LazySequence(self.raw.get("threads") or [], ThreadView)
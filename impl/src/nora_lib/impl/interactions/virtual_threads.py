@@ -0,0 +1,182 @@
+"""
+Index of the virtual threads in a thread, built from their tagging events.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set, Tuple
+
+from pydantic import TypeAdapter
+
+from nora_lib.impl.interactions.models import Event, VirtualThread
+from nora_lib.impl.interactions.projection import IDS_AND_EVENT_DATA
+
+if TYPE_CHECKING:
+    from nora_lib.impl.interactions.interactions_service import InteractionsService
+
+_datetime_adapter = TypeAdapter(datetime)
+
+
+class VirtualThreadIndex:
+    """
+    Maps each virtual thread in a thread to the messages tagged with it, and to the
+    types of the events on each message that belong to it.
+
+    The first refresh() pages through the thread's whole history, asking only for
+    message ids and timestamps and tagging events. Later refreshes only page through
+    messages at or after the newest message already indexed (less `overlap`), so a
+    refresh costs as much as the new activity. Tags saved through the
+    InteractionsService that owns the index are added as they are saved. Tags added
+    by other clients to messages older than the overlap window are picked up by the
+    scan of the whole history made once the last one is older than
+    `max_age_seconds`, or by refresh(full=True).
+    """
+
+    def __init__(
+        self,
+        interactions_service: "InteractionsService",
+        thread_id: str,
+        page_size: int = 100,
+        overlap: timedelta = timedelta(seconds=5),
+        max_age_seconds: Optional[float] = 60,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param page_size: Number of messages fetched per request while refreshing
+        :param overlap: How far before the newest indexed message each refresh starts
+        :param max_age_seconds: Scan the whole history again on the first refresh
+            this long after the last scan. None never does.
+        """
+        self.interactions_service = interactions_service
+        self.thread_id = thread_id
+        self.page_size = page_size
+        self.overlap = overlap
+        self.max_age_seconds = max_age_seconds
+        self.clock = clock
+        # Newest message timestamp seen so far
+        self.watermark: Optional[datetime] = None
+        # When the last scan of the whole history started, by `clock`
+        self.scanned_at: Optional[float] = None
+        # virtual_thread_id -> message_id -> tagged event types
+        self._tags: Dict[str, Dict[str, Set[str]]] = {}
+        # Timestamps of every message seen, tagged or not
+        self._message_ts: Dict[str, datetime] = {}
+        self._lock = threading.Lock()
+
+    def virtual_thread_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._tags)
+
+    def has_message(self, message_id: str) -> bool:
+        with self._lock:
+            return message_id in self._message_ts
+
+    def message_ts(self, message_id: str) -> Optional[datetime]:
+        with self._lock:
+            return self._message_ts.get(message_id)
+
+    def messages(
+        self, virtual_thread_id: str, until: Optional[datetime] = None
+    ) -> List[Tuple[str, Set[str]]]:
+        """
+        Messages tagged with a virtual thread and the event types tagged on each, oldest
+        first. The types include VirtualThread.EVENT_TYPE if the message itself is tagged.
+        :param until: Only messages at or before this time
+        """
+        with self._lock:
+            tagged = [
+                (message_id, set(types))
+                for message_id, types in self._tags.get(virtual_thread_id, {}).items()
+                if until is None or self._message_ts[message_id] <= until
+            ]
+            tagged.sort(key=lambda entry: self._message_ts[entry[0]])
+        return tagged
+
+    def add_tag(self, tag: Event, message_ts: Optional[datetime] = None) -> None:
+        """
+        Index a tagging event
+        :param message_ts: Timestamp of the tagged message, if it isn't indexed yet
+        """
+        if tag.type != VirtualThread.EVENT_TYPE or not tag.message_id:
+            return
+        virtual_thread_id = tag.data.get(VirtualThread.ID_FIELD)
+        event_type = tag.data.get(VirtualThread.EVENT_TYPE_FIELD)
+        if not virtual_thread_id or not event_type:
+            return
+        with self._lock:
+            if message_ts is not None:
+                self._message_ts.setdefault(tag.message_id, message_ts)
+            if tag.message_id not in self._message_ts:
+                # Placed once a refresh sees the message
+                return
+            self._tags.setdefault(virtual_thread_id, {}).setdefault(
+                tag.message_id, set()
+            ).add(event_type)
+
+    def refresh(self, full: bool = False) -> None:
+        """
+        Index the tags saved since the last refresh
+        :param full: Reindex the whole thread
+        """
+        with self._lock:
+            if full:
+                self._tags.clear()
+                self._message_ts.clear()
+                self.watermark = None
+            started = self.clock()
+            # Tags are only ever added, so an expired index is scanned again
+            # without being cleared, and stays readable in the meantime
+            scan = (
+                self.watermark is None
+                or self.scanned_at is None
+                or (
+                    self.max_age_seconds is not None
+                    and started - self.scanned_at > self.max_age_seconds
+                )
+            )
+            cursor = None
+            if not scan and self.watermark is not None:
+                cursor = (self.watermark - self.overlap).isoformat()
+
+        # Pages are keyed on (ts, message_id). min_timestamp is inclusive, so each
+        # page starts with the messages at the cursor that were already indexed;
+        # asking for that many more messages keeps every page bringing new ones,
+        # even when more than a page of messages share a timestamp.
+        seen_at_cursor: Set[str] = set()
+        while True:
+            limit = self.page_size + len(seen_at_cursor)
+            response = self.interactions_service.fetch_all_by_thread(
+                self.thread_id,
+                min_timestamp=cursor,
+                event_types=[VirtualThread.EVENT_TYPE],
+                oldest=limit,
+                projection=IDS_AND_EVENT_DATA,
+            )
+            page = response.get("thread", {}).get("messages") or []
+            new_ids = self._index_page(page)
+            if len(page) < limit or not new_ids - seen_at_cursor:
+                break
+            last_ts = page[-1]["ts"]
+            seen_at_cursor = {m["message_id"] for m in page if m["ts"] == last_ts}
+            cursor = last_ts
+        if scan:
+            with self._lock:
+                self.scanned_at = started
+
+    def _index_page(self, page: List[dict]) -> Set[str]:
+        """Index a page of messages with their tag events, returning the message ids"""
+        message_ids = set()
+        for raw in page:
+            message_id = raw.get("message_id")
+            if not message_id:
+                continue
+            message_ids.add(message_id)
+            message_ts = _datetime_adapter.validate_python(raw["ts"])
+            with self._lock:
+                self._message_ts[message_id] = message_ts
+                if self.watermark is None or message_ts > self.watermark:
+                    self.watermark = message_ts
+            for event in raw.get("events") or []:
+                self.add_tag(Event.model_validate(event))
+        return message_ids
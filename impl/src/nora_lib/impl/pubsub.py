@@ -1,5 +1,10 @@
+import atexit
 import logging
-from typing import Dict, Any, Iterator, Optional
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
 from contextlib import contextmanager
 
 import os
@@ -9,18 +14,117 @@ import signal
 from time import sleep
 
 from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
+
+
+@dataclass
+class PublisherConfig:
+    # Messages published to a topic within this many seconds of the first one
+    # waiting are sent together
+    linger_seconds: float = 0.05
+    # Maximum number of messages sent in one request
+    max_batch_size: int = 100
+    # Once this many messages are waiting, publish() drops new ones
+    max_queue_size: int = 10000
+
+
+@dataclass
+class PublishStats:
+    # Messages passed to publish()
+    published: int = 0
+    # Messages the pubsub backend accepted
+    delivered: int = 0
+    # Messages that couldn't be sent or were rejected
+    failed: int = 0
+    # Messages dropped because the publisher's queue was full
+    dropped: int = 0
+    # HTTP requests sent to publish, and how many of them were batches
+    requests: int = 0
+    batches: int = 0
 
 
 class PubsubService:
-    """Client for Nora pubsub backend"""
+    """
+    Client for Nora pubsub backend
+
+    All calls share one connection pool. By default publish() sends each message
+    before returning. With a PublisherConfig, publish() only queues the message,
+    and a background thread sends each topic's messages in batches; call flush()
+    or close() before shutting down so that queued messages are sent.
+    Publishing never raises: failures are logged and counted in publish_stats().
+    """
 
-    def __init__(self, base_url: str, namespace: Optional[str] = None):
+    def __init__(
+        self,
+        base_url: str,
+        namespace: Optional[str] = None,
+        timeout: float = 10,
+        publisher: Optional[PublisherConfig] = None,
+        batch_publish: Optional[bool] = None,
+        pool_maxsize: int = 10,
+    ):
         """
         :param base_url: pubsub API URL
         :param namespace: Topic namespace
+        :param timeout: Timeout for publish and webhook requests, in seconds
+        :param publisher: If set, messages are published in batches from a
+            background thread
+        :param batch_publish: Whether batches are sent in a single request. If None,
+            this is tried and turned off the first time the backend rejects a batch
+            endpoint as unsupported; the messages are then sent one at a time.
+        :param pool_maxsize: Maximum number of idle connections kept to the backend
         """
         self.base_url = base_url
         self.namespace = namespace
+        self.timeout = timeout
+        self.batch_publish = batch_publish
+        self._stats = PublishStats()
+        self._stats_lock = threading.Lock()
+        self._adapter = HTTPAdapter(pool_maxsize=pool_maxsize)
+        self._local = threading.local()
+        self._publisher = (
+            _BatchingPublisher(publisher, self._send_batch)
+            if publisher is not None
+            else None
+        )
+
+    def __enter__(self) -> "PubsubService":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Send queued messages, then close pooled connections"""
+        if self._publisher is not None:
+            self._publisher.close(timeout)
+        self._adapter.close()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every message queued so far has been sent.
+        Returns False if they weren't within the timeout.
+        """
+        if self._publisher is None:
+            return True
+        return self._publisher.flush(timeout)
+
+    def publish_stats(self) -> PublishStats:
+        with self._stats_lock:
+            return PublishStats(**vars(self._stats))
+
+    def _session(self) -> requests.Session:
+        """Session for the calling thread, backed by the shared connection pool"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", self._adapter)
+            session.mount("https://", self._adapter)
+            self._local.session = session
+        return session
+
+    def _post(self, url: str, body: Dict[str, Any]) -> requests.Response:
+        return self._session().post(url, json=body, timeout=self.timeout)
 
     def subscribe_webhook(self, topic: str, url: str):
         """
@@ -28,9 +132,9 @@ class PubsubService:
         The webhook will receive a POST request whenever any client calls publish() on the topic
         """
         body = {"url": url}
-        requests.post(
+        self._post(
             f"{self.base_url}/subscribe/webhook/{self._fully_qualified_topic(topic)}",
-            json=body,
+            body,
         )
 
     def unsubscribe_webhook(self, topic: str, url: str):
@@ -38,18 +142,28 @@ class PubsubService:
         Remove a webhook subscriber from a topic
         """
         body = {"url": url}
-        requests.post(
+        self._post(
             f"{self.base_url}/unsubscribe/webhook/{self._fully_qualified_topic(topic)}",
-            json=body,
+            body,
         )
 
     @contextmanager
-    def subscribe_sse(self, topic: str) -> Iterator[str]:
+    def subscribe_sse(
+        self, topic: str, last_event_id: Optional[str] = None
+    ) -> Iterator["SSEStream"]:
         """
         Subscribe to a topic using Server-Sent Events
         Returns an iterator that yields message payloads as they are published
         Will close the underlying HTTP connection when the context manager exits
 
+        Dropped connections are reopened with the id of the last event received as
+        Last-Event-ID, so a server that keeps recent events replays those published
+        while disconnected. Reconnects wait the retry interval the server last sent,
+        if it sent one.
+
+        :param last_event_id: Resume after this event, e.g. the last_event_id of an
+            earlier subscription's iterator
+
         Usage:
 
         # This will run indefinitely
@@ -66,55 +180,29 @@ class PubsubService:
 
             sleep(60)
         """
-        open_connections = []
-        running = True
-
-        def msgs():
-            delay = 1
-            while running:
-                try:
-                    response = requests.get(
-                        f"{self.base_url}/subscribe/sse/{self._fully_qualified_topic(topic)}",
-                        stream=True,
-                    )
-                    open_connections.append(response)
-                    delay = 1
-                    for line in response.iter_lines():
-                        if line and line.startswith(b"data:"):
-                            payload = line[5:].decode("utf-8").strip()
-                            if payload:
-                                yield json.loads(payload)
-                except requests.exceptions.ConnectionError:
-                    logging.warning(
-                        "Unable to establish server connection at %s. Sleeping for %ss",
-                        self.base_url,
-                        delay,
-                    )
-                    try:
-                        open_connections.pop().close()
-                    except Exception:
-                        pass
-                    # Possible misconfiguration. Back off exponentially
-                    sleep(delay)
-                    delay = min(delay * 2, 60)
-                except requests.exceptions.RequestException:
-                    logging.warning("Server at %s closed SSE connection", self.base_url)
-                    try:
-                        open_connections.pop().close()
-                    except Exception:
-                        pass
-                    # Service may have redeployed. Try to reestablish connection quickly
-                    sleep(1)
-
+        stream = SSEStream(
+            self,
+            f"{self.base_url}/subscribe/sse/{self._fully_qualified_topic(topic)}",
+            last_event_id,
+        )
         try:
-            yield msgs()
+            yield stream
         finally:
-            running = False
-            for conn in open_connections:
-                try:
-                    conn.close()
-                except Exception:
-                    pass
+            stream.close()
+
+    def _open_sse(
+        self, url: str, last_event_id: Optional[str] = None
+    ) -> requests.Response:
+        headers = {"Accept": "text/event-stream"}
+        if last_event_id:
+            headers["Last-Event-ID"] = last_event_id
+        response = self._session().get(url, headers=headers, stream=True)
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError:
+            response.close()
+            raise
+        return response
 
     def publish(self, topic: str, payload: Dict[str, Any]):
         """
@@ -122,7 +210,70 @@ class PubsubService:
         """
         ns_topic = self._fully_qualified_topic(topic)
         event = PublishedEvent(topic=ns_topic, payload=payload)
-        requests.post(f"{self.base_url}/publish/{ns_topic}", json=event.model_dump())
+        self._count(published=1)
+        publisher = self._publisher
+        if publisher is None or publisher.closed:
+            # Messages published after close() are sent right away
+            self._send_batch(ns_topic, [event])
+        elif not publisher.put(ns_topic, event):
+            self._count(dropped=1)
+            logging.warning(
+                f"Pubsub publish queue is full or closed, dropped a message to {ns_topic}"
+            )
+
+    def _send_batch(self, ns_topic: str, events: List["PublishedEvent"]) -> None:
+        """Send messages to a topic, in one request if the backend supports it"""
+        if len(events) > 1 and self.batch_publish is not False:
+            response = self._send(
+                f"{self.base_url}/publish/batch/{ns_topic}",
+                {"events": [event.model_dump() for event in events]},
+                len(events),
+            )
+            if response is None:
+                return
+            if self.batch_publish is None and response.status_code in (404, 405, 501):
+                logging.info(f"Pubsub at {self.base_url} does not support batches")
+                self.batch_publish = False
+            else:
+                self._record(ns_topic, response, len(events), batch=True)
+                return
+        for event in events:
+            response = self._send(
+                f"{self.base_url}/publish/{ns_topic}", event.model_dump(), 1
+            )
+            if response is not None:
+                self._record(ns_topic, response, 1)
+
+    def _send(
+        self, url: str, body: Dict[str, Any], messages: int
+    ) -> Optional[requests.Response]:
+        """POST a publish request, or count its messages as failed if it can't be sent"""
+        try:
+            return self._post(url, body)
+        except requests.exceptions.RequestException as e:
+            self._count(requests=1, failed=messages)
+            logging.warning(f"Failed to publish to pubsub at {self.base_url}: {e}")
+            return None
+
+    def _record(
+        self,
+        ns_topic: str,
+        response: requests.Response,
+        messages: int,
+        batch: bool = False,
+    ) -> None:
+        if response.ok:
+            self._count(requests=1, batches=int(batch), delivered=messages)
+        else:
+            self._count(requests=1, batches=int(batch), failed=messages)
+            logging.warning(
+                f"Pubsub rejected {messages} message(s) to {ns_topic}, status code {response.status_code}"
+            )
+
+    def _count(self, **counts: int) -> None:
+        with self._stats_lock:
+            for name, count in counts.items():
+                setattr(self._stats, name, getattr(self._stats, name) + count)
 
     def _fully_qualified_topic(self, topic: str) -> str:
         return f"{self.namespace}:{topic}" if self.namespace else topic
@@ -138,3 +289,345 @@ class PubsubService:
 class PublishedEvent(BaseModel):
     topic: str
     payload: Dict[str, Any]
+
+
+@dataclass
+class SSEEvent:
+    """One event of a Server-Sent Events stream"""
+
+    data: str
+    # The event type, "message" unless the server named one
+    event: str = "message"
+    # The last event id the server sent, as of this event
+    id: Optional[str] = None
+
+
+class SSEParser:
+    """
+    Parses a Server-Sent Events stream line by line, following the event stream
+    format of the HTML standard: multi-line data, event types, ids, retry
+    intervals and comments.
+    """
+
+    def __init__(self, last_event_id: Optional[str] = None):
+        # Id of the last event dispatched
+        self.last_event_id = last_event_id
+        # Reconnection delay the server asked for, in seconds
+        self.retry_seconds: Optional[float] = None
+        self._data: List[str] = []
+        self._event = ""
+        # Id sent for the event being parsed, only committed once it is complete
+        self._id = last_event_id
+
+    def feed(self, line: str) -> Optional[SSEEvent]:
+        """Parse a line without its line ending, returning the event it completes"""
+        if not line:
+            return self._dispatch()
+        if line.startswith(":"):
+            return None
+        name, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if name == "data":
+            self._data.append(value)
+        elif name == "event":
+            self._event = value
+        elif name == "id":
+            if "\0" not in value:
+                self._id = value
+        elif name == "retry":
+            if value.isdigit():
+                self.retry_seconds = int(value) / 1000
+        return None
+
+    def _dispatch(self) -> Optional[SSEEvent]:
+        self.last_event_id = self._id
+        data, event = self._data, self._event
+        self._data, self._event = [], ""
+        if not data:
+            return None
+        return SSEEvent(
+            data="\n".join(data), event=event or "message", id=self.last_event_id
+        )
+
+
+def parse_sse(lines: Iterator[bytes], parser: SSEParser) -> Iterator[SSEEvent]:
+    """Events in a stream's lines, split at line feeds, e.g. by Response.iter_lines"""
+    for line in lines:
+        event = parser.feed(line.decode("utf-8").rstrip("\r"))
+        if event is not None:
+            yield event
+
+
+class SSEStream:
+    """
+    Payloads of a topic's SSE messages, decoded from JSON, reconnecting whenever
+    the connection drops. last_event_id is the id of the last event received.
+    Raises requests.HTTPError if the server refuses the subscription with a client
+    error, such as 404 for an unknown endpoint.
+    """
+
+    def __init__(
+        self, pubsub: PubsubService, url: str, last_event_id: Optional[str] = None
+    ):
+        self.pubsub = pubsub
+        self.url = url
+        self.parser = SSEParser(last_event_id)
+        self._running = True
+        self._restart = False
+        self._response: Optional[requests.Response] = None
+        self._payloads: Optional[Iterator[Any]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def last_event_id(self) -> Optional[str]:
+        return self.parser.last_event_id
+
+    def restart(self) -> None:
+        """
+        Reconnect now, without waiting, e.g. after changing the url. Events after
+        last_event_id are replayed by the new connection.
+        """
+        with self._lock:
+            self._restart = True
+            response = self._response
+        if response is not None:
+            try:
+                response.close()
+            except Exception:
+                pass
+
+    def _restarting(self) -> bool:
+        with self._lock:
+            restart, self._restart = self._restart, False
+        return restart
+
+    def close(self) -> None:
+        self._running = False
+        with self._lock:
+            response = self._response
+        if response is not None:
+            try:
+                response.close()
+            except Exception:
+                pass
+
+    def __iter__(self) -> "SSEStream":
+        return self
+
+    def __next__(self) -> Any:
+        if self._payloads is None:
+            self._payloads = (
+                json.loads(event.data) for event in self.events() if event.data.strip()
+            )
+        return next(self._payloads)
+
+    def events(self) -> Iterator[SSEEvent]:
+        """Every event received, including their types and ids"""
+        delay = 1
+        while self._running:
+            try:
+                response = self.pubsub._open_sse(self.url, self.last_event_id)
+                with self._lock:
+                    self._response = response
+                    if self._restart:
+                        # Restarted while connecting
+                        response.close()
+                delay = 1
+                # Events are terminated by a blank line, so one cut short by a
+                # dropped connection is discarded and replayed after reconnecting
+                # The reconnection delay is kept across connections
+                retry_seconds = self.retry_seconds
+                self.parser = SSEParser(self.last_event_id)
+                self.parser.retry_seconds = retry_seconds
+                for event in parse_sse(
+                    response.iter_lines(delimiter=b"\n"), self.parser
+                ):
+                    yield event
+                if not self._restarting():
+                    self._reconnect_after(0)
+            except Exception as e:
+                if self._restarting() or not self._running:
+                    continue
+                if not isinstance(e, requests.exceptions.RequestException):
+                    raise
+                if _is_refused(e):
+                    # e.g. an unknown topic or endpoint, which retrying won't fix
+                    raise
+                self._handle_error(e, delay)
+                if isinstance(e, requests.exceptions.ConnectionError):
+                    delay = min(delay * 2, 60)
+            finally:
+                self._close_response()
+
+    def _handle_error(
+        self, error: requests.exceptions.RequestException, delay: float
+    ) -> None:
+        if isinstance(error, requests.exceptions.ConnectionError):
+            logging.warning(
+                "Unable to establish server connection at %s. Sleeping for %ss",
+                self.pubsub.base_url,
+                delay,
+            )
+            # Possible misconfiguration. Back off exponentially
+            self._reconnect_after(delay, backoff=True)
+        else:
+            logging.warning("Server at %s closed SSE connection", self.pubsub.base_url)
+            # Service may have redeployed. Try to reestablish connection quickly
+            self._reconnect_after(1)
+
+    @property
+    def retry_seconds(self) -> Optional[float]:
+        """Reconnection delay the server last asked for"""
+        return self.parser.retry_seconds
+
+    def _reconnect_after(self, default_seconds: float, backoff: bool = False) -> None:
+        """
+        Wait the reconnection delay the server asked for, or default_seconds if it
+        didn't ask for one
+        :param backoff: Wait at least default_seconds, while backing off from
+            failed connection attempts
+        """
+        if not self._running:
+            return
+        retry = self.retry_seconds
+        if retry is None:
+            sleep(default_seconds)
+        elif backoff:
+            sleep(max(default_seconds, retry))
+        else:
+            sleep(retry)
+
+    def _close_response(self) -> None:
+        with self._lock:
+            response, self._response = self._response, None
+        if response is not None:
+            try:
+                response.close()
+            except Exception:
+                pass
+
+
+def _is_refused(error: requests.exceptions.RequestException) -> bool:
+    """Whether a request failed with a client error that won't go away on a retry"""
+    response = error.response
+    return (
+        isinstance(error, requests.exceptions.HTTPError)
+        and response is not None
+        and 400 <= response.status_code < 500
+        and response.status_code not in (408, 429)
+    )
+
+
+class _BatchingPublisher:
+    """
+    Queues messages by topic and sends them from a background thread. A topic's
+    messages are sent once the oldest has waited `linger_seconds`, or sooner when
+    there are max_batch_size of them, in the order they were published.
+    """
+
+    def __init__(
+        self,
+        config: PublisherConfig,
+        send_batch: Callable[[str, List[PublishedEvent]], None],
+    ):
+        self.config = config
+        self.send_batch = send_batch
+        self._pending: Dict[str, List[PublishedEvent]] = {}
+        # When each topic's oldest waiting message is due to be sent
+        self._due: Dict[str, float] = {}
+        # Messages queued or being sent
+        self._outstanding = 0
+        self._flushing = 0
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._cond = threading.Condition()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def put(self, topic: str, event: PublishedEvent) -> bool:
+        """Queue a message, returning False if the queue is full or closed"""
+        with self._cond:
+            if self._closed or self._outstanding >= self.config.max_queue_size:
+                return False
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="pubsub-publisher", daemon=True
+                )
+                self._thread.start()
+                atexit.register(_flush_at_exit, weakref.ref(self))
+            pending = self._pending.setdefault(topic, [])
+            if not pending:
+                self._due[topic] = time.monotonic() + self.config.linger_seconds
+            pending.append(event)
+            self._outstanding += 1
+            if len(pending) == 1 or len(pending) >= self.config.max_batch_size:
+                self._cond.notify_all()
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        with self._cond:
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                return self._cond.wait_for(lambda: self._outstanding == 0, timeout)
+            finally:
+                self._flushing -= 1
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _next_batch(self) -> Optional[Tuple[str, List[PublishedEvent]]]:
+        """Wait for a topic's messages to be due, and take up to a batch of them"""
+        with self._cond:
+            while True:
+                if self._closed and not self._pending:
+                    return None
+                now = time.monotonic()
+                due = [
+                    topic
+                    for topic, pending in self._pending.items()
+                    if self._flushing
+                    or self._closed
+                    or self._due[topic] <= now
+                    or len(pending) >= self.config.max_batch_size
+                ]
+                if due:
+                    topic = min(due, key=self._due.__getitem__)
+                    pending = self._pending[topic]
+                    batch = pending[: self.config.max_batch_size]
+                    del pending[: self.config.max_batch_size]
+                    if not pending:
+                        del self._pending[topic]
+                        del self._due[topic]
+                    return topic, batch
+                timeout = min(self._due.values()) - now if self._due else None
+                self._cond.wait(timeout)
+
+    def _run(self) -> None:
+        while True:
+            next_batch = self._next_batch()
+            if next_batch is None:
+                return
+            topic, batch = next_batch
+            try:
+                self.send_batch(topic, batch)
+            except Exception:
+                logging.exception(f"Failed to publish to pubsub topic {topic}")
+            finally:
+                with self._cond:
+                    self._outstanding -= len(batch)
+                    self._cond.notify_all()
+
+
+def _flush_at_exit(publisher: "weakref.ref[_BatchingPublisher]") -> None:
+    live = publisher()
+    if live is not None:
+        live.flush(timeout=5)
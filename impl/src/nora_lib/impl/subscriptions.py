@@ -0,0 +1,469 @@
+"""
+Many pubsub subscriptions served by a few shared SSE connections.
+"""
+
+import json
+import logging
+import queue
+import threading
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
+from urllib.parse import quote
+
+import requests
+
+from nora_lib.impl.pubsub import PubsubService, SSEEvent, SSEStream
+
+H = TypeVar("H")
+
+# Called with the topic, without its namespace, and the payload of each message
+Callback = Callable[[str, Any], None]
+# Or a queue that (topic, payload) tuples are put on
+Handler = Union[Callback, "queue.Queue[Tuple[str, Any]]"]
+
+
+@dataclass
+class SubscriptionStats:
+    # Messages received over all connections
+    received: int = 0
+    # Messages passed to handlers, once per handler
+    dispatched: int = 0
+    # Messages no handler was subscribed to, e.g. after unsubscribing
+    unmatched: int = 0
+    # Messages not put on a handler's queue because it was full
+    dropped: int = 0
+    # Connections reopened because their topics changed
+    restarts: int = 0
+
+
+class TopicIndex(Generic[H]):
+    """
+    Handlers by topic pattern. A pattern is a topic, or a prefix followed by "*",
+    e.g. "step_progress:*".
+
+    Exact topics are looked up in one dict, and prefixes in another, once for each
+    distinct prefix length, so a lookup costs as many dict lookups as there are
+    prefix lengths however many patterns there are.
+    """
+
+    def __init__(self) -> None:
+        self._exact: Dict[str, List[H]] = {}
+        self._prefixes: Dict[str, List[H]] = {}
+        # Number of prefixes of each length
+        self._prefix_lengths: Dict[int, int] = {}
+
+    def add(self, pattern: str, handler: H) -> None:
+        if pattern.endswith("*"):
+            prefix = pattern[:-1]
+            if prefix not in self._prefixes:
+                self._prefixes[prefix] = []
+                length = len(prefix)
+                self._prefix_lengths[length] = self._prefix_lengths.get(length, 0) + 1
+            self._prefixes[prefix].append(handler)
+        else:
+            self._exact.setdefault(pattern, []).append(handler)
+
+    def remove(self, pattern: str, handler: H) -> None:
+        if pattern.endswith("*"):
+            prefix = pattern[:-1]
+            handlers = self._prefixes.get(prefix)
+            if handlers is None or handler not in handlers:
+                return
+            handlers.remove(handler)
+            if not handlers:
+                del self._prefixes[prefix]
+                length = len(prefix)
+                self._prefix_lengths[length] -= 1
+                if not self._prefix_lengths[length]:
+                    del self._prefix_lengths[length]
+        else:
+            handlers = self._exact.get(pattern)
+            if handlers is None or handler not in handlers:
+                return
+            handlers.remove(handler)
+            if not handlers:
+                del self._exact[pattern]
+
+    def has(self, pattern: str) -> bool:
+        if pattern.endswith("*"):
+            return pattern[:-1] in self._prefixes
+        return pattern in self._exact
+
+    def patterns(self) -> List[str]:
+        return [*self._exact, *(f"{prefix}*" for prefix in self._prefixes)]
+
+    def is_covered(self, pattern: str) -> bool:
+        """Whether another prefix pattern matches every topic this pattern matches"""
+        topic = pattern[:-1] if pattern.endswith("*") else pattern
+        for length in self._prefix_lengths:
+            if length < len(topic) or (length == len(topic) and topic == pattern):
+                if topic[:length] in self._prefixes:
+                    return True
+        return False
+
+    def match(self, topic: str) -> List[H]:
+        """Handlers of every pattern matching a topic, each handler once"""
+        handlers = list(self._exact.get(topic, ()))
+        for length in self._prefix_lengths:
+            if length <= len(topic):
+                for handler in self._prefixes.get(topic[:length], ()):
+                    if handler not in handlers:
+                        handlers.append(handler)
+        return handlers
+
+
+class Subscription:
+    """A handler's subscription to a set of topic patterns"""
+
+    def __init__(
+        self, manager: "SubscriptionManager", patterns: Set[str], handler: Handler
+    ):
+        self.manager = manager
+        # Namespaced patterns
+        self.patterns = patterns
+        self.handler = handler
+        self.active = True
+
+    def unsubscribe(self) -> None:
+        self.manager._unsubscribe(self)
+
+    def deliver(self, topic: str, payload: Any) -> bool:
+        """Pass a message to the handler, returning False if it was dropped"""
+        handler = self.handler
+        if isinstance(handler, queue.Queue):
+            try:
+                handler.put_nowait((topic, payload))
+            except queue.Full:
+                return False
+            return True
+        try:
+            handler(topic, payload)
+        except Exception:
+            logging.exception(f"Pubsub handler for {topic} failed")
+        return True
+
+
+class _Connection:
+    def __init__(self, stream: SSEStream):
+        self.stream = stream
+        # Namespaced patterns served by this connection
+        self.patterns: Set[str] = set()
+        self.thread: Optional[threading.Thread] = None
+
+
+class SubscriptionManager:
+    """
+    Subscribes handlers to pubsub topics over a few shared SSE connections, and
+    dispatches each message to the handlers subscribed to its topic
+
+    Topics are spread over at most `max_connections` connections, with up to
+    `max_topics_per_connection` patterns each; once all are full, the least loaded
+    connection takes more. Each connection asks for its patterns with
+    GET /subscribe/sse?topics=a,b,c and is reopened, resuming from its last event
+    id, whenever they change. Patterns that a wildcard pattern already covers
+    aren't asked for, so each message arrives on one connection. A message's topic
+    is its SSE event type, or the `topic` of a {"topic", "payload"} message, as
+    sent by publish(). Handlers are called on the connection's reader thread, so
+    callbacks should return quickly; use a queue to hand messages to another
+    thread.
+
+    Usage:
+
+    with SubscriptionManager(pubsub_service) as manager:
+        updates = queue.Queue()
+        manager.subscribe("step_progress:*", updates)
+        subscription = manager.subscribe(["task_state:t-1"], on_state_change)
+        ...
+        subscription.unsubscribe()
+    """
+
+    def __init__(
+        self,
+        pubsub: PubsubService,
+        max_connections: int = 4,
+        max_topics_per_connection: int = 500,
+        multiplexed: Optional[bool] = None,
+    ):
+        """
+        :param multiplexed: Whether the server serves many topics on one connection.
+            If None, this is tried and turned off the first time the server answers
+            404. Otherwise each topic gets its own connection to
+            GET /subscribe/sse/{topic}, up to max_connections of them. Patterns
+            such as "step_progress:*" can't be served that way: subscribing to one
+            raises ValueError, and topics that don't get a connection are logged
+            as errors.
+        """
+        self.pubsub = pubsub
+        self.max_connections = max_connections
+        self.max_topics_per_connection = max_topics_per_connection
+        self.multiplexed = multiplexed
+        self._index: TopicIndex[Subscription] = TopicIndex()
+        self._connections: List[_Connection] = []
+        # Subscribed patterns no connection asks for, without multiplexing
+        self._unserved: Set[str] = set()
+        self._stats = SubscriptionStats()
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "SubscriptionManager":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def stats(self) -> SubscriptionStats:
+        with self._lock:
+            return SubscriptionStats(**vars(self._stats))
+
+    def subscribe(
+        self, topics: Union[str, Iterable[str]], handler: Handler
+    ) -> Subscription:
+        """
+        Pass messages published to the given topics to a handler
+        :param topics: A topic or topic pattern such as "step_progress:*", or many
+        :param handler: A callback taking the topic and payload, or a queue.Queue
+            that (topic, payload) tuples are put on. Messages are dropped and
+            counted if the queue is full.
+        """
+        if isinstance(topics, str):
+            topics = [topics]
+        patterns = {self.pubsub._fully_qualified_topic(topic) for topic in topics}
+        subscription = Subscription(self, patterns, handler)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("SubscriptionManager is closed")
+            if self.multiplexed is False:
+                wildcards = sorted(p for p in patterns if p.endswith("*"))
+                if wildcards:
+                    raise ValueError(
+                        f"Pubsub at {self.pubsub.base_url} serves one topic per SSE"
+                        f" connection, so it can't serve {', '.join(wildcards)}"
+                    )
+            for pattern in patterns:
+                self._index.add(pattern, subscription)
+            changed = self._rebalance()
+        self._apply(changed)
+        return subscription
+
+    def close(self) -> None:
+        """Close every connection"""
+        with self._lock:
+            self._closed = True
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.stream.close()
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if not subscription.active:
+                return
+            subscription.active = False
+            for pattern in subscription.patterns:
+                self._index.remove(pattern, subscription)
+            changed = self._rebalance()
+        self._apply(changed)
+
+    def _rebalance(self) -> List[_Connection]:
+        """
+        Make the connections ask for the subscribed patterns that no other pattern
+        covers, returning the connections changed
+        """
+        if self.multiplexed is False:
+            # Patterns can't be asked for, so they don't cover any topic
+            wanted = {p for p in self._index.patterns() if not p.endswith("*")}
+        else:
+            wanted = {
+                p for p in self._index.patterns() if not self._index.is_covered(p)
+            }
+        changed: List[_Connection] = []
+        assigned: Set[str] = set()
+        for connection in self._connections:
+            if connection.patterns - wanted:
+                connection.patterns &= wanted
+                changed.append(connection)
+            assigned |= connection.patterns
+        for connection in self._assign(wanted - assigned):
+            if connection not in changed:
+                changed.append(connection)
+        for connection in changed:
+            if not connection.patterns:
+                self._connections.remove(connection)
+        self._log_unserved()
+        return changed
+
+    def _log_unserved(self) -> None:
+        """Log the subscribed patterns that newly aren't asked for on any connection"""
+        if self.multiplexed is not False:
+            self._unserved = set()
+            return
+        served: Set[str] = set()
+        for connection in self._connections:
+            served |= connection.patterns
+        unserved = set(self._index.patterns()) - served
+        if unserved - self._unserved:
+            logging.error(
+                f"Pubsub at {self.pubsub.base_url} serves one topic per SSE"
+                f" connection and can't serve patterns, and all max_connections="
+                f"{self.max_connections} connections are open. Nothing will be"
+                f" received for {', '.join(sorted(unserved - self._unserved))}."
+            )
+        self._unserved = unserved
+
+    def _assign(self, patterns: Iterable[str]) -> List[_Connection]:
+        """Add patterns to the least loaded connections, returning those changed"""
+        changed: List[_Connection] = []
+        for pattern in sorted(patterns):
+            candidates = [
+                c
+                for c in self._connections
+                if len(c.patterns) < self.max_topics_per_connection
+            ]
+            if self.multiplexed is False:
+                # Without multiplexing, every topic needs its own connection
+                # Connections emptied by this rebalance are about to be closed
+                open_connections = [c for c in self._connections if c.patterns]
+                if (
+                    pattern.endswith("*")
+                    or len(open_connections) >= self.max_connections
+                ):
+                    continue
+                connection = _Connection(SSEStream(self.pubsub, ""))
+                self._connections.append(connection)
+            elif not candidates and len(self._connections) < self.max_connections:
+                connection = _Connection(SSEStream(self.pubsub, ""))
+                self._connections.append(connection)
+            elif candidates:
+                connection = min(candidates, key=lambda c: len(c.patterns))
+            else:
+                connection = min(self._connections, key=lambda c: len(c.patterns))
+            connection.patterns.add(pattern)
+            if connection not in changed:
+                changed.append(connection)
+        return changed
+
+    def _apply(self, connections: List[_Connection]) -> None:
+        """Open, reopen or close connections whose patterns changed"""
+        for connection in connections:
+            with self._lock:
+                if not connection.patterns:
+                    thread = None
+                else:
+                    connection.stream.url = self._url(connection.patterns)
+                    thread = connection.thread
+                    if thread is None:
+                        connection.thread = threading.Thread(
+                            target=self._read,
+                            args=(connection,),
+                            name="pubsub-subscriptions",
+                            daemon=True,
+                        )
+                    else:
+                        self._stats.restarts += 1
+            if not connection.patterns:
+                connection.stream.close()
+            elif thread is None:
+                assert connection.thread is not None
+                connection.thread.start()
+            else:
+                connection.stream.restart()
+
+    def _url(self, patterns: Set[str]) -> str:
+        if self.multiplexed is False:
+            (topic,) = patterns
+            return f"{self.pubsub.base_url}/subscribe/sse/{topic}"
+        topics = quote(",".join(sorted(patterns)), safe=":*,")
+        return f"{self.pubsub.base_url}/subscribe/sse?topics={topics}"
+
+    def _read(self, connection: _Connection) -> None:
+        try:
+            for event in connection.stream.events():
+                self._dispatch(event)
+        except requests.exceptions.HTTPError as e:
+            self._on_rejected(connection, e)
+
+    def _on_rejected(
+        self, connection: _Connection, error: requests.exceptions.HTTPError
+    ) -> None:
+        """
+        Handle a connection the server refused, by switching to a connection per
+        topic if it doesn't serve many topics on one, and otherwise giving up on it
+        """
+        status = error.response.status_code if error.response is not None else None
+        with self._lock:
+            if connection not in self._connections:
+                return
+            if status == 404 and self.multiplexed is None:
+                logging.warning(
+                    f"Pubsub at {self.pubsub.base_url} doesn't serve many topics on"
+                    " one SSE connection. Opening one per topic, up to"
+                    f" max_connections={self.max_connections}."
+                )
+                self.multiplexed = False
+                closed, self._connections = self._connections, []
+                changed = self._rebalance()
+            else:
+                logging.error(
+                    f"Pubsub at {self.pubsub.base_url} refused a subscription to"
+                    f" {', '.join(sorted(connection.patterns))}: {error}"
+                )
+                self._connections.remove(connection)
+                closed, changed = [connection], []
+        for old in closed:
+            old.stream.close()
+        self._apply(changed)
+
+    def _dispatch(self, event: SSEEvent) -> None:
+        message = _topic_and_payload(event)
+        if message is None:
+            return
+        topic, payload = message
+        with self._lock:
+            self._stats.received += 1
+            subscriptions = self._index.match(topic)
+            if not subscriptions:
+                self._stats.unmatched += 1
+                return
+        local_topic = self._local_topic(topic)
+        delivered = dropped = 0
+        for subscription in subscriptions:
+            if subscription.deliver(local_topic, payload):
+                delivered += 1
+            else:
+                dropped += 1
+        with self._lock:
+            self._stats.dispatched += delivered
+            self._stats.dropped += dropped
+
+    def _local_topic(self, topic: str) -> str:
+        namespace = self.pubsub.namespace
+        if namespace and topic.startswith(f"{namespace}:"):
+            return topic[len(namespace) + 1 :]
+        return topic
+
+
+def _topic_and_payload(event: SSEEvent) -> Optional[Tuple[str, Any]]:
+    if not event.data.strip():
+        return None
+    try:
+        data = json.loads(event.data)
+    except json.JSONDecodeError:
+        logging.warning(f"Ignoring a pubsub message that isn't JSON: {event.data}")
+        return None
+    if event.event != "message":
+        return event.event, data
+    if isinstance(data, dict) and set(data) == {"topic", "payload"}:
+        return data["topic"], data["payload"]
+    logging.warning("Ignoring a pubsub message without a topic")
+    return None
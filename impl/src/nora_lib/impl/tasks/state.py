@@ -10,7 +10,7 @@ import logging
 from uuid import UUID
 from datetime import datetime, timezone
 from typing import Optional, Any
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 from nora_lib.tasks.models import AsyncTaskState, R
 from nora_lib.tasks.state import (
@@ -152,5 +152,7 @@ class RemoteStateManager(IStateManager[R]):
 
 
 class TaskStateChangeNotification(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     agent: str
     event: ReturnedEvent
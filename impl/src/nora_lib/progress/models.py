@@ -2,7 +2,7 @@ from enum import Enum
 import uuid
 from typing import Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 from nora_lib.serializers import (
     UuidWithSerializer,
@@ -22,6 +22,8 @@ class RunState(str, Enum):
 class StepProgress(BaseModel):
     """Data class for step progress. This goes into the `data` field in `Event`."""
 
+    model_config = ConfigDict(defer_build=True)
+
     # A short message, e.g. "searching for $query". Recommend < 100 chars.
     short_desc: str
     # Detailed message.
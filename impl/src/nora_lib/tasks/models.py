@@ -1,6 +1,6 @@
 from enum import Enum
 from typing import Any, Dict, Generic, Optional, TypeVar, Union
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 R = TypeVar("R", bound=BaseModel)
@@ -22,6 +22,8 @@ TASK_STATUSES = {s.name: s.value for s in TaskStatus}
 class AsyncTaskState(BaseModel, Generic[R]):
     """Models the current state of an asynchronous request."""
 
+    model_config = ConfigDict(defer_build=True)
+
     task_id: str = Field(
         "Identifies the long-running task so that its status and eventual result"
         "can be checked in follow-up calls."
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import unittest
+from datetime import datetime
+from uuid import uuid4
+
+import httpx
+
+from nora_lib.impl.interactions.async_interactions_service import (
+    AsyncInteractionsService,
+)
+from nora_lib.impl.interactions.interactions_service import (
+    PoolConfig,
+    RetryConfig,
+    VirtualThreadTagError,
+)
+from nora_lib.impl.interactions.models import (
+    Event,
+    ServiceCost,
+    StepCost,
+    VirtualThread,
+)
+
+
+def _mk_event(event_id=None):
+    return Event(
+        event_id=event_id,
+        type="step_progress",
+        actor_id=uuid4(),
+        timestamp=datetime.now(),
+        message_id="m-1",
+    )
+
+
+class TestAsyncInteractionsService(unittest.IsolatedAsyncioTestCase):
+    @staticmethod
+    def _service(handler, retry_config=RetryConfig()):
+        return AsyncInteractionsService(
+            "http://somewhere",
+            token="secret",
+            retry_config=retry_config,
+            transport=httpx.MockTransport(handler),
+        )
+
+    async def test_retries(self):
+        event = _mk_event("1")
+        statuses = [500, 502, 200]
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            status = statuses[len(requests) - 1]
+            body = {"events": [event.model_dump()]} if status == 200 else {}
+            return httpx.Response(status, json=body)
+
+        async with self._service(
+            handler, RetryConfig(tries=3, delay=0, jitter=0)
+        ) as iservice:
+            self.assertEqual(await iservice.get_event("1"), event)
+        self.assertEqual(len(requests), 3)
+        self.assertEqual(
+            requests[0].url, "http://somewhere/interaction/v1/search/event"
+        )
+        self.assertEqual(json.loads(requests[0].content), {"id": "1"})
+        self.assertEqual(requests[0].headers["Authorization"], "Bearer secret")
+
+        # Without retries, the error is raised on the first failure
+        requests.clear()
+        statuses = [500, 200]
+        async with self._service(handler) as iservice:
+            with self.assertRaises(httpx.HTTPStatusError):
+                await iservice.get_event("1")
+        self.assertEqual(len(requests), 1)
+
+    async def test_not_implemented_is_not_retried(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(501, json={})
+
+        async with self._service(
+            handler, RetryConfig(tries=3, delay=0, jitter=0)
+        ) as iservice:
+            with self.assertRaises(httpx.HTTPStatusError):
+                await iservice.get_event("1")
+        self.assertEqual(len(requests), 1)
+
+    async def test_default_timeouts(self):
+        async with AsyncInteractionsService("http://somewhere", timeout=7) as iservice:
+            timeout = iservice._client.timeout
+        self.assertEqual(
+            (timeout.connect, timeout.read, timeout.write, timeout.pool),
+            (7, 7, 7, 7),
+        )
+
+        pool_config = PoolConfig(connect_timeout=2)
+        async with AsyncInteractionsService(
+            "http://somewhere", timeout=7, pool_config=pool_config
+        ) as iservice:
+            timeout = iservice._client.timeout
+        self.assertEqual((timeout.connect, timeout.read), (2, 7))
+
+    async def test_save_event_with_virtual_thread(self):
+        bodies = []
+
+        def handler(request):
+            bodies.append(json.loads(request.content))
+            return httpx.Response(200, json={"event_id": f"e-{len(bodies)}"})
+
+        event = _mk_event()
+        async with self._service(handler) as iservice:
+            event_id = await iservice.save_event(event, virtual_thread_id="vt-1")
+        self.assertEqual(event_id, "e-1")
+        self.assertEqual(event.event_id, "e-1")
+        self.assertEqual(bodies[1]["type"], VirtualThread.EVENT_TYPE)
+        self.assertEqual(
+            bodies[1]["data"],
+            {
+                VirtualThread.ID_FIELD: "vt-1",
+                VirtualThread.EVENT_TYPE_FIELD: event.type,
+            },
+        )
+
+    async def test_tag_failure_reports_the_saved_event(self):
+        bodies = []
+
+        def handler(request):
+            bodies.append(json.loads(request.content))
+            if bodies[-1]["type"] == VirtualThread.EVENT_TYPE:
+                return httpx.Response(400, json={})
+            return httpx.Response(200, json={"event_id": "e-1"})
+
+        async with self._service(handler) as iservice:
+            with self.assertRaises(VirtualThreadTagError) as raised:
+                await iservice.save_event(_mk_event(), virtual_thread_id="vt-1")
+        self.assertEqual(raised.exception.event_id, "e-1")
+        # The event is saved before its tag
+        self.assertEqual(
+            [b["type"] for b in bodies], ["step_progress", VirtualThread.EVENT_TYPE]
+        )
+
+    async def test_report_cost_missing_message(self):
+        def handler(request):
+            return httpx.Response(404, json={})
+
+        step_cost = StepCost(
+            actor_id=uuid4(),
+            message_id="missing",
+            service_cost=ServiceCost(dollar_cost=1.0),
+        )
+        async with self._service(handler) as iservice:
+            self.assertIsNone(await iservice.report_cost(step_cost))
+
+    async def test_concurrent_calls(self):
+        in_flight = 0
+        max_in_flight = 0
+
+        async def handler(request):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            event_id = json.loads(request.content)["id"]
+            return httpx.Response(
+                200, json={"events": [_mk_event(event_id).model_dump()]}
+            )
+
+        async with self._service(handler) as iservice:
+            events = await asyncio.gather(
+                *(iservice.get_event(str(i)) for i in range(50))
+            )
+        self.assertEqual([e.event_id for e in events], [str(i) for i in range(50)])
+        self.assertGreater(max_in_flight, 1)
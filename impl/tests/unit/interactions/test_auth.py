@@ -0,0 +1,193 @@
+import json
+import os
+import threading
+import time
+import unittest
+from typing import Dict, List
+from unittest.mock import patch
+
+import httpx
+from requests import PreparedRequest
+
+from nora_lib.impl.interactions.async_interactions_service import (
+    AsyncInteractionsService,
+)
+from nora_lib.impl.interactions.auth import (
+    DEFAULT_SECRET_ID,
+    BearerAuth,
+    RefreshingTokenProvider,
+    SecretsManagerTokenProvider,
+    StaticTokenProvider,
+)
+from nora_lib.impl.interactions.interactions_service import InteractionsService
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _authorization(iservice):
+    request = PreparedRequest()
+    request.prepare(method="get", url="http://store")
+    return iservice.auth(request).headers["Authorization"]
+
+
+class TestRefreshingTokenProvider(unittest.TestCase):
+    def setUp(self):
+        self.clock = _Clock()
+        self.fetches = 0
+        self.fetched = threading.Event()
+        self.fetch_fails = False
+
+        def fetch():
+            self.fetches += 1
+            self.fetched.set()
+            if self.fetch_fails:
+                raise RuntimeError("unavailable")
+            return f"token-{self.fetches}"
+
+        self.provider = RefreshingTokenProvider(
+            fetch, ttl=100, refresh_before=10, clock=self.clock
+        )
+
+    def _wait_for_refresh(self):
+        self.assertTrue(self.fetched.wait(5))
+        self.fetched.clear()
+        while self.provider._refreshing:
+            time.sleep(0.001)
+
+    def test_lazy_and_cached(self):
+        self.assertTrue(self.provider.needs_fetch())
+        self.assertEqual(self.fetches, 0)
+        self.assertEqual(self.provider.token(), "token-1")
+        self.clock.now = 50
+        self.assertEqual(self.provider.token(), "token-1")
+        self.assertEqual(self.fetches, 1)
+
+    def test_background_refresh(self):
+        self.provider.token()
+        self.fetched.clear()
+        self.clock.now = 95
+        # The old token is returned while the new one is fetched
+        self.assertEqual(self.provider.token(), "token-1")
+        self._wait_for_refresh()
+        self.assertEqual(self.provider.token(), "token-2")
+
+        # A failed refresh keeps the old token until it expires
+        self.fetch_fails = True
+        self.clock.now = 190
+        self.assertEqual(self.provider.token(), "token-2")
+        self._wait_for_refresh()
+        self.assertEqual(self.provider.token(), "token-2")
+        self.clock.now = 200
+        with self.assertRaises(RuntimeError):
+            self.provider.token()
+
+    def test_expired_token_is_refetched(self):
+        self.provider.token()
+        self.clock.now = 100
+        self.assertTrue(self.provider.needs_fetch())
+        self.assertEqual(self.provider.token(), "token-2")
+        self.provider.invalidate()
+        self.assertEqual(self.provider.token(), "token-3")
+
+    def test_static_provider(self):
+        self.assertEqual(StaticTokenProvider("abc").token(), "abc")
+
+
+class TestFromEnv(unittest.TestCase):
+    def setUp(self):
+        self.reads: List[str] = []
+
+        def source(secret_id):
+            self.reads.append(secret_id)
+            return json.dumps({"token": "from-secret"})
+
+        providers: Dict[str, SecretsManagerTokenProvider] = {}
+        shared = patch.object(SecretsManagerTokenProvider, "_shared", providers)
+        shared.start()
+        self.addCleanup(shared.stop)
+        secrets = patch(
+            "nora_lib.impl.interactions.auth.secrets_manager_source",
+            return_value=source,
+        )
+        secrets.start()
+        self.addCleanup(secrets.stop)
+
+    def test_token_from_environment(self):
+        with patch.dict(os.environ, {"INTERACTION_STORE_TOKEN": "from-env"}):
+            iservice = InteractionsService.from_env()
+        self.assertEqual(_authorization(iservice), "Bearer from-env")
+        self.assertEqual(self.reads, [])
+
+    def test_token_from_secret_on_first_request(self):
+        with patch.dict(os.environ, {"INTERACTION_STORE_TOKEN": ""}):
+            first = InteractionsService.from_env()
+            second = InteractionsService.from_env()
+        self.assertEqual(self.reads, [])
+        self.assertEqual(_authorization(first), "Bearer from-secret")
+        self.assertEqual(_authorization(second), "Bearer from-secret")
+        self.assertEqual(self.reads, [DEFAULT_SECRET_ID])
+
+
+class TestAuthPrecedence(unittest.TestCase):
+    def test_auth_over_token_provider(self):
+        iservice = InteractionsService(
+            "http://store",
+            auth=BearerAuth("from-auth"),
+            token_provider=StaticTokenProvider("from-provider"),
+        )
+        self.assertEqual(_authorization(iservice), "Bearer from-auth")
+
+    def test_token_over_auth(self):
+        iservice = InteractionsService(
+            "http://store", token="from-token", auth=BearerAuth("from-auth")
+        )
+        self.assertEqual(_authorization(iservice), "Bearer from-token")
+
+
+class TestAsyncTokenProvider(unittest.IsolatedAsyncioTestCase):
+    async def test_token_provider(self):
+        headers = []
+
+        def handler(request):
+            headers.append(request.headers["Authorization"])
+            return httpx.Response(200, json={})
+
+        provider = SecretsManagerTokenProvider(
+            "secret", source={"secret": json.dumps({"token": "abc"})}.__getitem__
+        )
+        async with AsyncInteractionsService(
+            "http://somewhere",
+            token_provider=provider,
+            transport=httpx.MockTransport(handler),
+        ) as iservice:
+            await iservice.fetch_all_by_thread("t-1")
+            await iservice.fetch_all_by_thread("t-1")
+        self.assertEqual(headers, ["Bearer abc", "Bearer abc"])
+
+    async def test_precedence(self):
+        headers = []
+
+        def handler(request):
+            headers.append(request.headers["Authorization"])
+            return httpx.Response(200, json={})
+
+        basic = httpx.BasicAuth("user", "password")
+        provider = StaticTokenProvider("from-provider")
+        for kwargs in [
+            {"auth": basic, "token_provider": provider},
+            {"token": "from-token", "auth": basic},
+        ]:
+            async with AsyncInteractionsService(
+                "http://somewhere",
+                transport=httpx.MockTransport(handler),
+                **kwargs,  # type: ignore[arg-type]
+            ) as iservice:
+                await iservice.fetch_all_by_thread("t-1")
+        self.assertTrue(headers[0].startswith("Basic "))
+        self.assertEqual(headers[1], "Bearer from-token")
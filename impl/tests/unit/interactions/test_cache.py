@@ -0,0 +1,106 @@
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
+
+from requests import Response
+
+from nora_lib.impl.interactions.cache import CachePolicy, InteractionsCache
+from nora_lib.impl.interactions.interactions_service import InteractionsService
+from nora_lib.impl.interactions.models import Channel, Event, Surface
+
+ACTOR = uuid4()
+
+
+def _channel(channel_id):
+    return Channel(channel_id=channel_id, surface=Surface.WEB, owning_actor_id="a")
+
+
+def _event(event_id, message_id="m-1"):
+    return Event(
+        event_id=event_id,
+        type="step_progress",
+        actor_id=ACTOR,
+        timestamp=datetime.now(),
+        message_id=message_id,
+    )
+
+
+def _response(body):
+    resp = Response()
+    resp.status_code = 200
+    resp.json = MagicMock(return_value=body)  # type: ignore
+    return resp
+
+
+class TestInteractionsCache(unittest.TestCase):
+    def test_lru_and_ttl(self):
+        now = [0.0]
+        cache = InteractionsCache(
+            policies={
+                InteractionsCache.CHANNEL: CachePolicy(max_size=2, ttl_seconds=None),
+                InteractionsCache.EVENT: CachePolicy(ttl_seconds=10),
+            },
+            clock=lambda: now[0],
+        )
+        for channel_id in ["c-1", "c-2"]:
+            cache.put(InteractionsCache.CHANNEL, channel_id, _channel(channel_id))
+        # Touch c-1 so that c-2 is the least recently used
+        self.assertEqual(cache.get(InteractionsCache.CHANNEL, "c-1"), _channel("c-1"))
+        cache.put(InteractionsCache.CHANNEL, "c-3", _channel("c-3"))
+        self.assertIsNone(cache.get(InteractionsCache.CHANNEL, "c-2"))
+        self.assertIsNotNone(cache.get(InteractionsCache.CHANNEL, "c-1"))
+
+        cache.put(InteractionsCache.EVENT, "e-1", _event("e-1"))
+        now[0] = 5
+        self.assertIsNotNone(cache.get(InteractionsCache.EVENT, "e-1"))
+        now[0] = 11
+        self.assertIsNone(cache.get(InteractionsCache.EVENT, "e-1"))
+
+        stats = cache.stats()
+        self.assertEqual(stats[InteractionsCache.CHANNEL].hits, 2)
+        self.assertEqual(stats[InteractionsCache.CHANNEL].misses, 1)
+        self.assertEqual(stats[InteractionsCache.CHANNEL].evictions, 1)
+        self.assertEqual(stats[InteractionsCache.EVENT].misses, 1)
+
+    def test_returns_copies(self):
+        cache = InteractionsCache()
+        cache.put(InteractionsCache.EVENT, "e-1", _event("e-1"))
+        cached = cache.get(InteractionsCache.EVENT, "e-1")
+        cached.data["mutated"] = True  # type: ignore[union-attr]
+        self.assertEqual(cache.get(InteractionsCache.EVENT, "e-1").data, {})  # type: ignore[union-attr]
+
+    @patch("requests.Session.request")
+    def test_service_reads_through_and_invalidates(self, req_mock):
+        iservice = InteractionsService("somewhere", cache=InteractionsCache())
+        message = {
+            "message_id": "m-1",
+            "actor_id": str(ACTOR),
+            "text": "hi",
+            "ts": datetime.now().isoformat(),
+            "thread": {"thread_id": "t-1"},
+        }
+        req_mock.return_value = _response({"message": message})
+        self.assertEqual(iservice.get_message("m-1").thread_id, "t-1")
+        self.assertEqual(iservice.get_message("m-1").text, "hi")
+        self.assertEqual(req_mock.call_count, 1)
+
+        # Saving an event on the message evicts it
+        req_mock.return_value = _response({"event_id": "e-1"})
+        iservice.save_event(_event(None))
+        req_mock.return_value = _response({"message": message})
+        iservice.get_message("m-1")
+        self.assertEqual(req_mock.call_count, 3)
+
+        # Deleting the thread evicts its messages
+        iservice.delete_thread("t-1")
+        iservice.get_message("m-1")
+        self.assertEqual(req_mock.call_count, 5)
+        stats = iservice.cache.stats()[InteractionsCache.MESSAGE]  # type: ignore[union-attr]
+        self.assertEqual((stats.hits, stats.misses, stats.invalidations), (1, 3, 2))
+
+        # Missing channels are not cached
+        req_mock.return_value = _response({})
+        self.assertIsNone(iservice.get_channel("c-1"))
+        self.assertIsNone(iservice.get_channel("c-1"))
+        self.assertEqual(req_mock.call_count, 7)
@@ -0,0 +1,75 @@
+import gzip
+import json
+import threading
+import unittest
+from typing import Any, Dict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from nora_lib.impl.interactions.compression import CompressionConfig
+from nora_lib.impl.interactions.interactions_service import InteractionsService
+
+LARGE_RESPONSE = {"channel": {"threads": [{"thread_id": "t", "name": "x" * 50}] * 200}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        self.server.received.append(json.loads(body))  # type: ignore[attr-defined]
+        payload = json.dumps(LARGE_RESPONSE).encode()
+        self.send_response(200)
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            payload = gzip.compress(payload)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.received = []  # type: ignore[attr-defined]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_compressed_round_trip(self):
+        compression = CompressionConfig(
+            accept_encodings=("gzip",), request_min_bytes=1000
+        )
+        with InteractionsService(self.base_url, compression=compression) as iservice:
+            small: Dict[str, Any] = {"query": {"channel_id": "c"}}
+            large = {"query": {"channel_id": "c"}, "data": ["y" * 100] * 50}
+            for body in [small, large]:
+                response = iservice._send("post", f"{self.base_url}/x", body)
+                self.assertEqual(response.json(), LARGE_RESPONSE)
+            stats = iservice.wire_stats.snapshot()
+
+        self.assertEqual(self.server.received, [small, large])  # type: ignore[attr-defined]
+        self.assertEqual(stats.requests, 2)
+        self.assertLess(stats.request_wire_bytes, stats.request_body_bytes)
+        self.assertLess(stats.response_wire_bytes * 10, stats.response_body_bytes)
+
+    def test_uncompressed_by_default(self):
+        compression = CompressionConfig(accept_encodings=())
+        with InteractionsService(self.base_url, compression=compression) as iservice:
+            iservice._send("post", f"{self.base_url}/x", {"data": "y" * 2000})
+            stats = iservice.wire_stats.snapshot()
+        self.assertEqual(stats.requests, 1)
+        self.assertEqual(stats.request_wire_bytes, stats.request_body_bytes)
+        self.assertEqual(stats.response_wire_bytes, stats.response_body_bytes)
+
+    def test_not_counted_by_default(self):
+        with InteractionsService(self.base_url) as iservice:
+            iservice._send("post", f"{self.base_url}/x", {"data": "y" * 2000})
+            stats = iservice.wire_stats.snapshot()
+        self.assertEqual(stats.requests, 0)
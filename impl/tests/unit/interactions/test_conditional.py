@@ -0,0 +1,150 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from uuid import uuid4
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+from nora_lib.impl.interactions.compression import CompressionConfig
+from nora_lib.impl.interactions.conditional import ConditionalReadCache
+from nora_lib.impl.interactions.in_memory import (
+    InMemoryInteractionStore,
+    InMemoryInteractionsService,
+    serve,
+)
+from nora_lib.impl.interactions.interactions_service import InteractionsService
+from nora_lib.impl.interactions.models import Channel, Message, Surface
+
+ACTOR = uuid4()
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _response(status, content=b"", headers=None):
+    response = Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers or {})
+    response._content = content
+    return response
+
+
+class TestConditionalReadCache(unittest.TestCase):
+    def test_validators_and_not_modified(self):
+        cache = ConditionalReadCache(max_entries=1)
+        self.assertIsNone(cache.lookup("a"))
+        cache.resolve(
+            "a",
+            _response(
+                200,
+                b'{"x": 1}',
+                {"ETag": '"1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"},
+            ),
+            None,
+        )
+        entry = cache.lookup("a")
+        assert entry is not None
+        self.assertEqual(
+            entry.request_headers(),
+            {
+                "If-None-Match": '"1"',
+                "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+            },
+        )
+        response = cache.resolve("a", _response(304, headers={"ETag": '"1"'}), entry)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"x": 1})
+        self.assertEqual(cache.stats.not_modified, 1)
+
+        # Responses without validators aren't kept, and entries are evicted LRU
+        cache.resolve("b", _response(200, b"{}"), None)
+        self.assertIsNotNone(cache.lookup("a"))
+        cache.resolve("b", _response(200, b"{}", {"ETag": '"2"'}), None)
+        self.assertIsNone(cache.lookup("a"))
+        # A 304 for a request with nothing cached is passed through
+        self.assertEqual(cache.resolve("c", _response(304), None).status_code, 304)
+
+    def test_evicted_while_in_flight(self):
+        cache = ConditionalReadCache()
+        cache.resolve("a", _response(200, b'{"x": 1}', {"ETag": '"1"'}), None)
+        entry = cache.lookup("a")
+        cache.clear()
+        response = cache.resolve("a", _response(304, headers={"ETag": '"1"'}), entry)
+        self.assertEqual((response.status_code, response.json()), (200, {"x": 1}))
+
+
+class TestConditionalReads(unittest.TestCase):
+    def setUp(self):
+        self.store = InMemoryInteractionStore()
+        self.iservice = InMemoryInteractionsService(
+            self.store, conditional_reads=ConditionalReadCache()
+        )
+        self.iservice.save_channel(
+            Channel(channel_id="c-1", surface=Surface.WEB, owning_actor_id="a")
+        )
+        self.iservice.save_message(
+            Message(
+                message_id="m-1",
+                actor_id=ACTOR,
+                text="hello",
+                thread_id="t-1",
+                channel_id="c-1",
+                surface=Surface.WEB,
+                ts=T0,
+            )
+        )
+
+    def _exchange(self, fetch):
+        """The result of a fetch, and the headers sent and status received"""
+        sent = []
+        request = self.iservice._request
+
+        def spy(*args):
+            response = request(*args)
+            sent.append((args[4], response.status_code))
+            return response
+
+        with patch.object(self.iservice, "_request", spy):
+            result = fetch()
+        ((headers, status),) = sent
+        return result, headers, status
+
+    def test_unchanged_reads_are_not_modified(self):
+        fetch = lambda: self.iservice.get_channel_by_context("m-1")  # noqa: E731
+        first, headers, status = self._exchange(fetch)
+        self.assertEqual((headers, status), ({}, 200))
+        second, headers, status = self._exchange(fetch)
+        self.assertIn("If-None-Match", headers)
+        self.assertEqual(status, 304)
+        self.assertEqual(second, first)
+
+        self.iservice.save_channel(
+            Channel(channel_id="c-1", surface=Surface.WEB, owning_actor_id="b")
+        )
+        third, _, status = self._exchange(fetch)
+        self.assertEqual(status, 200)
+        self.assertEqual(third.owning_actor_id, "b")  # type: ignore[union-attr]
+        stats = self.iservice.conditional_reads.stats  # type: ignore[union-attr]
+        self.assertEqual((stats.not_modified, stats.modified), (1, 1))
+
+    def test_searches_are_not_conditional(self):
+        fetch = lambda: self.iservice.get_channel("c-1")  # noqa: E731
+        for _ in range(2):
+            _, headers, status = self._exchange(fetch)
+            self.assertEqual((headers, status), ({}, 200))
+
+    def test_over_http(self):
+        conditional_reads = ConditionalReadCache()
+        with serve(self.store) as base_url:
+            iservice = InteractionsService(
+                base_url,
+                conditional_reads=conditional_reads,
+                compression=CompressionConfig(),
+            )
+            first = iservice.get_channel_by_context("t-1")
+            received = iservice.wire_stats.response_wire_bytes
+            second = iservice.get_channel_by_context("t-1")
+            self.assertEqual(iservice.wire_stats.response_wire_bytes, received)
+            iservice.close()
+        self.assertGreater(received, 0)
+        self.assertEqual(second, first)
+        self.assertEqual(conditional_reads.stats.not_modified, 1)
@@ -0,0 +1,80 @@
+import queue
+import threading
+import time
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+from uuid import uuid4
+
+from nora_lib.impl.interactions.event_buffer import EventWriteBuffer
+from nora_lib.impl.interactions.models import Event
+
+
+def _mk_event(message_id, text=None):
+    return Event(
+        type="step_progress",
+        actor_id=uuid4(),
+        timestamp=datetime.now(),
+        text=text,
+        message_id=message_id,
+    )
+
+
+class TestEventWriteBuffer(unittest.TestCase):
+    def test_saves_in_order_per_message(self):
+        saved = []
+        lock = threading.Lock()
+
+        def save_event(event, virtual_thread_id=None):
+            # Make later events on a message faster, to shake out reordering
+            time.sleep(0.01 / (1 + int(event.text)))
+            with lock:
+                saved.append((event.message_id, int(event.text)))
+            return f"{event.message_id}-{event.text}"
+
+        iservice = MagicMock()
+        iservice.save_event.side_effect = save_event
+        with EventWriteBuffer(iservice, concurrency=4) as buffer:
+            futures = [
+                buffer.save_event(_mk_event(f"m-{m}", str(i)))
+                for i in range(5)
+                for m in range(3)
+            ]
+        self.assertEqual(len(saved), 15)
+        for m in range(3):
+            self.assertEqual(
+                [i for message_id, i in saved if message_id == f"m-{m}"],
+                list(range(5)),
+            )
+        self.assertEqual(futures[0].result(), "m-0-0")
+
+    def test_callback_and_failure(self):
+        iservice = MagicMock()
+        iservice.save_event.side_effect = [RuntimeError("boom"), "e-2"]
+        callback = MagicMock()
+        with EventWriteBuffer(iservice, concurrency=1) as buffer:
+            failed = buffer.save_event(_mk_event("m-1"))
+            succeeded = buffer.save_event(_mk_event("m-1"), "vt-1", callback=callback)
+            self.assertTrue(buffer.flush(timeout=5))
+        self.assertIsInstance(failed.exception(), RuntimeError)
+        self.assertEqual(succeeded.result(), "e-2")
+        callback.assert_called_once_with(succeeded)
+        self.assertEqual(iservice.save_event.call_args.args[1], "vt-1")
+
+    def test_backpressure(self):
+        release = threading.Event()
+        iservice = MagicMock()
+        iservice.save_event.side_effect = lambda *args: release.wait() and "e"
+        buffer = EventWriteBuffer(
+            iservice, max_queue_size=2, concurrency=1, put_timeout=0.05
+        )
+        buffer.save_event(_mk_event("m-1"))
+        buffer.save_event(_mk_event("m-1"))
+        with self.assertRaises(queue.Full):
+            buffer.save_event(_mk_event("m-1"))
+        self.assertFalse(buffer.flush(timeout=0.05))
+
+        release.set()
+        self.assertTrue(buffer.close(timeout=5))
+        with self.assertRaises(RuntimeError):
+            buffer.save_event(_mk_event("m-1"))
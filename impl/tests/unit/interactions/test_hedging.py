@@ -0,0 +1,142 @@
+import io
+import threading
+import time
+import unittest
+from typing import List
+from unittest.mock import MagicMock, patch
+
+from requests import Response
+
+from nora_lib.impl.interactions.hedging import Hedger, HedgingPolicy
+from nora_lib.impl.interactions.interactions_service import (
+    InteractionsService,
+    PoolConfig,
+    _endpoint_template,
+)
+
+
+def _response(body):
+    resp = Response()
+    resp.status_code = 200
+    resp.raw = io.BytesIO()
+    resp.json = MagicMock(return_value=body)  # type: ignore
+    return resp
+
+
+class TestHedging(unittest.TestCase):
+    def test_slow_request_is_hedged(self):
+        hedger = Hedger(
+            HedgingPolicy(initial_delay=0.05, min_delay=0.01, max_hedge_ratio=1.0)
+        )
+        calls: List[int] = []
+        lock = threading.Lock()
+
+        def send():
+            with lock:
+                calls.append(len(calls))
+                n = len(calls)
+            # The first request is stuck on a slow replica
+            time.sleep(1.0 if n == 1 else 0.01)
+            return _response(n)
+
+        start = time.perf_counter()
+        response = hedger.call("search", send)
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(response.json(), 2)
+        stats = hedger.stats()["search"]
+        self.assertEqual((stats.requests, stats.hedges, stats.hedge_wins), (1, 1, 1))
+        hedger.close()
+
+    def test_delay_and_rate_cap(self):
+        policy = HedgingPolicy(
+            percentile=50, min_samples=3, min_delay=0.001, max_hedge_ratio=0.5
+        )
+        hedger = Hedger(policy)
+        for delay in [0.002, 0.004, 0.006]:
+            hedger.call("get", lambda: time.sleep(delay) or _response(None))  # type: ignore[func-returns-value]
+        self.assertGreaterEqual(hedger.delay("get"), 0.004)
+        self.assertLess(hedger.delay("get"), 0.006)
+
+        hedger.close()
+
+        # Every call is slow, but at most half of them are hedged
+        hedger = Hedger(
+            HedgingPolicy(
+                min_samples=1000,
+                initial_delay=0.001,
+                min_delay=0.001,
+                max_hedge_ratio=0.5,
+            )
+        )
+        for _ in range(6):
+            hedger.call("get", lambda: time.sleep(0.02) or _response(None))  # type: ignore[func-returns-value]
+        stats = hedger.stats()["get"]
+        self.assertEqual((stats.requests, stats.hedges), (6, 3))
+        hedger.close()
+
+    def test_queued_reads_are_not_hedged(self):
+        hedger = Hedger(
+            HedgingPolicy(
+                initial_delay=0.05, min_delay=0.05, max_hedge_ratio=1.0, max_workers=1
+            )
+        )
+
+        def send():
+            time.sleep(0.03)
+            return _response(None)
+
+        # Each read waits for the one before it, but none of them is slow
+        threads = [
+            threading.Thread(target=hedger.call, args=("get", send)) for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(hedger.stats()["get"].hedges, 0)
+        hedger.close()
+
+    def test_latency_window(self):
+        hedger = Hedger(
+            HedgingPolicy(percentile=0, min_samples=1, min_delay=0, window=2)
+        )
+        state = hedger._state("get")
+        for latency in [0.3, 0.1, 0.2]:
+            state.add(latency)
+        self.assertEqual(list(state.latencies), [0.1, 0.2])
+        self.assertEqual(state.sorted_latencies, [0.1, 0.2])
+        self.assertEqual(hedger.delay("get"), 0.1)
+        hedger.close()
+
+    def test_sized_to_the_connection_pool(self):
+        with InteractionsService(
+            "http://store",
+            hedging=HedgingPolicy(),
+            pool_config=PoolConfig(pool_maxsize=32),
+        ) as iservice:
+            self.assertEqual(iservice.hedger.policy.max_workers, 32)  # type: ignore[union-attr]
+
+    @patch("requests.Session.request")
+    def test_only_reads_are_hedged(self, req_mock):
+        req_mock.return_value = _response({"event_id": "e-1"})
+        with InteractionsService(
+            "http://store", hedging=HedgingPolicy(max_hedge_ratio=1.0)
+        ) as iservice:
+            iservice._call("post", "http://store/interaction/v1/event", {})
+            iservice._call("post", "http://store/interaction/v1/search/message", {})
+            iservice._call("get", "http://store/interaction/v1/event/e-1")
+            self.assertEqual(
+                set(iservice.hedger.stats()),  # type: ignore[union-attr]
+                {
+                    ("post", "/interaction/v1/search/message"),
+                    ("get", "/interaction/v1/event/{id}"),
+                },
+            )
+
+    def test_endpoint_template(self):
+        self.assertEqual(
+            _endpoint_template(
+                "http://store", "http://store/interaction/v1/channel/by-context/c-1"
+            ),
+            "/interaction/v1/channel/by-context/{id}",
+        )
@@ -0,0 +1,477 @@
+import threading
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from uuid import uuid4
+
+from requests import HTTPError
+
+from nora_lib.impl.interactions.cache import InteractionsCache
+from nora_lib.impl.interactions.event_buffer import EventWriteBuffer
+from nora_lib.impl.interactions.in_memory import (
+    InMemoryInteractionStore,
+    InMemoryInteractionsService,
+    serve,
+)
+from nora_lib.impl.interactions.interactions_service import (
+    MISSING,
+    InteractionsService,
+    VirtualThreadTagError,
+)
+from nora_lib.impl.interactions.models import (
+    Channel,
+    Event,
+    Message,
+    ServiceCost,
+    StepCost,
+    Surface,
+    Thread,
+    ThreadStatus,
+    VirtualThread,
+)
+from nora_lib.impl.interactions.projection import IDS_AND_EVENT_DATA, Projection
+
+ACTOR = uuid4()
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _message(message_id, thread_id, minutes, channel_id="c-1"):
+    return Message(
+        message_id=message_id,
+        actor_id=ACTOR,
+        text=f"text of {message_id}",
+        thread_id=thread_id,
+        channel_id=channel_id,
+        surface=Surface.WEB,
+        ts=T0 + timedelta(minutes=minutes),
+    )
+
+
+def _event(event_type, message_id=None, thread_id=None, data=None):
+    return Event(
+        type=event_type,
+        actor_id=ACTOR,
+        timestamp=T0,
+        message_id=message_id,
+        thread_id=thread_id,
+        data=data or {},
+    )
+
+
+class TestInMemoryInteractionsService(unittest.TestCase):
+    def setUp(self):
+        self.iservice = InMemoryInteractionsService()
+        self.iservice.save_channel(
+            Channel(channel_id="c-1", surface=Surface.WEB, owning_actor_id="a")
+        )
+        for m in range(4):
+            self.iservice.save_message(_message(f"m-{m}", "t-1", m))
+        self.iservice.save_event(_event("step_progress", message_id="m-3"))
+        self.iservice.save_event(_event("other", message_id="m-3"))
+        self.iservice.save_thread_feedback("t-1", "great", ACTOR)
+
+    def test_message_searches(self):
+        message = self.iservice.get_message("m-2")
+        self.assertEqual((message.thread_id, message.channel_id), ("t-1", "c-1"))
+        self.assertEqual(message.text, "text of m-2")
+
+        thread = self.iservice.fetch_thread_messages_and_events_for_message(
+            "m-0", event_types=["step_progress"], most_recent=2
+        )
+        self.assertEqual([m.message_id for m in thread.messages], ["m-2", "m-3"])
+        self.assertEqual([e.type for e in thread.messages[1].events], ["step_progress"])
+
+        thread = self.iservice.fetch_thread_messages_and_events_for_message(
+            "m-0",
+            event_types=[],
+            min_timestamp=(T0 + timedelta(minutes=3)).isoformat(),
+        )
+        self.assertEqual([m.message_id for m in thread.messages], ["m-3"])
+        self.assertEqual(thread.messages[0].events, [])
+
+        self.assertEqual(
+            self.iservice.get_channel_by_context("m-1").channel_id, "c-1"  # type: ignore[union-attr]
+        )
+        self.assertIsNone(self.iservice.get_channel("c-missing"))
+
+    def test_event_writes(self):
+        event_id = self.iservice.save_event(_event("step_progress", message_id="m-1"))
+        event = self.iservice.get_event(event_id)
+        event.text = "updated"
+        self.iservice.save_event(event)
+        self.assertEqual(self.iservice.get_event(event_id).text, "updated")
+
+        # Cost reports on unknown messages are dropped with a warning
+        self.assertIsNone(
+            self.iservice.report_cost(_cost_report(message_id="m-missing"))
+        )
+
+    def test_batch_with_an_event_on_a_missing_message(self):
+        results = self.iservice.save_events(
+            [
+                _event("step_progress", message_id="m-1"),
+                _event("step_progress", message_id="m-missing"),
+            ]
+        )
+        self.assertTrue(results[0].ok)
+        self.assertIsInstance(results[1].error, HTTPError)
+        # The batch endpoint exists; only one of its events was rejected
+        self.assertIsNone(self.iservice.batch_writes)
+        with patch.object(
+            self.iservice, "_request", wraps=self.iservice._request
+        ) as request_mock:
+            self.iservice.save_events([_event("step_progress", message_id="m-2")])
+        self.assertTrue(request_mock.call_args.args[1].endswith("/event/batch"))
+
+    def test_thread_search_and_delete(self):
+        response = self.iservice.fetch_all_by_thread("t-1", event_types=["other"])
+        thread = response["thread"]
+        self.assertEqual(len(thread["messages"]), 4)
+        self.assertEqual(
+            [e["type"] for e in thread["messages"][3]["events"]], ["other"]
+        )
+        self.assertEqual(thread["events"], [])
+
+        response = self.iservice.fetch_messages_and_events_for_thread("t-1")
+        self.assertEqual(
+            [e["type"] for e in response["thread"]["events"]],
+            ["user_feedback_thread"],
+        )
+
+        self.iservice.delete_thread("t-1")
+        self.assertEqual(self.iservice.store.messages, {})
+        self.assertEqual(self.iservice.store.events, {})
+
+    def test_thread_events_changed_since(self):
+        later = (datetime.now(timezone.utc) + timedelta(minutes=1)).isoformat()
+        thread = self.iservice.fetch_all_by_thread("t-1", min_event_timestamp=later)[
+            "thread"
+        ]
+        self.assertEqual(thread["events"], [])
+        # Events on messages are left alone
+        self.assertTrue(thread["messages"][3]["events"])
+
+        thread = self.iservice.fetch_all_by_thread(
+            "t-1", min_event_timestamp=T0.isoformat()
+        )["thread"]
+        self.assertEqual(
+            [e["type"] for e in thread["events"]], ["user_feedback_thread"]
+        )
+
+    def test_channel_search(self):
+        for t in range(2, 6):
+            self.iservice.save_thread(
+                Thread(
+                    thread_id=f"t-{t}",
+                    channel_id="c-1",
+                    surface=Surface.WEB,
+                    status=ThreadStatus.ARCHIVED if t == 5 else ThreadStatus.ACTIVE,
+                )
+            )
+            self.iservice.save_message(_message(f"m-t{t}", f"t-{t}", t))
+
+        response = self.iservice.fetch_all_by_channel(
+            "c-1", num_most_recent_threads=2, num_oldest_messages_per_thread=1
+        )
+        threads = response["channel"]["threads"]
+        # Newest first, and the archived thread is left out
+        self.assertEqual([t["thread_id"] for t in threads], ["t-4", "t-3"])
+        self.assertEqual(len(threads[0]["messages"]), 1)
+
+        self.assertEqual(
+            [
+                t.thread_id
+                for t in self.iservice.iter_channel_threads("c-1", page_size=1)
+            ],
+            ["t-4", "t-3", "t-2", "t-1"],
+        )
+
+    def test_virtual_thread_content(self):
+        self.iservice.save_message(_message("m-vt", "t-1", 10), virtual_thread_id="vt")
+        content = self.iservice.get_virtual_thread_content("m-vt", "vt")
+        self.assertEqual([m.message_id for m in content], ["m-vt"])
+
+    def test_served_over_http(self):
+        with serve(self.iservice.store) as base_url:
+            with InteractionsService(base_url) as iservice:
+                self.assertEqual(iservice.get_message("m-1").text, "text of m-1")
+                self.assertEqual(
+                    iservice.fetch_all_by_thread("t-1")["thread"]["thread_id"], "t-1"
+                )
+
+
+def _cost_report(message_id):
+    return StepCost(
+        actor_id=ACTOR,
+        message_id=message_id,
+        service_cost=ServiceCost(dollar_cost=0.1, description="test"),
+    )
+
+
+class TestInMemoryInteractionStore(unittest.TestCase):
+    def test_unknown_endpoints(self):
+        store = InMemoryInteractionStore()
+        self.assertEqual(store.handle("get", "/elsewhere")[0], 404)
+        self.assertEqual(store.handle("post", "/interaction/v1/nothing", {})[0], 404)
+        self.assertEqual(store.handle("post", "/interaction/v1/message", {})[0], 422)
+
+
+class TestTaggedSaves(unittest.TestCase):
+    def _tags(self, store):
+        return [
+            (e["message_id"], e["data"][VirtualThread.EVENT_TYPE_FIELD])
+            for e in store.events.values()
+            if e["type"] == VirtualThread.EVENT_TYPE
+        ]
+
+    def test_event_and_tag_in_one_batch(self):
+        iservice = InMemoryInteractionsService()
+        iservice.save_message(_message("m-1", "t-1", 0))
+        with patch.object(
+            iservice, "_request", wraps=iservice._request
+        ) as request_mock:
+            event_id = iservice.save_event(
+                _event("step_progress", message_id="m-1"), virtual_thread_id="vt"
+            )
+        self.assertEqual(request_mock.call_count, 1)
+        self.assertEqual(iservice.store.events[event_id]["type"], "step_progress")
+        self.assertEqual(self._tags(iservice.store), [("m-1", "step_progress")])
+
+    def test_event_then_tag_without_batches(self):
+        iservice = InMemoryInteractionsService(batch_writes=False)
+        iservice.save_message(_message("m-1", "t-1", 0))
+        event_id = iservice.save_event(
+            _event("step_progress", message_id="m-1"), virtual_thread_id="vt"
+        )
+        self.assertEqual(iservice.store.events[event_id]["type"], "step_progress")
+        self.assertEqual(self._tags(iservice.store), [("m-1", "step_progress")])
+
+        # The event failed, so its tag isn't sent
+        with self.assertRaises(HTTPError):
+            iservice.save_event(
+                _event("step_progress", message_id="m-missing"), virtual_thread_id="vt"
+            )
+        self.assertEqual(self._tags(iservice.store), [("m-1", "step_progress")])
+        iservice.close()
+
+    def test_tag_failure_reports_the_saved_event(self):
+        iservice = InMemoryInteractionsService(
+            _StoreRejectingTags(), batch_writes=False
+        )
+        iservice.save_message(_message("m-1", "t-1", 0))
+        event = _event("step_progress", message_id="m-1")
+        with self.assertRaises(VirtualThreadTagError) as raised:
+            iservice.save_event(event, virtual_thread_id="vt")
+        event_id = raised.exception.event_id
+        self.assertEqual(event.event_id, event_id)
+        self.assertEqual(iservice.store.events[event_id]["type"], "step_progress")
+        self.assertIsInstance(raised.exception.error, HTTPError)
+
+    def test_event_tag_through_buffer(self):
+        iservice = InMemoryInteractionsService(batch_writes=False)
+        iservice.save_message(_message("m-1", "t-1", 0))
+        caller = threading.get_ident()
+        callers = []
+        request = iservice._request
+
+        def record_caller(*args, **kwargs):
+            callers.append(threading.get_ident())
+            return request(*args, **kwargs)
+
+        with EventWriteBuffer(iservice) as buffer, patch.object(
+            iservice, "_request", side_effect=record_caller
+        ):
+            iservice.tag_buffer = buffer
+            event_id = iservice.save_event(
+                _event("step_progress", message_id="m-1"), virtual_thread_id="vt"
+            )
+            # Only the event is sent before save_event returns
+            self.assertEqual(callers.count(caller), 1)
+        self.assertEqual(iservice.store.events[event_id]["type"], "step_progress")
+        self.assertEqual(self._tags(iservice.store), [("m-1", "step_progress")])
+
+    def test_message_tag_through_buffer(self):
+        iservice = InMemoryInteractionsService()
+        with EventWriteBuffer(iservice) as buffer:
+            iservice.tag_buffer = buffer
+            tag_saved = iservice.save_message(
+                _message("m-1", "t-1", 0), virtual_thread_id="vt"
+            )
+        assert tag_saved is not None
+        self.assertIn(tag_saved.result(), iservice.store.events)
+        self.assertEqual(
+            self._tags(iservice.store), [("m-1", VirtualThread.EVENT_TYPE)]
+        )
+
+    def test_failed_message_tag_through_buffer(self):
+        iservice = InMemoryInteractionsService(_StoreRejectingTags())
+        with EventWriteBuffer(iservice) as buffer:
+            iservice.tag_buffer = buffer
+            tag_saved = iservice.save_message(
+                _message("m-1", "t-1", 0), virtual_thread_id="vt"
+            )
+        assert tag_saved is not None
+        self.assertIsInstance(tag_saved.exception(), HTTPError)
+        self.assertIn("m-1", iservice.store.messages)
+
+
+class _StoreRejectingTags(InMemoryInteractionStore):
+    def handle(self, method, path, body=None):
+        if body and body.get("type") == VirtualThread.EVENT_TYPE:
+            return 503, {"error": "unavailable"}
+        return super().handle(method, path, body)
+
+
+class _StoreWithoutIdSearches(InMemoryInteractionStore):
+    def __init__(self, status=501):
+        super().__init__()
+        self.status = status
+
+    def handle(self, method, path, body=None):
+        if self.status is not None and body and "ids" in body:
+            return self.status, {"error": "Searches by ids aren't supported"}
+        return super().handle(method, path, body)
+
+
+class TestMultiGet(unittest.TestCase):
+    def setUp(self):
+        self.store = self._store(InMemoryInteractionStore())
+
+    def _store(self, store):
+        iservice = InMemoryInteractionsService(store)
+        for m in range(5):
+            iservice.save_message(_message(f"m-{m}", "t-1", m))
+        self.event_ids = [
+            iservice.save_event(_event("step_progress", message_id=f"m-{m}"))
+            for m in range(5)
+        ]
+        return store
+
+    def _search_requests(self, iservice, fetch):
+        with patch.object(
+            iservice, "_request", wraps=iservice._request
+        ) as request_mock:
+            results = fetch()
+        return results, [c.args[2] for c in request_mock.call_args_list]
+
+    def test_batched_searches(self):
+        iservice = InMemoryInteractionsService(self.store, max_batch_size=2)
+        ids = ["m-4", "m-missing", "m-0", "m-1", "m-2"]
+        messages, requests = self._search_requests(
+            iservice, lambda: iservice.get_messages(ids)
+        )
+        self.assertEqual(list(messages), ids)
+        self.assertIs(messages["m-missing"], MISSING)
+        self.assertEqual(messages["m-4"].text, "text of m-4")  # type: ignore[union-attr]
+        self.assertEqual(messages["m-0"].thread_id, "t-1")  # type: ignore[union-attr]
+        self.assertEqual(
+            [r["ids"] for r in requests],
+            [["m-4", "m-missing"], ["m-0", "m-1"], ["m-2"]],
+        )
+        self.assertTrue(iservice.batch_reads)
+        iservice.close()
+
+    def test_falls_back_to_single_searches(self):
+        # Stores that don't know the ids filter reject it in different ways
+        for status in [400, 422, 501]:
+            with self.subTest(status=status):
+                iservice = InMemoryInteractionsService(
+                    self._store(_StoreWithoutIdSearches(status))
+                )
+                ids = self.event_ids[:2] + ["e-missing"]
+                events, requests = self._search_requests(
+                    iservice, lambda: iservice.get_events(ids)
+                )
+                self.assertFalse(iservice.batch_reads)
+                self.assertEqual(
+                    [e.event_id if e is not MISSING else e for e in events.values()],  # type: ignore[union-attr]
+                    self.event_ids[:2] + [MISSING],
+                )
+                self.assertEqual(len(requests), 4)
+                iservice.close()
+
+    def test_invalid_searches_are_raised(self):
+        store = self._store(_StoreWithoutIdSearches(status=None))
+        iservice = InMemoryInteractionsService(store)
+        iservice.get_events(self.event_ids[:2])
+        self.assertTrue(iservice.batch_reads)
+        # Once searches by ids have worked, a rejected one is an error
+        store.status = 422
+        with self.assertRaises(HTTPError):
+            iservice.get_events(self.event_ids[:2])
+        self.assertTrue(iservice.batch_reads)
+        iservice.close()
+
+    def test_cached(self):
+        iservice = InMemoryInteractionsService(self.store, cache=InteractionsCache())
+        iservice.get_event(self.event_ids[0])
+        events, requests = self._search_requests(
+            iservice, lambda: iservice.get_events(self.event_ids[:2])
+        )
+        self.assertEqual([r["ids"] for r in requests], [self.event_ids[1:2]])
+        _, requests = self._search_requests(
+            iservice, lambda: iservice.get_events(self.event_ids[:2])
+        )
+        self.assertEqual(requests, [])
+
+
+class TestProjection(unittest.TestCase):
+    def setUp(self):
+        self.iservice = InMemoryInteractionsService()
+        for m in range(3):
+            message = _message(f"m-{m}", "t-1", m)
+            message.text = "long text " * 100
+            self.iservice.save_message(message)
+            self.iservice.save_event(
+                _event("step_progress", message_id=f"m-{m}", data={"step": m})
+            )
+
+    def test_thread_lookup(self):
+        thread = self.iservice.fetch_thread_messages_and_events_for_message(
+            "m-0", event_types=["step_progress"], projection=IDS_AND_EVENT_DATA
+        )
+        self.assertEqual([m.message_id for m in thread.messages], ["m-0", "m-1", "m-2"])
+        self.assertIsNone(thread.messages[2].text)
+        self.assertIsNone(thread.messages[2].annotated_text)
+        self.assertEqual(thread.messages[2].events[0].data, {"step": 2})
+
+    def test_request_and_response(self):
+        def fetch(projection):
+            with patch.object(
+                self.iservice, "_request", wraps=self.iservice._request
+            ) as request_mock:
+                self.iservice.fetch_all_by_thread(
+                    "t-1", event_types=["step_progress"], projection=projection
+                )
+            (call,) = request_mock.call_args_list
+            return call.args[2], self.iservice._request(*call.args).content
+
+        full_request, full_response = fetch(None)
+        self.assertNotIn("fields", full_request["relations"]["messages"])
+        self.assertEqual(
+            full_request,
+            InteractionsService._fetch_all_by_thread_request(
+                "t-1", event_types=["step_progress"]
+            ),
+        )
+
+        request, response = fetch(IDS_AND_EVENT_DATA)
+        messages_query = request["relations"]["messages"]
+        self.assertEqual(messages_query["fields"], ["message_id", "actor_id", "ts"])
+        self.assertNotIn("apply_annotations_from_actors", messages_query)
+        self.assertEqual(list(messages_query["relations"]), ["events"])
+        self.assertIn("data", messages_query["relations"]["events"]["fields"])
+        self.assertLess(len(response), len(full_response) / 3)
+        self.assertNotIn(b"long text", response)
+        self.assertIn(b'"step"', response)
+
+    def test_projected_fields_are_returned(self):
+        projection = Projection(message_fields=("text",), event_fields=())
+        message = self.iservice.fetch_events_for_message("m-1", projection=projection)[
+            "message"
+        ]
+        self.assertTrue(message["text"].startswith("long text"))
+        self.assertNotIn("annotated_text", message)
+        self.assertNotIn("thread_id", message)
+        self.assertEqual(message["events"][0]["type"], "step_progress")
+        self.assertNotIn("data", message["events"][0])
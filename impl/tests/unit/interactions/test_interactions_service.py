@@ -1,3 +1,5 @@
+import threading
+import time
 import unittest
 from datetime import datetime
 from uuid import uuid4
@@ -6,6 +8,7 @@ from unittest.mock import call, patch, MagicMock
 
 from nora_lib.impl.interactions.interactions_service import (
     InteractionsService,
+    PoolConfig,
     RetryConfig,
 )
 from nora_lib.impl.interactions.models import Channel, Event, Surface
@@ -47,7 +50,7 @@ class TestInteractionsService(unittest.TestCase):
             )
         return expected_calls
 
-    @patch("requests.request")
+    @patch("requests.Session.request")
     def test_retries_default(self, req_mock):
         # Don't change anything about the retry config
         iservice = InteractionsService("somewhere")
@@ -85,7 +88,7 @@ class TestInteractionsService(unittest.TestCase):
             )
             req_mock.reset_mock()
 
-    @patch("requests.request")
+    @patch("requests.Session.request")
     def test_some_retries(self, req_mock):
         # Here, test with 3 tries (so 2 retries)
         iservice = InteractionsService("somewhere", retry_config=RetryConfig(tries=3))
@@ -127,24 +130,26 @@ class TestInteractionsService(unittest.TestCase):
 
         # even if we have a success coming up, if we hit a non-retryable error first,
         # we won't get there
+        # (501 Not Implemented included)
         event_id_non_retryable = "3"
-        req_mock.side_effect = [
-            TestInteractionsService._mk_response(400, None),
-            TestInteractionsService._mk_response(
-                200, TestInteractionsService._mk_event(event_id_non_retryable)
-            ),
-        ]
-        with self.assertRaises(HTTPError) as exc3:
-            iservice.get_event(event_id_non_retryable)
-        self.assertIn("400", str(exc3.exception))
-        # just one call
-        self.assertEqual(
-            req_mock.mock_calls,
-            TestInteractionsService._mk_expected_calls(
-                event_id_non_retryable, num_calls=1
-            ),
-        )
-        req_mock.reset_mock()
+        for error_status in [400, 501]:
+            req_mock.side_effect = [
+                TestInteractionsService._mk_response(error_status, None),
+                TestInteractionsService._mk_response(
+                    200, TestInteractionsService._mk_event(event_id_non_retryable)
+                ),
+            ]
+            with self.assertRaises(HTTPError) as exc3:
+                iservice.get_event(event_id_non_retryable)
+            self.assertIn(str(error_status), str(exc3.exception))
+            # just one call
+            self.assertEqual(
+                req_mock.mock_calls,
+                TestInteractionsService._mk_expected_calls(
+                    event_id_non_retryable, num_calls=1
+                ),
+            )
+            req_mock.reset_mock()
 
         # if we get to 3 failures, we won't succeed
         event_id_exhaust_failures = "4"
@@ -176,7 +181,7 @@ class TestInteractionsService(unittest.TestCase):
             resp.json = MagicMock(return_value=channel_dict)  # type: ignore
         return resp
 
-    @patch("requests.request")
+    @patch("requests.Session.request")
     def test_save_channel(self, req_mock):
         iservice = InteractionsService("somewhere")
         channel = Channel(
@@ -210,7 +215,7 @@ class TestInteractionsService(unittest.TestCase):
             iservice.save_channel(channel)
         self.assertIn("400", str(exc.exception))
 
-    @patch("requests.request")
+    @patch("requests.Session.request")
     def test_get_channel(self, req_mock):
         iservice = InteractionsService("somewhere")
         channel_dict = {
@@ -252,7 +257,7 @@ class TestInteractionsService(unittest.TestCase):
             iservice.get_channel("missing")
         self.assertIn("404", str(exc.exception))
 
-    @patch("requests.request")
+    @patch("requests.Session.request")
     def test_get_channel_by_context(self, req_mock):
         iservice = InteractionsService("somewhere")
         channel_dict = {
@@ -294,3 +299,162 @@ class TestInteractionsService(unittest.TestCase):
         with self.assertRaises(HTTPError) as exc:
             iservice.get_channel_by_context("missing")
         self.assertIn("404", str(exc.exception))
+
+    def test_sessions_share_connection_pool(self):
+        iservice = InteractionsService("somewhere")
+
+        # Each thread gets its own session, all mounted on the same adapter
+        sessions = []
+        thread = threading.Thread(target=lambda: sessions.append(iservice._session()))
+        thread.start()
+        thread.join()
+        main_session = iservice._session()
+        self.assertIs(main_session, iservice._session())
+        self.assertIsNot(main_session, sessions[0])
+        for session in [main_session, sessions[0]]:
+            self.assertIs(session.get_adapter("http://somewhere"), iservice._adapter)
+            self.assertIs(session.get_adapter("https://somewhere"), iservice._adapter)
+
+    @patch("requests.Session.request")
+    def test_pool_config_timeouts(self, req_mock):
+        iservice = InteractionsService(
+            "somewhere",
+            pool_config=PoolConfig(connect_timeout=2, keep_alive=False),
+        )
+        req_mock.side_effect = [
+            TestInteractionsService._mk_response(
+                200, TestInteractionsService._mk_event("1")
+            )
+        ]
+        iservice.get_event("1")
+        # Read timeout falls back to the service timeout
+        self.assertEqual(req_mock.call_args.kwargs["timeout"], (2, 30))
+        self.assertEqual(iservice._session().headers["Connection"], "close")
+
+    @staticmethod
+    def _mk_json_response(status_code, body):
+        resp = Response()
+        resp.status_code = status_code
+        resp.json = MagicMock(return_value=body)  # type: ignore
+        return resp
+
+    @patch("requests.Session.request")
+    def test_save_events_batch(self, req_mock):
+        iservice = InteractionsService("somewhere", max_batch_size=2)
+        events = [TestInteractionsService._mk_event(None) for _ in range(3)]
+        first_batch = {"events": [events[0].model_dump(), events[1].model_dump()]}
+        req_mock.side_effect = [
+            TestInteractionsService._mk_json_response(200, {"event_ids": ["1", "2"]}),
+            TestInteractionsService._mk_json_response(200, {"event_ids": ["3"]}),
+        ]
+        results = iservice.save_events(events)
+        self.assertEqual([r.id for r in results], ["1", "2", "3"])
+        self.assertTrue(all(r.ok for r in results))
+        self.assertEqual([e.event_id for e in events], ["1", "2", "3"])
+        self.assertEqual(
+            req_mock.call_args_list[0].kwargs["url"],
+            "somewhere/interaction/v1/event/batch",
+        )
+        self.assertEqual(
+            req_mock.call_args_list[0].kwargs["json"], first_batch
+        )
+
+    @patch("requests.Session.request")
+    def test_save_events_fallback(self, req_mock):
+        iservice = InteractionsService("somewhere")
+        events = [TestInteractionsService._mk_event(None) for _ in range(3)]
+        for i, event in enumerate(events):
+            event.text = str(i)
+        responses = {
+            "batch": TestInteractionsService._mk_json_response(404, {}),
+            "0": TestInteractionsService._mk_json_response(200, {"event_id": "1"}),
+            "1": TestInteractionsService._mk_json_response(400, {}),
+            "2": TestInteractionsService._mk_json_response(200, {"event_id": "3"}),
+        }
+        req_mock.side_effect = lambda **kwargs: (
+            responses["batch"]
+            if kwargs["url"].endswith("/batch")
+            else responses[kwargs["json"]["text"]]
+        )
+
+        results = iservice.save_events(events)
+        self.assertEqual([r.id for r in results], ["1", None, "3"])
+        self.assertIsInstance(results[1].error, HTTPError)
+        # The store doesn't support batches, so don't try again
+        self.assertFalse(iservice.batch_writes)
+        req_mock.reset_mock()
+        iservice.save_messages([])
+        iservice.save_events([events[0].model_copy(update={"event_id": None})])
+        self.assertEqual(
+            [c.kwargs["url"] for c in req_mock.call_args_list],
+            ["somewhere/interaction/v1/event"],
+        )
+
+    @patch("requests.Session.request")
+    def test_concurrent_identical_reads_are_coalesced(self, req_mock):
+        iservice = InteractionsService("somewhere", coalesce_reads=True)
+        release = threading.Event()
+
+        def respond(**kwargs):
+            release.wait(timeout=5)
+            return TestInteractionsService._mk_json_response(
+                200, {"thread_id": kwargs["json"]["id"]}
+            )
+
+        req_mock.side_effect = respond
+        results = []
+
+        def fetch(thread_id):
+            results.append(iservice.fetch_all_by_thread(thread_id, most_recent=5))
+
+        threads = [
+            threading.Thread(target=fetch, args=(thread_id,))
+            for thread_id in ["t-1"] * 4 + ["t-2"]
+        ]
+        for thread in threads:
+            thread.start()
+        while req_mock.call_count < 2:
+            time.sleep(0.01)
+        # Give the remaining callers time to join the in-flight requests
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        # One request per distinct body, and every caller gets the result
+        self.assertEqual(req_mock.call_count, 2)
+        self.assertEqual(
+            sorted(r["thread_id"] for r in results), ["t-1"] * 4 + ["t-2"]
+        )
+
+    @patch("requests.Session.request")
+    def test_iter_channel_threads(self, req_mock):
+        iservice = InteractionsService("somewhere")
+
+        def thread(i):
+            return {
+                "thread_id": f"t-{i}",
+                "created_at": datetime(2024, 1, 1, i).isoformat(),
+                "status": "Active",
+            }
+
+        pages = [[thread(5), thread(4)], [thread(3), thread(2)], [thread(1)]]
+        req_mock.side_effect = [
+            TestInteractionsService._mk_json_response(
+                200, {"channel": {"threads": page}}
+            )
+            for page in pages
+        ]
+        threads = list(iservice.iter_channel_threads("c-1", page_size=2))
+        self.assertEqual(
+            [t.thread_id for t in threads], ["t-5", "t-4", "t-3", "t-2", "t-1"]
+        )
+        thread_queries = [
+            c.kwargs["json"]["relations"]["threads"]["filter"]
+            for c in req_mock.call_args_list
+        ]
+        self.assertEqual([q["most_recent"] for q in thread_queries], [2, 2, 2])
+        self.assertEqual(
+            [q["before_timestamp"] for q in thread_queries],
+            [None, "2024-01-01T04:00:00", "2024-01-01T02:00:00"],
+        )
@@ -0,0 +1,71 @@
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
+
+from requests import Response
+
+from nora_lib.impl.interactions.interactions_service import (
+    InteractionsService,
+    RetryConfig,
+)
+from nora_lib.impl.interactions.metrics import Histogram, InMemoryMetrics
+
+
+def _response(status_code, body=None):
+    resp = Response()
+    resp.status_code = status_code
+    resp._content = b"{}"
+    resp.json = MagicMock(return_value=body)  # type: ignore
+    return resp
+
+
+class TestMetrics(unittest.TestCase):
+    @patch("requests.Session.request")
+    def test_service_records_metrics(self, req_mock):
+        metrics = InMemoryMetrics()
+        iservice = InteractionsService(
+            "http://store",
+            retry_config=RetryConfig(tries=2, delay=0, jitter=0),
+            metrics=metrics,
+        )
+        event = {
+            "event_id": "e-1",
+            "type": "step_progress",
+            "actor_id": str(uuid4()),
+            "timestamp": datetime.now().isoformat(),
+        }
+        req_mock.side_effect = [_response(503), _response(200, {"events": [event]})]
+        self.assertEqual(iservice.get_event("e-1").event_id, "e-1")
+
+        labels = (("method", "post"), ("endpoint", "/interaction/v1/search/event"))
+        self.assertEqual(metrics.request_seconds[labels].count, 2)
+        self.assertEqual(metrics.requests[labels + (("status", "503"),)], 1)
+        self.assertEqual(metrics.requests[labels + (("status", "200"),)], 1)
+        self.assertEqual(metrics.response_bytes[labels], 4)
+        self.assertEqual(metrics.retries[labels], 1)
+        self.assertEqual(metrics.validation_seconds[(("model", "Event"),)].count, 1)
+
+        text = metrics.prometheus_text()
+        self.assertIn("# TYPE nora_interactions_request_seconds histogram", text)
+        self.assertIn(
+            'nora_interactions_requests_total{method="post",'
+            'endpoint="/interaction/v1/search/event",status="503"} 1',
+            text,
+        )
+        self.assertIn(
+            'nora_interactions_request_seconds_bucket{method="post",'
+            'endpoint="/interaction/v1/search/event",le="+Inf"} 2',
+            text,
+        )
+        self.assertIn(
+            'nora_interactions_validation_seconds_count{model="Event"} 1', text
+        )
+
+    def test_histogram(self):
+        histogram = Histogram([0.1, 1.0])
+        for value in [0.05, 0.1, 0.5, 5.0]:
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative_counts(), [2, 3, 4])
+        self.assertEqual(histogram.quantile(0.5), 0.1)
+        self.assertEqual(histogram.quantile(0.99), float("inf"))
@@ -0,0 +1,194 @@
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from uuid import uuid4
+
+from nora_lib.impl.interactions.in_memory import (
+    InMemoryInteractionStore,
+    InMemoryInteractionsService,
+)
+from nora_lib.impl.interactions.models import Event, Message, Surface
+from nora_lib.impl.interactions.snapshots import ThreadSnapshotStore
+from nora_lib.impl.interactions.thread_sync import ThreadSync
+
+ACTOR = uuid4()
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _message(message_id, minutes, thread_id="t-1"):
+    return Message(
+        message_id=message_id,
+        actor_id=ACTOR,
+        text=f"text of {message_id}",
+        thread_id=thread_id,
+        channel_id="c-1",
+        surface=Surface.WEB,
+        ts=T0 + timedelta(minutes=minutes),
+    )
+
+
+def _event(message_id, step):
+    return Event(
+        type="step_progress",
+        actor_id=ACTOR,
+        timestamp=T0,
+        message_id=message_id,
+        data={"step": step},
+    )
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestThreadSnapshotStore(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "snapshots.db")
+        self.clock = _Clock()
+        self.store = InMemoryInteractionStore()
+        self.iservice = self._service()
+        for m in range(5):
+            self.iservice.save_message(_message(f"m-{m}", m))
+        self.iservice.save_event(_event("m-0", 0))
+
+    def _service(self):
+        snapshots = ThreadSnapshotStore(self.path, clock=self.clock)
+        self.addCleanup(snapshots.close)
+        return InMemoryInteractionsService(self.store, snapshots=snapshots)
+
+    def _fetch(self, iservice, **kwargs):
+        with patch.object(
+            iservice, "_request", wraps=iservice._request
+        ) as request_mock:
+            thread = iservice.fetch_all_by_thread("t-1", **kwargs)["thread"]
+        requests = [c.args[2] for c in request_mock.call_args_list]
+        return thread, [r["relations"]["messages"]["filter"] for r in requests]
+
+    def _ids(self, thread):
+        return [m["message_id"] for m in thread["messages"]]
+
+    def test_reads_are_topped_up_with_deltas(self):
+        thread, filters = self._fetch(self.iservice)
+        self.assertEqual(self._ids(thread), [f"m-{m}" for m in range(5)])
+        self.assertIsNone(filters[0]["min_timestamp"])
+
+        self.iservice.save_message(_message("m-5", 5))
+        thread, filters = self._fetch(self.iservice)
+        self.assertEqual(self._ids(thread), [f"m-{m}" for m in range(6)])
+        self.assertEqual(
+            filters[0]["min_timestamp"],
+            (T0 + timedelta(minutes=4, seconds=-5)).isoformat(),
+        )
+        snapshot = self.iservice.snapshots.get("t-1")  # type: ignore[union-attr]
+        self.assertEqual(snapshot.watermark, T0 + timedelta(minutes=5))  # type: ignore[union-attr]
+        self.assertEqual(snapshot.version, 2)  # type: ignore[union-attr]
+        self.assertEqual(thread["messages"][0]["events"][0]["data"], {"step": 0})
+
+        # Unchanged
+        self._fetch(self.iservice)
+        self.assertEqual(self.iservice.snapshots.get("t-1").version, 2)  # type: ignore[union-attr]
+
+        # Filtered reads bypass the snapshot
+        thread, filters = self._fetch(self.iservice, most_recent=2)
+        self.assertEqual(self._ids(thread), ["m-4", "m-5"])
+        self.assertEqual(filters[0]["most_recent"], 2)
+
+    def test_writes_rewind_the_watermark(self):
+        self._fetch(self.iservice)
+        self.iservice.save_event(_event("m-1", 1))
+        thread, filters = self._fetch(self.iservice)
+        self.assertEqual(
+            filters[0]["min_timestamp"],
+            (T0 + timedelta(minutes=1, seconds=-5)).isoformat(),
+        )
+        self.assertEqual(
+            [e["data"] for e in thread["messages"][1]["events"]], [{"step": 1}]
+        )
+
+        self.iservice.delete_thread("t-1")
+        self.assertIsNone(self.iservice.snapshots.get("t-1"))  # type: ignore[union-attr]
+
+    def test_write_during_a_delta_fetch(self):
+        self._fetch(self.iservice)
+        snapshots = self.iservice.snapshots
+        assert snapshots is not None
+
+        def fetch(min_timestamp):
+            response = self.iservice.fetch_all_by_thread(
+                "t-1", min_timestamp=min_timestamp
+            )
+            # Saved after the delta was read, e.g. by another process
+            self.iservice.save_event(_event("m-1", 1))
+            return response
+
+        snapshots.fetch("t-1", fetch)
+        self.assertEqual(
+            snapshots.get("t-1").watermark, T0 + timedelta(minutes=1)  # type: ignore[union-attr]
+        )
+        thread, _ = self._fetch(self.iservice)
+        self.assertEqual(
+            [e["data"] for e in thread["messages"][1]["events"]], [{"step": 1}]
+        )
+
+    def test_shared_between_services(self):
+        self._fetch(self.iservice)
+        thread, filters = self._fetch(self._service())
+        self.assertEqual(self._ids(thread), [f"m-{m}" for m in range(5)])
+        self.assertIsNotNone(filters[0]["min_timestamp"])
+
+    def test_old_snapshots_are_refetched(self):
+        self._fetch(self.iservice, event_types=["step_progress"])
+        # Deleted without going through the service
+        self.store.messages.pop("m-2")
+        self.store._messages_by_thread["t-1"].remove("m-2")
+        thread, _ = self._fetch(self.iservice, event_types=["step_progress"])
+        self.assertIn("m-2", self._ids(thread))
+
+        self.clock.now += 301
+        thread, filters = self._fetch(self.iservice, event_types=["step_progress"])
+        self.assertIsNone(filters[0]["min_timestamp"])
+        self.assertNotIn("m-2", self._ids(thread))
+        self.assertEqual(self.iservice.snapshots.stats.full_fetches, 2)  # type: ignore[union-attr]
+        # Snapshots are kept per set of event types
+        self.assertIsNone(self.iservice.snapshots.get("t-1"))  # type: ignore[union-attr]
+
+    def test_concurrent_merges(self):
+        services = [self._service() for _ in range(4)]
+        errors = []
+
+        def read(iservice, worker):
+            try:
+                for m in range(5):
+                    iservice.save_message(_message(f"w-{worker}-{m}", 10 + m))
+                    iservice.fetch_all_by_thread("t-1")
+            except Exception as e:
+                errors.append(e)
+
+        threads = [
+            threading.Thread(target=read, args=(iservice, worker))
+            for worker, iservice in enumerate(services)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        thread, _ = self._fetch(self.iservice)
+        self.assertEqual(len(thread["messages"]), 25)
+
+    def test_thread_sync_starts_from_snapshot(self):
+        self._fetch(self.iservice)
+        iservice = self._service()
+        sync = ThreadSync(iservice, "t-1")
+        self.assertEqual(len(sync.refresh()), 5)
+        self.assertEqual(iservice.snapshots.stats.deltas, 1)  # type: ignore[union-attr]
+        self.assertEqual(iservice.snapshots.stats.full_fetches, 0)  # type: ignore[union-attr]
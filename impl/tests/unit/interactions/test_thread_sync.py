@@ -0,0 +1,100 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+from uuid import uuid4
+
+from nora_lib.impl.interactions.thread_sync import ThreadSync
+
+ACTOR = str(uuid4())
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _message(message_id, minutes, events=()):
+    return {
+        "message_id": message_id,
+        "actor_id": ACTOR,
+        "text": message_id,
+        "ts": (T0 + timedelta(minutes=minutes)).isoformat(),
+        "events": list(events),
+    }
+
+
+def _event(event_id, minutes, data=None):
+    return {
+        "event_id": event_id,
+        "type": "step_progress",
+        "actor_id": ACTOR,
+        "timestamp": T0.isoformat(),
+        "created_at": T0.isoformat(),
+        "updated_at": (T0 + timedelta(minutes=minutes)).isoformat(),
+        "data": data or {},
+    }
+
+
+class TestThreadSync(unittest.TestCase):
+    def test_refresh_fetches_and_merges_deltas(self):
+        iservice = MagicMock()
+        iservice.fetch_all_by_thread.side_effect = [
+            {"thread": {"messages": [_message("m-1", 0), _message("m-2", 1)]}},
+            {
+                "thread": {
+                    "messages": [
+                        _message("m-2", 1, [_event("e-1", 2, {"step": 1})]),
+                        _message("m-3", 3),
+                    ],
+                    "events": [_event("e-2", 3)],
+                }
+            },
+            {
+                "thread": {
+                    # A stale copy of e-1 shouldn't replace the newer one
+                    "messages": [
+                        _message("m-3", 3),
+                        _message("m-2", 1, [_event("e-1", 0)]),
+                    ],
+                    "events": [],
+                }
+            },
+        ]
+        sync = ThreadSync(iservice, "t-1", event_types=["step_progress"])
+
+        changed = sync.refresh()
+        self.assertEqual([m.message_id for m in changed], ["m-1", "m-2"])
+        self.assertIsNone(
+            iservice.fetch_all_by_thread.call_args.kwargs["min_timestamp"]
+        )
+
+        changed = sync.refresh()
+        self.assertEqual(
+            iservice.fetch_all_by_thread.call_args.kwargs,
+            {
+                "min_timestamp": (T0 + timedelta(minutes=1, seconds=-5)).isoformat(),
+                "event_types": ["step_progress"],
+                "min_event_timestamp": None,
+            },
+        )
+        self.assertEqual([m.message_id for m in changed], ["m-2", "m-3"])
+        self.assertEqual([e.event_id for e in sync.events], ["e-2"])
+
+        changed = sync.refresh()
+        # Thread events are only fetched if they changed since e-2
+        self.assertEqual(
+            iservice.fetch_all_by_thread.call_args.kwargs["min_event_timestamp"],
+            (T0 + timedelta(minutes=3, seconds=-5)).isoformat(),
+        )
+        self.assertEqual(changed, [])
+        self.assertEqual([m.message_id for m in sync.messages], ["m-1", "m-2", "m-3"])
+        self.assertEqual(sync.messages[1].events[0].data, {"step": 1})
+        self.assertEqual(sync.watermark, T0 + timedelta(minutes=3))
+
+    def test_lock_is_not_held_while_fetching(self):
+        iservice = MagicMock()
+        sync = ThreadSync(iservice, "t-1")
+
+        def fetch(*args, **kwargs):
+            self.assertFalse(sync._lock.locked())
+            return {"thread": {"messages": [_message("m-1", 0)]}}
+
+        iservice.fetch_all_by_thread.side_effect = fetch
+        sync.refresh()
+        self.assertEqual([m.message_id for m in sync.messages], ["m-1"])
@@ -0,0 +1,96 @@
+import unittest
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from nora_lib.impl.interactions.models import Event, ReturnedMessage
+from nora_lib.impl.interactions.views import ChannelView, MessageView, ThreadView
+
+ACTOR = str(uuid4())
+TS = datetime(2024, 1, 1, tzinfo=timezone.utc).isoformat()
+
+
+def _event(event_id):
+    return {
+        "event_id": event_id,
+        "type": "step_progress",
+        "actor_id": ACTOR,
+        "timestamp": TS,
+    }
+
+
+def _message(message_id, events):
+    return {
+        "message_id": message_id,
+        "actor_id": ACTOR,
+        "text": f"text of {message_id}",
+        "ts": TS,
+        "events": events,
+    }
+
+
+class TestViews(unittest.TestCase):
+    def test_thread_view_is_lazy(self):
+        response = {
+            "thread": {
+                "thread_id": "t-1",
+                "messages": [
+                    _message("m-1", [_event("e-1")]),
+                    # Invalid, but never validated because it isn't accessed
+                    _message("m-2", [{"event_id": "bad"}]),
+                ],
+            }
+        }
+        thread = ThreadView.from_response(response)
+        self.assertEqual(thread.thread_id, "t-1")
+        self.assertEqual(len(thread.messages), 2)
+        self.assertEqual(thread.messages[1].text, "text of m-2")
+
+        message = thread.messages[0]
+        self.assertIs(message, thread.messages[-2])
+        event = message.events[0]
+        self.assertIsInstance(event, Event)
+        self.assertEqual(event.event_id, "e-1")
+        # Built once and then cached
+        self.assertIs(event, message.events[0])
+        self.assertEqual(message.ts, datetime(2024, 1, 1, tzinfo=timezone.utc))
+        self.assertEqual(str(message.actor_id), ACTOR)
+        self.assertEqual(len(thread.events), 0)
+
+        with self.assertRaises(Exception):
+            thread.messages[1].events[0]
+
+    def test_message_view(self):
+        raw = _message("m-1", [])
+        raw["thread"] = {"thread_id": "t-1"}
+        raw["channel"] = {"channel_id": "c-1"}
+        raw["extra"] = 1
+        message = MessageView.from_response({"message": raw})
+        self.assertEqual((message.thread_id, message.channel_id), ("t-1", "c-1"))
+        self.assertEqual(message.thread.thread_id, "t-1")  # type: ignore[union-attr]
+        # Fields without a typed accessor fall back to the raw JSON
+        self.assertEqual(message.extra, 1)
+        with self.assertRaises(AttributeError):
+            message.not_a_field
+
+        model = message.to_model()
+        self.assertIsInstance(model, ReturnedMessage)
+        self.assertEqual((model.thread_id, model.channel_id), ("t-1", "c-1"))
+
+        # Text left out of a projection is None, as in the model
+        del raw["text"]
+        projected = MessageView(raw)
+        self.assertIsNone(projected.text)
+        self.assertIsNone(projected.to_model().text)
+
+    def test_channel_view(self):
+        channel = ChannelView.from_response(
+            {
+                "channel": {
+                    "channel_id": "c-1",
+                    "threads": [{"thread_id": "t-1", "messages": []}],
+                }
+            }
+        )
+        self.assertEqual(channel.channel_id, "c-1")
+        self.assertEqual([t.thread_id for t in channel.threads], ["t-1"])
+        self.assertEqual(channel.threads[0].to_model().thread_id, "t-1")
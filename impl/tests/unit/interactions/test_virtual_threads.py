@@ -0,0 +1,187 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from uuid import uuid4
+
+from nora_lib.impl.interactions.in_memory import InMemoryInteractionsService
+from nora_lib.impl.interactions.models import Event, Message, Surface, VirtualThread
+from nora_lib.impl.interactions.projection import IDS_AND_EVENT_DATA
+
+ACTOR = uuid4()
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _message(i):
+    return Message(
+        message_id=f"m-{i}",
+        actor_id=ACTOR,
+        text=f"text of m-{i}",
+        thread_id="t-1",
+        channel_id="c-1",
+        surface=Surface.WEB,
+        ts=T0 + timedelta(minutes=i),
+    )
+
+
+def _event(event_type, i):
+    return Event(
+        type=event_type,
+        actor_id=ACTOR,
+        timestamp=T0 + timedelta(minutes=i),
+        message_id=f"m-{i}",
+    )
+
+
+class TestVirtualThreadContent(unittest.TestCase):
+    def setUp(self):
+        self.iservice = InMemoryInteractionsService()
+        for i in range(250):
+            self.iservice.save_message(
+                _message(i), virtual_thread_id="vt" if i % 50 == 0 else None
+            )
+        self.iservice.save_event(_event("step_progress", 100), virtual_thread_id="vt")
+        self.iservice.save_event(_event("other", 100))
+        self.iservice.save_event(_event("step_progress", 120), virtual_thread_id="vt")
+
+    def _searched_ids(self, request_mock):
+        return [
+            c.args[2].get("id") or c.args[2]["ids"]
+            for c in request_mock.call_args_list
+            if c.args[1].endswith("/search/message")
+        ]
+
+    def test_full_history(self):
+        content = self.iservice.get_virtual_thread_content("m-249", "vt")
+        self.assertEqual(
+            [m.message_id for m in content],
+            ["m-0", "m-50", "m-100", "m-120", "m-150", "m-200"],
+        )
+        self.assertEqual(content[0].text, "text of m-0")
+        self.assertEqual(content[0].thread_id, "t-1")
+        self.assertEqual([e.type for e in content[2].events], ["step_progress"])
+        # Only an event on m-120 is in the virtual thread
+        self.assertEqual(content[3].text, "")
+
+        # Messages after the given one are left out
+        content = self.iservice.get_virtual_thread_content("m-60", "vt")
+        self.assertEqual([m.message_id for m in content], ["m-0", "m-50"])
+
+    def test_only_tagged_messages_are_fetched(self):
+        with patch.object(
+            self.iservice, "_request", wraps=self.iservice._request
+        ) as request_mock:
+            self.iservice.get_virtual_thread_content("m-249", "vt")
+        # The tagged messages are fetched in one search
+        self.assertEqual(
+            self._searched_ids(request_mock),
+            ["m-249", ["m-0", "m-50", "m-100", "m-120", "m-150", "m-200"]],
+        )
+
+    def test_incremental_refresh(self):
+        self.iservice.get_virtual_thread_content("m-249", "vt")
+        index = self.iservice.virtual_thread_index("t-1")
+        self.assertEqual(index.watermark, T0 + timedelta(minutes=249))
+
+        # A tag saved through the service is indexed without a refresh
+        self.iservice.save_message(_message(250), virtual_thread_id="vt")
+        self.assertEqual(
+            index.messages("vt")[-1], ("m-250", {VirtualThread.EVENT_TYPE})
+        )
+
+        # A tag saved elsewhere on a new message is picked up by the next refresh,
+        # which only reads messages from the newest one it has read
+        other = InMemoryInteractionsService(self.iservice.store)
+        other.save_message(_message(251), virtual_thread_id="vt")
+        with patch.object(
+            self.iservice,
+            "fetch_all_by_thread",
+            wraps=self.iservice.fetch_all_by_thread,
+        ) as fetch_mock:
+            content = self.iservice.get_virtual_thread_content("m-251", "vt")
+        self.assertEqual(
+            [m.message_id for m in content][-3:], ["m-200", "m-250", "m-251"]
+        )
+        self.assertEqual(fetch_mock.call_count, 1)
+        self.assertEqual(
+            fetch_mock.call_args.kwargs["min_timestamp"],
+            (T0 + timedelta(minutes=249) - index.overlap).isoformat(),
+        )
+
+    def test_tags_on_older_messages_from_elsewhere(self):
+        now = [0.0]
+        self.iservice.get_virtual_thread_content("m-249", "vt")
+        index = self.iservice.virtual_thread_index("t-1")
+        index.clock = lambda: now[0]
+        index.scanned_at = 0.0
+
+        other = InMemoryInteractionsService(self.iservice.store)
+        other.save_event(_event("step_progress", 10), virtual_thread_id="vt")
+        content = self.iservice.get_virtual_thread_content("m-249", "vt")
+        self.assertNotIn("m-10", [m.message_id for m in content])
+
+        # Picked up by the scan of the whole history once the index is too old
+        now[0] = index.max_age_seconds + 1  # type: ignore[operator]
+        content = self.iservice.get_virtual_thread_content("m-249", "vt")
+        self.assertIn("m-10", [m.message_id for m in content])
+        self.assertEqual(index.scanned_at, now[0])
+
+    def test_index_reads_only_ids_and_tags(self):
+        with patch.object(
+            self.iservice,
+            "fetch_all_by_thread",
+            wraps=self.iservice.fetch_all_by_thread,
+        ) as fetch_mock:
+            self.iservice.virtual_thread_index("t-1").refresh()
+        self.assertEqual(fetch_mock.call_args.kwargs["projection"], IDS_AND_EVENT_DATA)
+
+    def test_without_searches_by_ids(self):
+        store = self.iservice.store
+        handle = store.handle
+
+        def handle_without_ids(method, path, body=None):
+            # As a store that doesn't know the ids filter
+            if body and "ids" in body:
+                return 422, {"error": "Invalid request: KeyError('id')"}
+            return handle(method, path, body)
+
+        with patch.object(store, "handle", side_effect=handle_without_ids):
+            content = self.iservice.get_virtual_thread_content("m-249", "vt")
+        self.assertFalse(self.iservice.batch_reads)
+        self.assertEqual(len(content), 6)
+        self.assertEqual([e.type for e in content[2].events], ["step_progress"])
+
+    def test_pages_of_messages_at_one_timestamp(self):
+        iservice = InMemoryInteractionsService()
+        for i in range(7):
+            # Five messages share the first timestamp
+            message = _message(i).model_copy(
+                update={"ts": T0 + timedelta(minutes=max(i - 4, 0))}
+            )
+            iservice.save_message(message, virtual_thread_id="vt")
+        index = iservice.virtual_thread_index("t-1")
+        index.page_size = 2
+        index.refresh()
+        self.assertEqual(
+            [m for m, _ in index.messages("vt")], [f"m-{i}" for i in range(7)]
+        )
+
+    def test_full_refresh(self):
+        index = self.iservice.virtual_thread_index("t-1")
+        index.refresh()
+        # Tag an old message from another client
+        other = InMemoryInteractionsService(self.iservice.store)
+        other.save_event(_event("step_progress", 10), virtual_thread_id="vt")
+        index.refresh()
+        self.assertNotIn("m-10", [m for m, _ in index.messages("vt")])
+        index.refresh(full=True)
+        self.assertIn("m-10", [m for m, _ in index.messages("vt")])
+
+    def test_index_cache_is_bounded(self):
+        self.iservice.max_virtual_thread_indexes = 2
+        first = self.iservice.virtual_thread_index("t-1")
+        self.iservice.virtual_thread_index("t-2")
+        self.assertIs(self.iservice.virtual_thread_index("t-1"), first)
+        self.iservice.virtual_thread_index("t-3")
+        self.assertIs(self.iservice.virtual_thread_index("t-1"), first)
+        self.assertIsNot(self.iservice.virtual_thread_index("t-2"), first)
+        self.assertEqual(list(self.iservice._virtual_thread_indexes), ["t-1", "t-2"])
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+import unittest
+
+# Heavy dependencies only imported when they are used
+LAZY_MODULES = {"boto3", "botocore", "httpx"}
+
+
+class TestImports(unittest.TestCase):
+    def _imported(self, module):
+        code = f"import sys, {module}; print(' '.join(sys.modules))"
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+            env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        )
+        return {name.split(".")[0] for name in result.stdout.split()}
+
+    def test_heavy_dependencies_are_imported_lazily(self):
+        for module in [
+            "nora_lib.impl.interactions.interactions_service",
+            "nora_lib.impl.tasks.state",
+        ]:
+            self.assertFalse(self._imported(module) & LAZY_MODULES, module)
+
+    def test_models_do_not_import_requests(self):
+        for module in [
+            "nora_lib.progress.models",
+            "nora_lib.impl.context.agent_context",
+        ]:
+            self.assertNotIn("requests", self._imported(module), module)
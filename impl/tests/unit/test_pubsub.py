@@ -0,0 +1,242 @@
+import threading
+import unittest
+from typing import Dict, List, Tuple
+from unittest.mock import patch
+
+import requests
+from requests import Response
+
+from nora_lib.impl.pubsub import (
+    PublisherConfig,
+    PubsubService,
+    SSEEvent,
+    SSEParser,
+    parse_sse,
+)
+
+
+def _response(status):
+    response = Response()
+    response.status_code = status
+    response._content = b"{}"
+    return response
+
+
+class _Backend:
+    """Records publish requests and answers them with the given status codes"""
+
+    def __init__(self, batch_status=200, status=200):
+        self.batch_status = batch_status
+        self.status = status
+        self.requests: List[Tuple[str, dict]] = []
+        self.lock = threading.Lock()
+
+    def post(self, url, body):
+        with self.lock:
+            self.requests.append((url, body))
+        if "/publish/batch/" in url:
+            return _response(self.batch_status)
+        return _response(self.status)
+
+
+class TestPubsubService(unittest.TestCase):
+    def _service(self, backend, **kwargs):
+        pubsub = PubsubService("http://pubsub", namespace="test", **kwargs)
+        patcher = patch.object(pubsub, "_post", backend.post)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(pubsub.close)
+        return pubsub
+
+    def test_publish_without_publisher(self):
+        backend = _Backend(status=503)
+        pubsub = self._service(backend)
+        pubsub.publish("topic", {"a": 1})
+        self.assertEqual(
+            backend.requests,
+            [
+                (
+                    "http://pubsub/publish/test:topic",
+                    {"topic": "test:topic", "payload": {"a": 1}},
+                )
+            ],
+        )
+        stats = pubsub.publish_stats()
+        self.assertEqual((stats.published, stats.failed, stats.delivered), (1, 1, 0))
+
+    def test_connection_errors_are_counted(self):
+        pubsub = PubsubService("http://pubsub")
+        self.addCleanup(pubsub.close)
+        with patch.object(
+            pubsub, "_post", side_effect=requests.exceptions.ConnectionError()
+        ):
+            pubsub.publish("topic", {})
+        self.assertEqual(pubsub.publish_stats().failed, 1)
+
+    def test_batches_per_topic(self):
+        backend = _Backend()
+        pubsub = self._service(
+            backend, publisher=PublisherConfig(linger_seconds=10, max_batch_size=3)
+        )
+        for i in range(4):
+            pubsub.publish("a", {"i": i})
+        pubsub.publish("b", {"i": 0})
+        self.assertTrue(pubsub.flush(timeout=5))
+
+        batches: Dict[str, List[List[int]]] = {}
+        for url, body in backend.requests:
+            batches.setdefault(url.rsplit("/", 1)[-1], []).append(
+                [e["payload"]["i"] for e in body["events"]]
+                if "events" in body
+                else [body["payload"]["i"]]
+            )
+        self.assertEqual(batches, {"test:a": [[0, 1, 2], [3]], "test:b": [[0]]})
+        stats = pubsub.publish_stats()
+        self.assertEqual((stats.published, stats.delivered), (5, 5))
+        self.assertEqual((stats.requests, stats.batches), (3, 1))
+
+    def test_linger(self):
+        backend = _Backend()
+        pubsub = self._service(backend, publisher=PublisherConfig(linger_seconds=0.01))
+        pubsub.publish("a", {"i": 0})
+        pubsub.publish("a", {"i": 1})
+        for _ in range(500):
+            if pubsub.publish_stats().delivered == 2:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(len(backend.requests), 1)
+
+    def test_falls_back_without_batch_endpoint(self):
+        backend = _Backend(batch_status=404)
+        pubsub = self._service(backend, publisher=PublisherConfig(linger_seconds=10))
+        for i in range(3):
+            pubsub.publish("a", {"i": i})
+        pubsub.flush(timeout=5)
+        self.assertFalse(pubsub.batch_publish)
+        self.assertEqual(
+            [url for url, _ in backend.requests],
+            ["http://pubsub/publish/batch/test:a"]
+            + ["http://pubsub/publish/test:a"] * 3,
+        )
+        self.assertEqual(pubsub.publish_stats().delivered, 3)
+
+    def test_full_queue_drops_messages(self):
+        backend = _Backend()
+        pubsub = self._service(
+            backend,
+            publisher=PublisherConfig(linger_seconds=10, max_queue_size=2),
+        )
+        for i in range(3):
+            pubsub.publish("a", {"i": i})
+        pubsub.close(timeout=5)
+        stats = pubsub.publish_stats()
+        self.assertEqual((stats.dropped, stats.delivered), (1, 2))
+
+    def test_publish_after_close(self):
+        backend = _Backend()
+        pubsub = self._service(backend, publisher=PublisherConfig(linger_seconds=10))
+        pubsub.publish("a", {"i": 0})
+        pubsub.close(timeout=5)
+        pubsub.publish("a", {"i": 1})
+        self.assertTrue(pubsub.flush(timeout=1))
+        self.assertEqual(len(backend.requests), 2)
+        self.assertEqual(pubsub.publish_stats().delivered, 2)
+
+
+class _Stream:
+    def __init__(self, body, error=None):
+        self.body = body
+        self.error = error
+        self.closed = False
+
+    def iter_lines(self, delimiter):
+        yield from self.body.split(delimiter)
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        self.closed = True
+
+
+class TestSSE(unittest.TestCase):
+    def _parse(self, text, parser=None):
+        return list(parse_sse(iter(text.encode().split(b"\n")), parser or SSEParser()))
+
+    def test_parser(self):
+        parser = SSEParser()
+        events = self._parse(
+            ": comment\r\n"
+            "retry: 2500\n"
+            "id: 1\n"
+            "event: update\n"
+            "data: first\n"
+            "data:second\n"
+            "\n"
+            "id: 2\n"
+            "\n"
+            "data: third\n"
+            "\n"
+            "id: 3\n"
+            "data: cut short",
+            parser,
+        )
+        self.assertEqual(
+            events,
+            [
+                SSEEvent(data="first\nsecond", event="update", id="1"),
+                SSEEvent(data="third", id="2"),
+            ],
+        )
+        self.assertEqual(parser.retry_seconds, 2.5)
+        self.assertEqual(parser.last_event_id, "2")
+
+    def test_reconnects_with_last_event_id(self):
+        pubsub = PubsubService("http://pubsub")
+        self.addCleanup(pubsub.close)
+        streams = [
+            _Stream(
+                b'retry: 250\nid: 1\ndata: {"n": 1}\n\nid: 2\ndata: {"n": 2}\n\n'
+                b"id: 3\ndata:",
+                requests.exceptions.ChunkedEncodingError(),
+            ),
+            _Stream(b'id: 3\ndata: {"n": 3}\n\n'),
+        ]
+        sent_ids = []
+
+        def open_sse(url, last_event_id=None):
+            sent_ids.append(last_event_id)
+            return streams.pop(0)
+
+        with patch.object(pubsub, "_open_sse", open_sse), patch(
+            "nora_lib.impl.pubsub.sleep"
+        ) as sleep_mock:
+            with pubsub.subscribe_sse("topic", last_event_id="0") as messages:
+                received = []
+                for message in messages:
+                    received.append(message)
+                    if len(received) == 3:
+                        break
+                self.assertEqual(messages.last_event_id, "3")
+        self.assertEqual(received, [{"n": 1}, {"n": 2}, {"n": 3}])
+        # The event cut short had an id, but is replayed
+        self.assertEqual(sent_ids, ["0", "2"])
+        # The server's retry interval is used even though it is shorter than ours
+        sleep_mock.assert_called_once_with(0.25)
+
+    def test_server_retry_interval(self):
+        pubsub = PubsubService("http://pubsub")
+        self.addCleanup(pubsub.close)
+        streams = [
+            _Stream(b"retry: 3000\n\n"),
+            _Stream(b'data: {"n": 1}\n\n'),
+            _Stream(b'data: {"n": 2}\n\n'),
+        ]
+        with patch.object(
+            pubsub, "_open_sse", lambda url, last_event_id=None: streams.pop(0)
+        ), patch("nora_lib.impl.pubsub.sleep") as sleep_mock:
+            with pubsub.subscribe_sse("topic") as messages:
+                self.assertEqual(next(messages), {"n": 1})
+                self.assertEqual(next(messages), {"n": 2})
+                # Kept across reconnections
+                self.assertEqual(messages.retry_seconds, 3.0)
+        self.assertEqual([c.args for c in sleep_mock.call_args_list], [(3.0,), (3.0,)])
@@ -0,0 +1,242 @@
+import json
+import queue
+import threading
+import time
+import unittest
+from typing import Any, List, Optional, Tuple
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+from requests import HTTPError, Response
+
+from nora_lib.impl.pubsub import PubsubService
+from nora_lib.impl.subscriptions import SubscriptionManager, TopicIndex
+
+
+class _LiveStream:
+    """An SSE response whose lines are pushed by the test"""
+
+    def __init__(self, topics):
+        self.topics = topics
+        self.lines: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        self.closed = False
+
+    def iter_lines(self, delimiter):
+        while True:
+            line = self.lines.get()
+            if line is None:
+                raise ConnectionResetError()
+            yield line
+
+    def close(self):
+        self.closed = True
+        self.lines.put(None)
+
+
+class _Backend:
+    def __init__(self, multiplexed=True):
+        self.multiplexed = multiplexed
+        self.streams: List[_LiveStream] = []
+        self.lock = threading.Lock()
+        self.next_id = 0
+
+    def open_sse(self, url, last_event_id=None):
+        parsed = urlparse(url)
+        if parsed.path == "/subscribe/sse":
+            if not self.multiplexed:
+                not_found = Response()
+                not_found.status_code = 404
+                raise HTTPError("404 Not Found", response=not_found)
+            topics = set(parse_qs(parsed.query)["topics"][0].split(","))
+        else:
+            topics = {parsed.path[len("/subscribe/sse/") :]}
+        stream = _LiveStream(topics)
+        with self.lock:
+            self.streams.append(stream)
+        return stream
+
+    def open_streams(self):
+        with self.lock:
+            return [s for s in self.streams if not s.closed]
+
+    def publish(self, topic, payload):
+        body = json.dumps({"topic": topic, "payload": payload})
+        with self.lock:
+            self.next_id += 1
+            for stream in self.streams:
+                if any(
+                    topic == t or (t.endswith("*") and topic.startswith(t[:-1]))
+                    for t in stream.topics
+                ):
+                    for line in [f"id: {self.next_id}", f"data: {body}", ""]:
+                        stream.lines.put(line.encode())
+
+
+def _wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out")
+        time.sleep(0.005)
+
+
+class TestTopicIndex(unittest.TestCase):
+    def test_exact_and_prefix(self):
+        index: TopicIndex[str] = TopicIndex()
+        index.add("step_progress:t-1", "a")
+        index.add("step_progress:*", "b")
+        index.add("step_progress:*", "a")
+        index.add("step*", "c")
+        self.assertEqual(index.match("step_progress:t-1"), ["a", "b", "c"])
+        self.assertEqual(index.match("step_progress:t-2"), ["b", "a", "c"])
+        self.assertEqual(index.match("task_state:t-1"), [])
+        index.remove("step*", "c")
+        index.remove("step_progress:*", "b")
+        self.assertEqual(index.match("step_progress:t-2"), ["a"])
+        self.assertFalse(index.has("step*"))
+
+    def test_covered_patterns(self):
+        index: TopicIndex[str] = TopicIndex()
+        for pattern in ["step_progress:t-1", "step_progress:*", "step*", "task"]:
+            index.add(pattern, "a")
+        self.assertTrue(index.is_covered("step_progress:t-1"))
+        self.assertTrue(index.is_covered("step_progress:*"))
+        self.assertFalse(index.is_covered("step*"))
+        self.assertFalse(index.is_covered("task"))
+
+
+class TestSubscriptionManager(unittest.TestCase):
+    def setUp(self):
+        self.backend = _Backend()
+        self.pubsub = PubsubService("http://pubsub", namespace="test")
+        patcher = patch.object(self.pubsub, "_open_sse", self.backend.open_sse)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _manager(self, **kwargs):
+        manager = SubscriptionManager(self.pubsub, **kwargs)
+        self.addCleanup(manager.close)
+        return manager
+
+    def test_dispatch_to_callbacks_and_queues(self):
+        manager = self._manager()
+        received: List[Tuple[str, Any]] = []
+        updates: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+        manager.subscribe(
+            ["task_state:t-1", "task_state:t-2"], lambda *m: received.append(m)
+        )
+        manager.subscribe("step_progress:*", updates)
+        _wait_for(lambda: len(self.backend.open_streams()) == 1)
+        stream = self.backend.open_streams()[0]
+        self.assertEqual(
+            stream.topics,
+            {"test:task_state:t-1", "test:task_state:t-2", "test:step_progress:*"},
+        )
+
+        self.backend.publish("test:step_progress:t-9", {"n": 1})
+        self.backend.publish("test:task_state:t-2", {"n": 2})
+        self.assertEqual(updates.get(timeout=5), ("step_progress:t-9", {"n": 1}))
+        _wait_for(lambda: received == [("task_state:t-2", {"n": 2})])
+        self.assertEqual(manager.stats().dispatched, 2)
+
+    def test_topics_spread_over_connections(self):
+        manager = self._manager(max_connections=2, max_topics_per_connection=2)
+        updates: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+        manager.subscribe([f"t-{i}" for i in range(5)], updates)
+        _wait_for(lambda: len(self.backend.open_streams()) == 2)
+        self.assertEqual(
+            sorted(len(s.topics) for s in self.backend.open_streams()), [2, 3]
+        )
+        for i in range(5):
+            self.backend.publish(f"test:t-{i}", i)
+        self.assertEqual(
+            sorted(updates.get(timeout=5)[1] for _ in range(5)), list(range(5))
+        )
+
+    def test_unsubscribe(self):
+        manager = self._manager()
+        updates: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+        first = manager.subscribe(["a", "b"], updates)
+        manager.subscribe("b", updates)
+        _wait_for(lambda: len(self.backend.open_streams()) == 1)
+
+        first.unsubscribe()
+        _wait_for(
+            lambda: [s.topics for s in self.backend.open_streams()] == [{"test:b"}]
+        )
+        self.assertEqual(manager.stats().restarts, 1)
+        self.backend.publish("test:b", 1)
+        self.assertEqual(updates.get(timeout=5), ("b", 1))
+        self.assertTrue(updates.empty())
+
+    def test_overlapping_patterns_deliver_once(self):
+        manager = self._manager(max_topics_per_connection=1)
+        exact: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+        wildcard: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+        manager.subscribe("step_progress:t-1", exact)
+        subscription = manager.subscribe("step_progress:*", wildcard)
+        _wait_for(
+            lambda: [s.topics for s in self.backend.open_streams()]
+            == [{"test:step_progress:*"}]
+        )
+        self.backend.publish("test:step_progress:t-1", 1)
+        self.assertEqual(exact.get(timeout=5), ("step_progress:t-1", 1))
+        self.assertEqual(wildcard.get(timeout=5), ("step_progress:t-1", 1))
+        time.sleep(0.05)
+        self.assertTrue(exact.empty() and wildcard.empty())
+        self.assertEqual(manager.stats().received, 1)
+
+        # The exact topic is asked for again once the wildcard is gone
+        subscription.unsubscribe()
+        _wait_for(
+            lambda: [s.topics for s in self.backend.open_streams()]
+            == [{"test:step_progress:t-1"}]
+        )
+
+    def test_falls_back_to_a_connection_per_topic(self):
+        self.backend.multiplexed = False
+        manager = self._manager()
+        updates: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+        manager.subscribe(["a", "b"], updates)
+        _wait_for(lambda: len(self.backend.open_streams()) == 2)
+        self.assertFalse(manager.multiplexed)
+        self.assertEqual(
+            sorted(list(s.topics) for s in self.backend.open_streams()),
+            [["test:a"], ["test:b"]],
+        )
+        self.backend.publish("test:b", 1)
+        self.assertEqual(updates.get(timeout=5), ("b", 1))
+
+    def test_patterns_after_falling_back(self):
+        self.backend.multiplexed = False
+        manager = self._manager()
+        updates: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+        with self.assertLogs(level="ERROR") as logs:
+            manager.subscribe(["step_progress:*", "step_progress:t-1"], updates)
+            _wait_for(lambda: len(self.backend.open_streams()) == 1)
+        # The exact topic is still served, though the pattern covered it
+        self.assertEqual(
+            [s.topics for s in self.backend.open_streams()],
+            [{"test:step_progress:t-1"}],
+        )
+        self.assertIn("test:step_progress:*", logs.output[0])
+        with self.assertRaises(ValueError):
+            manager.subscribe("task_state:*", updates)
+
+    def test_connections_per_topic_are_capped(self):
+        self.backend.multiplexed = False
+        manager = self._manager(max_connections=2, multiplexed=False)
+        updates: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+        first = manager.subscribe("a", updates)
+        manager.subscribe("b", updates)
+        with self.assertLogs(level="ERROR") as logs:
+            manager.subscribe("c", updates)
+        self.assertIn("test:c", logs.output[0])
+        _wait_for(lambda: len(self.backend.open_streams()) == 2)
+
+        # A topic that was left out gets the connection freed by another
+        first.unsubscribe()
+        _wait_for(
+            lambda: sorted(list(s.topics) for s in self.backend.open_streams())
+            == [["test:b"], ["test:c"]]
+        )